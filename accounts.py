@@ -0,0 +1,198 @@
+"""Accounts the bot posts for, and the fan-out publisher for many of them
+
+The default account reads its credentials from ``TWITTER_*`` environment
+variables and keeps its state directly under ``data/``. An accounts manifest
+adds more::
+
+    {
+      "accounts": [
+        {"name": "fitness", "env_prefix": "FITNESS_", "quotes": ["data/niches/fitness.json"]},
+        {"name": "money", "env_prefix": "MONEY_"}
+      ]
+    }
+
+Each manifest account reads ``<env_prefix>TWITTER_API_KEY`` and friends, and
+keeps its compiled corpora, deck, post history, outbox and rate-limit budget
+in its own directory (``data/accounts/<name>`` unless ``data_dir`` is set).
+``quotes`` and ``polls`` default to the shared sources.
+
+:class:`AccountPool` posts for every account from a bounded thread pool.
+All clients share one keep-alive connection pool, and each account waits on
+its own rate-limit budget only briefly, so a slow or throttled account
+leaves its post queued in its outbox instead of holding up the others.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+QUOTE_SOURCES = ['data/quotes.json', 'data/quotes.txt']
+POLL_SOURCES = ['data/polls.json']
+DEFAULT_DATA_DIR = 'data'
+ACCOUNTS_DIR = 'data/accounts'
+
+CREDENTIAL_VARIABLES = {
+    'api_key': 'TWITTER_API_KEY',
+    'api_secret': 'TWITTER_API_SECRET',
+    'access_token': 'TWITTER_ACCESS_TOKEN',
+    'access_token_secret': 'TWITTER_ACCESS_TOKEN_SECRET',
+    'bearer_token': 'TWITTER_BEARER_TOKEN',
+}
+
+# Longest a fanned-out account waits for rate-limit budget before queuing its post for later
+FANOUT_MAX_WAIT = 30
+
+_ACCOUNT_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class Account:
+    """Credentials, content sources and state directory of one posting account"""
+
+    def __init__(self, name='default', env_prefix='', data_dir=DEFAULT_DATA_DIR,
+                 quote_sources=None, poll_sources=None):
+        self.name = name
+        self.env_prefix = env_prefix
+        self.data_dir = data_dir
+        self.quote_sources = list(quote_sources or QUOTE_SOURCES)
+        self.poll_sources = list(poll_sources or POLL_SOURCES)
+
+    def credentials(self):
+        """Credentials from the environment, e.g. ``FITNESS_TWITTER_API_KEY``"""
+        return {key: os.getenv(self.env_prefix + variable) for key, variable in CREDENTIAL_VARIABLES.items()}
+
+    def path(self, *names):
+        """A file or directory inside this account's state directory"""
+        return os.path.join(self.data_dir, *names)
+
+    @property
+    def corpus_path(self):
+        return self.path('quotes.corpus')
+
+    @property
+    def poll_corpus_path(self):
+        return self.path('polls.corpus')
+
+    @property
+    def near_duplicates_report(self):
+        return self.path('near_duplicates.json')
+
+    @property
+    def card_cache_dir(self):
+        return self.path('.cache', 'cards')
+
+    @property
+    def compile_cache_dir(self):
+        return self.path('.compile-cache')
+
+    @property
+    def content_paths(self):
+        return self.quote_sources + self.poll_sources
+
+    def __repr__(self):
+        return f"Account({self.name!r}, data_dir={self.data_dir!r})"
+
+
+def load_accounts(path):
+    """Read an accounts manifest; raises ValueError if it is malformed"""
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    entries = data['accounts'] if isinstance(data, dict) else data
+
+    accounts = []
+    seen = set()
+    for entry in entries:
+        name = entry.get('name')
+        if not isinstance(name, str) or not _ACCOUNT_NAME.match(name):
+            raise ValueError(f"Account names must be letters, digits, '-' or '_': {name!r}")
+        if name in seen:
+            raise ValueError(f"Duplicate account name in {path}: {name}")
+        seen.add(name)
+        accounts.append(Account(
+            name,
+            env_prefix=entry.get('env_prefix', f"{name.upper().replace('-', '_')}_"),
+            data_dir=entry.get('data_dir', os.path.join(ACCOUNTS_DIR, name)),
+            quote_sources=entry.get('quotes'),
+            poll_sources=entry.get('polls'),
+        ))
+    if not accounts:
+        raise ValueError(f"No accounts in {path}")
+    return accounts
+
+
+class AccountPool:
+    """Post for many accounts at once from a bounded thread pool
+
+    Exposes the same ``post_daily_content`` / ``flush_state`` /
+    ``reload_quotes`` / ``prerender_cards`` methods as a single bot, so the
+    daemon can drive it.
+    ``bot_factory(account, http_adapter, max_wait)`` builds each account's bot.
+    """
+
+    def __init__(self, accounts, bot_factory, workers=8, dry_run=False, max_wait=FANOUT_MAX_WAIT):
+        self.accounts = list(accounts)
+        self.bot_factory = bot_factory
+        self.workers = max(1, min(workers, len(self.accounts)))
+        self.dry_run = dry_run
+        self.max_wait = max_wait
+        self.bots = {}
+        self._adapter = None
+
+    @property
+    def http_adapter(self):
+        """One keep-alive connection pool shared by every account's client"""
+        if self._adapter is None and not self.dry_run:
+            from x_api import shared_adapter
+            self._adapter = shared_adapter(self.workers)
+        return self._adapter
+
+    def bot(self, account):
+        bot = self.bots.get(account.name)
+        if bot is None:
+            bot = self.bots[account.name] = self.bot_factory(account, self.http_adapter, self.max_wait)
+        return bot
+
+    def _post(self, account):
+        start = time.perf_counter()
+        try:
+            success = bool(self.bot(account).post_daily_content())
+        except Exception as e:
+            logger.error("Posting for account %s failed: %s", account.name, e)
+            success = False
+        return account.name, success, time.perf_counter() - start
+
+    def post_daily_content(self):
+        """Post for every account; True only if every account succeeded"""
+        start = time.perf_counter()
+        # Builds the shared adapter once, before the workers race for it
+        self.http_adapter
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='account') as executor:
+            results = list(executor.map(self._post, self.accounts))
+        failed = [name for name, success, _ in results if not success]
+        logger.info("Posted for %d/%d accounts in %.2fs%s", len(results) - len(failed), len(results),
+                    time.perf_counter() - start, f" (failed: {', '.join(failed)})" if failed else '')
+        return not failed
+
+    def flush_state(self):
+        for bot in self.bots.values():
+            bot.flush_state()
+
+    def reload_quotes(self):
+        for bot in self.bots.values():
+            bot.reload_quotes()
+
+    def prerender_cards(self):
+        # One account at a time: each render already uses a process per CPU
+        for bot in self.bots.values():
+            bot.prerender_cards()
+
+    @property
+    def content_paths(self):
+        paths = []
+        for account in self.accounts:
+            paths.extend(path for path in account.content_paths if path not in paths)
+        return paths
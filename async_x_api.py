@@ -0,0 +1,375 @@
+"""asyncio client for publishing through the X API v2 ``POST /2/tweets`` endpoint
+
+It also uploads media (image cards) through the chunked ``/2/media/upload``
+endpoints: initialize, append the file in :data:`MEDIA_CHUNK_SIZE` parts,
+finalize.
+
+Only the standard library is used: requests go out over HTTP/1.1 keep-alive
+connections opened with ``asyncio.open_connection`` and are signed with
+OAuth 1.0a user context, the same credentials tweepy uses. Connections stay
+open in a small pool between calls, so a thread's replies go out back to
+back on a warm connection with no new TCP or TLS handshake.
+
+``TWITTER_API_BASE_URL`` points the client at a local stand-in server (see
+``fake_x_api``), exactly as it does for the tweepy client.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import ssl
+import time
+from urllib.parse import parse_qsl, quote, urlsplit
+
+from metrics import NULL_METRICS
+from rate_limit import ResponseInterrupted, RetryPolicy, call_with_retries_async, endpoint_key
+from x_api import DEFAULT_API_HOST
+
+logger = logging.getLogger(__name__)
+
+TWEETS_PATH = '/2/tweets'
+MEDIA_UPLOAD_PATH = '/2/media/upload'
+MEDIA_CHUNK_SIZE = 1 << 20
+USER_AGENT = 'twitterPost-async/1.0'
+
+
+def _escape(value):
+    """Percent-encode per RFC 3986, as OAuth 1.0a requires"""
+    return quote(str(value), safe='~')
+
+
+def oauth1_header(method, url, credentials, nonce=None, timestamp=None):
+    """``Authorization`` header value signing a request with HMAC-SHA1
+
+    JSON bodies are not part of the signature; only the OAuth parameters and
+    the URL's query string are.
+    """
+    oauth = {
+        'oauth_consumer_key': credentials['api_key'],
+        'oauth_nonce': nonce or secrets.token_hex(16),
+        'oauth_signature_method': 'HMAC-SHA1',
+        'oauth_timestamp': str(int(time.time() if timestamp is None else timestamp)),
+        'oauth_token': credentials['access_token'],
+        'oauth_version': '1.0',
+    }
+    parts = urlsplit(url)
+    params = list(oauth.items()) + parse_qsl(parts.query, keep_blank_values=True)
+    param_string = '&'.join(f"{key}={value}" for key, value in
+                            sorted((_escape(key), _escape(value)) for key, value in params))
+    base_url = f"{parts.scheme}://{parts.netloc.lower()}{parts.path}"
+    base_string = '&'.join(_escape(value) for value in (method.upper(), base_url, param_string))
+    signing_key = f"{_escape(credentials['api_secret'])}&{_escape(credentials['access_token_secret'])}"
+    digest = hmac.new(signing_key.encode('utf-8'), base_string.encode('utf-8'), hashlib.sha1).digest()
+    oauth['oauth_signature'] = base64.b64encode(digest).decode('ascii')
+    return 'OAuth ' + ', '.join(f'{_escape(key)}="{_escape(value)}"' for key, value in sorted(oauth.items()))
+
+
+class APIResponse:
+    """Status, headers (lower-cased names) and body of one response
+
+    Shaped like a ``requests`` response where the rest of the bot looks at
+    one (``status_code``, ``headers``, ``text``).
+    """
+
+    def __init__(self, status_code, headers, body):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class APIError(Exception):
+    """A non-2xx response; ``response`` carries its status and rate-limit headers"""
+
+    def __init__(self, response):
+        detail = ''
+        try:
+            payload = response.json() or {}
+            detail = payload.get('detail') or payload.get('title') or ''
+        except ValueError:
+            pass
+        super().__init__(f"{response.status_code} {detail}".strip())
+        self.response = response
+
+
+class MediaUploadError(Exception):
+    """Raised when X reports that it could not process an uploaded file"""
+
+
+def _multipart(form, boundary):
+    """Encode ``form`` as multipart/form-data; bytes values become file parts"""
+    parts = []
+    for name, value in form.items():
+        if isinstance(value, bytes):
+            head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}"\r\n'
+                    f'Content-Type: application/octet-stream\r\n\r\n')
+            parts.append(head.encode('utf-8') + value + b'\r\n')
+        else:
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+                         .encode('utf-8'))
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts)
+
+
+class _StaleConnection(ConnectionResetError):
+    """The connection failed before any of the response arrived, so the request can be sent again"""
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.requests = 0
+        self.reusable = True
+
+    async def request(self, data):
+        self.requests += 1
+        try:
+            self.writer.write(data)
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+        except ConnectionError as e:
+            raise _StaleConnection(f"Connection failed before a response arrived: {e}") from e
+        if not status_line:
+            raise _StaleConnection("Connection closed before a response arrived")
+        try:
+            return await self._read_response(status_line)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            raise ResponseInterrupted(f"Connection failed part way through the response: {e!r}") from e
+
+    async def _read_response(self, status_line):
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            self.reusable = False
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+            self.reusable = False
+        return APIResponse(int(status), headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';', 1)[0], 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        self.reusable = False
+        self.writer.close()
+
+
+class AsyncXClient:
+    """Publish tweets over a pool of up to ``max_connections`` keep-alive connections
+
+    A client belongs to the event loop it is first used on. ``limiter`` (a
+    ``rate_limit.RateLimiter``) is fed the headers of every response, as the
+    tweepy client's response hook does.
+    """
+
+    def __init__(self, credentials, limiter=None, base_url=None, max_connections=4, timeout=30.0):
+        self.credentials = credentials
+        self.limiter = limiter
+        self.base_url = (base_url or os.getenv('TWITTER_API_BASE_URL') or DEFAULT_API_HOST).rstrip('/')
+        self.timeout = timeout
+        parts = urlsplit(self.base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.host_header = parts.netloc
+        self.max_connections = max_connections
+        self._idle = []
+        # Made on first use: before 3.10 a semaphore binds the current thread's loop when it is
+        # created, and clients are built in worker threads that have none
+        self._slots = None
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.scheme == 'https' else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), self.timeout)
+        return _Connection(reader, writer)
+
+    def _encode(self, method, path, body, form=None):
+        url = self.base_url + path
+        content_type = 'application/json'
+        if form is not None:
+            boundary = secrets.token_hex(16)
+            content_type = f"multipart/form-data; boundary={boundary}"
+            payload = _multipart(form, boundary)
+        else:
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host_header}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            f"Authorization: {oauth1_header(method, url, self.credentials)}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: keep-alive\r\n\r\n"
+        )
+        return head.encode('latin-1') + payload
+
+    async def request(self, method, path, body=None, form=None):
+        """Send one request and return its :class:`APIResponse`; raises :class:`APIError` on non-2xx
+
+        ``body`` goes out as JSON, or ``form`` as multipart/form-data.
+        """
+        data = self._encode(method, path, body, form)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            try:
+                if connection is None:
+                    connection = await self._connect()
+                try:
+                    response = await asyncio.wait_for(connection.request(data), self.timeout)
+                except _StaleConnection:
+                    if not reused:
+                        raise
+                    # The server closed an idle connection before reading the request; resend once.
+                    # A response cut short is not resent: the server already had the whole request.
+                    connection.close()
+                    connection = await self._connect()
+                    response = await asyncio.wait_for(connection.request(data), self.timeout)
+            except BaseException:
+                if connection is not None:
+                    connection.close()
+                raise
+            if connection.reusable:
+                self._idle.append(connection)
+            else:
+                connection.close()
+
+        if self.limiter is not None:
+            self.limiter.update_from_headers(endpoint_key(method, path), response.headers)
+        if not 200 <= response.status_code < 300:
+            raise APIError(response)
+        return response
+
+    async def create_tweet(self, text, in_reply_to_tweet_id=None, poll_options=None,
+                           poll_duration_minutes=None):
+        """Post a tweet; returns the ``data`` object (``id``, ``text``) of the new tweet"""
+        body = {'text': text}
+        if in_reply_to_tweet_id is not None:
+            body['reply'] = {'in_reply_to_tweet_id': str(in_reply_to_tweet_id)}
+        if poll_options is not None:
+            body['poll'] = {'options': list(poll_options), 'duration_minutes': poll_duration_minutes}
+        response = await self.request('POST', TWEETS_PATH, body)
+        return response.json()['data']
+
+    async def _call(self, method, path, description, policy, metrics, body=None, form=None):
+        """:meth:`request` through the rate limiter and retry engine, when there is a limiter"""
+        if self.limiter is None:
+            return await self.request(method, path, body, form)
+        return await call_with_retries_async(
+            endpoint_key(method, path),
+            lambda: self.request(method, path, body, form),
+            self.limiter,
+            policy,
+            description=description,
+            metrics=metrics
+        )
+
+    async def upload_media(self, data, media_type='image/png', media_category='tweet_image',
+                           chunk_size=MEDIA_CHUNK_SIZE, policy=None, metrics=NULL_METRICS):
+        """Upload ``data`` in chunks and return its media id, ready for ``create_tweet``
+
+        Every step is retried on its own, so a failed chunk does not restart
+        the upload. Raises :class:`MediaUploadError` if X fails to process it.
+        """
+        policy = policy or RetryPolicy()
+        response = await self._call('POST', f"{MEDIA_UPLOAD_PATH}/initialize", "Starting media upload", policy, metrics,
+                                    {'media_type': media_type, 'total_bytes': len(data),
+                                     'media_category': media_category})
+        media_id = response.json()['data']['id']
+        chunks = range(0, len(data), chunk_size)
+        for segment, start in enumerate(chunks):
+            await self._call('POST', f"{MEDIA_UPLOAD_PATH}/{media_id}/append",
+                             f"Uploading media chunk {segment + 1}/{len(chunks)}", policy, metrics,
+                             form={'segment_index': segment, 'media': data[start:start + chunk_size]})
+        response = await self._call('POST', f"{MEDIA_UPLOAD_PATH}/{media_id}/finalize", "Finishing media upload",
+                                    policy, metrics)
+        processing = response.json()['data'].get('processing_info')
+        # Images are usually ready at once; anything else is polled until X is done with it
+        while processing and processing.get('state') in ('pending', 'in_progress'):
+            await asyncio.sleep(processing.get('check_after_secs', 1))
+            response = await self._call('GET', f"{MEDIA_UPLOAD_PATH}?command=STATUS&media_id={media_id}",
+                                        "Checking media upload", policy, metrics)
+            processing = response.json()['data'].get('processing_info')
+        if processing and processing.get('state') == 'failed':
+            raise MediaUploadError(f"Media {media_id} failed processing: {processing.get('error')}")
+        return media_id
+
+    async def post_thread(self, parts, in_reply_to_tweet_id=None, policy=None, on_posted=None, metrics=NULL_METRICS):
+        """Post ``parts`` as a reply chain; returns the new tweet ids in order
+
+        Each part is sent the moment its parent's id comes back. Rate-limit
+        waits and retries go through ``limiter`` and ``policy`` (and are
+        timed in ``metrics``).
+        ``on_posted(tweet_id)`` is called after each part so a caller can
+        record progress and resume a thread that fails half way, by passing
+        the last posted id as ``in_reply_to_tweet_id``.
+        """
+        endpoint = endpoint_key('POST', TWEETS_PATH)
+        policy = policy or RetryPolicy()
+        ids = []
+        parent = in_reply_to_tweet_id
+        for number, text in enumerate(parts, 1):
+            if self.limiter is None:
+                data = await self.create_tweet(text, parent)
+            else:
+                data = await call_with_retries_async(
+                    endpoint,
+                    lambda: self.create_tweet(text, parent),
+                    self.limiter,
+                    policy,
+                    description=f"Posting thread part {number}/{len(parts)}",
+                    metrics=metrics
+                )
+            parent = data['id']
+            ids.append(parent)
+            if on_posted is not None:
+                on_posted(parent)
+        return ids
+
+    async def aclose(self):
+        """Close every idle connection"""
+        while self._idle:
+            connection = self._idle.pop()
+            connection.close()
+            try:
+                await connection.writer.wait_closed()
+            except OSError:
+                pass
@@ -0,0 +1,57 @@
+"""Image card rendering throughput and cache-hit latency
+
+Renders ``--cards`` synthetic quotes into a fresh cache once per worker
+count, so the speed-up of the process pool shows against drawing in one
+process, then times fetching a cached card (the only card work on the
+posting path) and a miss.
+
+Usage: python benchmarks/bench_cards.py [--cards 200] [--workers 1,2,4] [--template classic]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+from common import format_us, percentile, synthetic_quotes, time_calls
+
+from cards import DEFAULT_TEMPLATE, TEMPLATES, CardCache, render_cards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', type=int, default=200)
+    parser.add_argument('--workers', default=f"1,{os.cpu_count() or 1}", help="Comma-separated worker counts")
+    parser.add_argument('--template', choices=sorted(TEMPLATES), default=DEFAULT_TEMPLATE)
+    parser.add_argument('--repeat', type=int, default=2000, help="Cache lookups to time")
+    args = parser.parse_args()
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        sys.exit("Pillow is not installed; pip install Pillow to benchmark the cards")
+
+    quotes = synthetic_quotes(args.cards)
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for workers in sorted({int(value) for value in args.workers.split(',')}):
+            cache = CardCache(os.path.join(directory, f"workers{workers}"))
+            result = render_cards(quotes, cache, args.template, workers)
+            baseline = baseline or result.seconds
+            print(f"{workers:>3} workers  {result.seconds:8.2f} s  {result.rendered / result.seconds:8.1f} cards/s  "
+                  f"x{baseline / result.seconds:.2f}  {result.bytes_written / result.rendered / 1024:.0f} KiB/card")
+
+        hits = iter(quotes * (args.repeat // len(quotes) + 1))
+
+        def hit():
+            with cache.open(next(hits), args.template) as file:
+                file.read()
+
+        misses = iter(synthetic_quotes(args.repeat, seed=1))
+        for label, func in (('hit', hit), ('miss', lambda: cache.open(next(misses), args.template))):
+            timings = time_calls(func, args.repeat)
+            print(f"cache {label:<5} p50 {format_us(percentile(timings, 50))}  p99 {format_us(percentile(timings, 99))}")
+
+
+if __name__ == '__main__':
+    main()
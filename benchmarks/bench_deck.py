@@ -0,0 +1,60 @@
+"""Per-pick latency of the shuffled quote deck at growing corpus sizes
+
+For each size, writes a compiled corpus and times three things: the raw
+in-memory draw, ``get_random_quote`` through a real bot (corpus fingerprint
+check, deck sync, post-history lookup, cursor save), and loading the
+persisted deck the way a fresh process does. None of them should grow with
+the corpus; the one-off deck build and first sync are reported separately.
+
+Usage: python benchmarks/bench_deck.py [--sizes 1000,100000,1000000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from common import format_us, percentile, synthetic_quotes, time_calls
+
+from accounts import Account
+from corpus import write_corpus
+from fake_x_api import FakeClient, FakeXAPI
+from quote_deck import QuoteDeck
+from twitter_bot import MotivationalTwitterBot
+
+
+def bench(size, picks):
+    with tempfile.TemporaryDirectory() as tmp:
+        account = Account('bench', data_dir=tmp, quote_sources=[os.path.join(tmp, 'quotes.txt')])
+        write_corpus(account.corpus_path, synthetic_quotes(size))
+        bot = MotivationalTwitterBot(account=account, client=FakeClient(FakeXAPI()))
+
+        start = time.perf_counter()
+        bot.get_random_quote()
+        first = time.perf_counter() - start
+
+        selected = time_calls(bot.get_random_quote, picks)
+        loaded = time_calls(lambda: QuoteDeck.load(account.path('quote_deck.json')), picks)
+        raw = time_calls(bot.quote_deck.draw, picks)
+        bot.reload_quotes()
+        bot.load_state_store().close()
+    return first, raw, selected, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--picks', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'quotes':>10}  {'first pick':>12}  {'draw p50':>12}  {'get_random_quote p50':>20}  "
+          f"{'p99':>12}  {'deck load p50':>13}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        first, raw, selected, loaded = bench(size, args.picks)
+        print(f"{size:>10}  {first * 1e3:9.1f} ms  {format_us(percentile(raw, 50))}  "
+              f"{format_us(percentile(selected, 50)):>20}  {format_us(percentile(selected, 99))}  "
+              f"{format_us(percentile(loaded, 50)):>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Multi-account posting throughput against the fake X API
+
+Runs the fake API in its own process, builds an accounts manifest of N
+accounts (each with its own state directory), and times how many posts per
+second the account pool gets out as N grows, serially (one worker) and with
+the bounded thread pool sharing one keep-alive connection pool. The fake API
+adds ``--latency`` to every response to stand in for the network.
+
+Usage: python benchmarks/bench_fanout.py [--accounts 1,4,16,64] [--workers 16] [--rounds 3] [--latency 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+
+from accounts import CREDENTIAL_VARIABLES
+
+
+@contextlib.contextmanager
+def fake_api_process(latency):
+    """Start ``fake_x_api.py`` on a free port; yields its base URL"""
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'fake_x_api.py'), '--port', '0',
+                                '--latency', str(latency)],
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        line = process.stdout.readline()
+        yield line.rsplit(' ', 1)[-1].strip()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def write_manifest(directory, count):
+    # Fresh tokens per manifest, so the fake API sees new users with no posting history
+    tag = os.path.basename(directory)
+    accounts = []
+    for number in range(count):
+        name = f"bench{number}"
+        prefix = f"BENCH{number}_"
+        for key, variable in CREDENTIAL_VARIABLES.items():
+            os.environ[prefix + variable] = f"{tag}-{name}-{key}"
+        accounts.append({
+            'name': name,
+            'env_prefix': prefix,
+            'data_dir': os.path.join(directory, name),
+            'quotes': [os.path.join(ROOT, 'data', 'quotes.json')],
+            'polls': [os.path.join(ROOT, 'data', 'polls.json')],
+        })
+    path = os.path.join(directory, 'accounts.json')
+    with open(path, 'w') as file:
+        json.dump({'accounts': accounts}, file)
+    return path
+
+
+def bench(count, workers, rounds):
+    """Posts per second for ``count`` accounts, after one untimed warm-up round"""
+    from twitter_bot import build_account_pool
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = build_account_pool(write_manifest(tmp, count), workers=workers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Warm-up compiles each account's corpus and verifies its credentials
+            pool.post_daily_content()
+            start = time.perf_counter()
+            ok = all(pool.post_daily_content() for _ in range(rounds))
+            elapsed = time.perf_counter() - start
+        pool.flush_state()
+    return count * rounds / elapsed, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', default='1,4,16,64')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="Simulated API round trip in seconds (default: 0.05)")
+    args = parser.parse_args()
+
+    with fake_api_process(args.latency) as base_url:
+        os.environ['TWITTER_API_BASE_URL'] = base_url
+        print(f"{'accounts':>8}  {'serial posts/s':>15}  {f'{args.workers} workers posts/s':>20}  {'speedup':>8}")
+        for count in (int(value) for value in args.accounts.split(',')):
+            serial, serial_ok = bench(count, 1, args.rounds)
+            pooled, pooled_ok = bench(count, args.workers, args.rounds)
+            flag = '' if serial_ok and pooled_ok else '  (some posts failed)'
+            print(f"{count:>8}  {serial:>15.1f}  {pooled:>20.1f}  {pooled / serial:>7.1f}x{flag}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Hook classification: substring scans vs the single-pass matcher
+
+Usage: python benchmarks/bench_hooks.py [--quotes 1000000] [--source data/quotes.json]
+"""
+
+import argparse
+import time
+
+from common import source_quotes, synthetic_quotes
+
+from hooks import CATEGORY_KEYWORDS, GENERAL, classify_batch, classify_hook_category
+
+
+def classify_substring_scan(text):
+    """The original add_engagement_hook logic: one any() scan per category"""
+    quote_lower = text.lower()
+    for category, keywords in enumerate(CATEGORY_KEYWORDS):
+        if any(word in quote_lower for word in keywords):
+            return category
+    return GENERAL
+
+
+def timed(label, func, count):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f} s  {elapsed / count * 1e9:8.0f} ns/quote")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quotes', type=int, default=1_000_000)
+    parser.add_argument('--source', help="Build the corpus by repeating quotes from this source file")
+    args = parser.parse_args()
+
+    quotes = source_quotes(args.source, args.quotes) if args.source else synthetic_quotes(args.quotes)
+    baseline = timed("substring scans", lambda: bytes(map(classify_substring_scan, quotes)), len(quotes))
+    single = timed("single-pass per quote", lambda: bytes(map(classify_hook_category, quotes)), len(quotes))
+    batch = timed("batch (joined buffer)", lambda: bytes(classify_batch(quotes)), len(quotes))
+
+    if not baseline == single == batch:
+        raise SystemExit("Classifiers disagree")
+    print("All classifiers agree")
+
+
+if __name__ == '__main__':
+    main()
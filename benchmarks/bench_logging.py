@@ -0,0 +1,144 @@
+"""Logging overhead per post: no logging vs the old synchronous handlers vs the queue pipeline
+
+Posts ``--posts`` quotes and polls through the real bot against the
+in-process fake API (in-memory history and outbox, like ``simulate``) once
+per logging setup, and reports the time per post and how much of it logging
+adds over the run with logging off. For the queue pipeline, ``flush`` is
+the time the listener thread still needed to write out the queue after the
+last post; ``WARNING`` shows what the per-post INFO lines cost once they
+are filtered out. ``--disk-latency`` adds a sleep to every write of the log
+file, standing in for a slow or busy disk: the synchronous handler makes the
+post wait for it, the queue pipeline does not.
+
+On a single core the listener thread's work still competes with posting,
+so expect the queue to cost about what the synchronous handler does there
+when the disk is fast; the gap opens with the disk latency and with cores.
+
+Usage: python benchmarks/bench_logging.py [--posts 2000] [--rounds 3] [--disk-latency 0.0005]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+import common  # noqa: F401  (makes the bot modules importable)
+
+from accounts import Account
+from fake_x_api import FakeAsyncClient, FakeClient, FakeXAPI
+from logs import CONSOLE_FORMAT, setup_logging, stop_logging
+from outbox import MemoryOutbox
+from quote_deck import QuoteDeck
+from simulate import DEFAULT_START, DUPLICATE_WINDOW, SimulatedClock, simulation_account
+from state_store import SQLiteStateStore
+from twitter_bot import MotivationalTwitterBot
+
+
+def slow_disk(handler, latency):
+    """Make every flush of ``handler``'s file take ``latency`` seconds longer"""
+    if latency:
+        flush = handler.flush
+
+        def slow_flush():
+            flush()
+            time.sleep(latency)
+
+        handler.flush = slow_flush
+    return handler
+
+
+def no_logging():
+    # A handler of its own, or the first logging.info() call would install basicConfig's
+    root = logging.getLogger()
+    handler = logging.NullHandler()
+    root.addHandler(handler)
+    root.setLevel(logging.CRITICAL + 1)
+    return lambda: root.removeHandler(handler)
+
+
+def legacy_logging(path, stream, latency):
+    """The handlers ``main`` used to install: a plain FileHandler and console, written by the caller"""
+    root = logging.getLogger()
+    file_handler = slow_disk(logging.FileHandler(path, encoding='utf-8'), latency)
+    console = logging.StreamHandler(stream)
+    for handler in (file_handler, console):
+        handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    return lambda: [handler.close() or root.removeHandler(handler) for handler in (file_handler, console)]
+
+
+def queue_logging(path, level, stream, latency):
+    listener = setup_logging(path, level, stream=stream)
+    slow_disk(listener.handlers[0], latency)
+    return stop_logging
+
+
+def run_posts(account, posts):
+    """Seconds to make ``posts`` posts with fresh in-memory state"""
+    clock = SimulatedClock(DEFAULT_START)
+    api = FakeXAPI(clock=clock, duplicate_window=DUPLICATE_WINDOW)
+    async_client = FakeAsyncClient(api, {'api_key': '', 'api_secret': '', 'access_token': None,
+                                         'access_token_secret': ''})
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = MotivationalTwitterBot(account=account, client=FakeClient(api), async_client=async_client,
+                                     clock=clock, max_wait=0)
+        async_client.limiter = bot.rate_limiter
+        bot.rate_limiter.path = None
+        bot.state_store = SQLiteStateStore(':memory:', legacy_path=None, clock=clock)
+        bot.outbox = MemoryOutbox(clock=clock)
+        bot.quote_deck = QuoteDeck(None)
+        bot.poll_deck = QuoteDeck(None)
+        bot.post_daily_content()
+        start = time.perf_counter()
+        for _ in range(posts):
+            # Far enough apart that neither the fake API's limits nor its duplicate check get in the way
+            clock.now += 86400 * 60
+            bot.post_daily_content()
+        elapsed = time.perf_counter() - start
+        bot.state_store.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3, help="Best of this many runs per setup")
+    parser.add_argument('--disk-latency', type=float, default=0.0, metavar='SECONDS',
+                        help="Extra time every log file write takes (default: 0)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench-logging-') as directory, open(os.devnull, 'w') as devnull:
+        account = simulation_account(Account(), directory, {})
+        log_path = os.path.join(directory, 'bot.log')
+        setups = {
+            'off': no_logging,
+            'sync FileHandler': lambda: legacy_logging(log_path, devnull, args.disk_latency),
+            'queue + JSON': lambda: queue_logging(log_path, logging.INFO, devnull, args.disk_latency),
+            'queue, WARNING': lambda: queue_logging(log_path, logging.WARNING, devnull, args.disk_latency),
+        }
+        baseline = None
+        for name, setup in setups.items():
+            best = flush = None
+            written = 0
+            for _ in range(args.rounds):
+                if os.path.exists(log_path):
+                    os.remove(log_path)
+                teardown = setup()
+                elapsed = run_posts(account, args.posts)
+                start = time.perf_counter()
+                teardown()
+                if best is None or elapsed < best:
+                    best, flush = elapsed, time.perf_counter() - start
+                written = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+            per_post = best / args.posts
+            baseline = per_post if baseline is None else baseline
+            print(f"{name:<17} {per_post * 1e6:9.1f} us/post  +{(per_post - baseline) * 1e6:7.1f} us logging  "
+                  f"flush {flush * 1e3:7.1f} ms  {written / args.posts:6.0f} B/post")
+
+
+if __name__ == '__main__':
+    main()
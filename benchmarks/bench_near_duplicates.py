@@ -0,0 +1,101 @@
+"""Near-duplicate detection: signature and clustering time, and recall of planted edits
+
+The corpus draws words from a Zipf-distributed vocabulary (so common word
+pairs crowd the LSH buckets the way they do in real text) and plants
+``--planted`` near-copies of earlier quotes: a punctuation change, one word
+replaced, or two. Recall counts the planted copies whose similarity to their
+original reaches the threshold and that ended up in the original's cluster.
+``recompile`` is what the per-quote columns of the source cost to compile
+again after ``--added`` new quotes were appended to it: only those are
+classified and signed, the rest are copied from the previous cache.
+
+Usage: python benchmarks/bench_near_duplicates.py [--quotes 1000000] [--planted 0.01] [--threshold 0.5]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+
+import common  # noqa: F401  (makes the bot modules importable)
+
+from compiler import quote_columns
+from corpus import write_corpus
+from near_duplicates import NEAR_DUPLICATE_THRESHOLD, WordHashes, find_clusters, jaccard, lsh_keys, shingle_hashes
+
+EDITS = ('punctuation', 'one word', 'two words')
+
+
+def planted_corpus(count, planted, vocabulary=30000, seed=0):
+    """``count`` quotes, a ``planted`` share of them edited copies; returns (quotes, [(original, copy, edit)])"""
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rng.choices(letters, k=rng.randint(2, 9))) for _ in range(vocabulary)]
+    cumulative = list(itertools.accumulate(1 / rank for rank in range(1, vocabulary + 1)))
+    quotes = []
+    copies = []
+    for _ in range(count):
+        if quotes and rng.random() < planted:
+            original = rng.randrange(len(quotes))
+            edit = rng.randrange(len(EDITS))
+            tokens = quotes[original].rstrip('.').split()
+            for _ in range(edit):
+                tokens[rng.randrange(len(tokens))] = rng.choices(words, cum_weights=cumulative)[0]
+            copies.append((original, len(quotes), edit))
+            quotes.append(' '.join(tokens) + ('!' if edit == 0 else '.'))
+        else:
+            tokens = rng.choices(words, cum_weights=cumulative, k=rng.randint(6, 24))
+            quotes.append(' '.join(tokens).capitalize() + '.')
+    return quotes, copies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quotes', type=int, default=1_000_000)
+    parser.add_argument('--planted', type=float, default=0.01, help="Share of quotes that are edited copies")
+    parser.add_argument('--threshold', type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument('--added', type=int, default=1000, help="New quotes for the recompile time")
+    args = parser.parse_args()
+
+    quotes, copies = planted_corpus(args.quotes + args.added, args.planted)
+    quotes, added = quotes[:args.quotes], quotes[args.quotes:]
+    copies = [copy for copy in copies if copy[1] < args.quotes]
+    start = time.perf_counter()
+    keys = lsh_keys(quotes)
+    signed = time.perf_counter() - start
+    start = time.perf_counter()
+    clusters = find_clusters(quotes, keys, args.threshold)
+    clustered = time.perf_counter() - start
+    print(f"{'signatures':<12} {signed:8.2f} s  {signed / len(quotes) * 1e6:6.2f} us/quote")
+    print(f"{'clustering':<12} {clustered:8.2f} s  {clustered / len(quotes) * 1e6:6.2f} us/quote")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = os.path.join(directory, 'source.corpus')
+        write_corpus(cache, quotes, quote_columns(quotes))
+        start = time.perf_counter()
+        quote_columns(quotes + added, cache)
+        recompiled = time.perf_counter() - start
+    print(f"{'recompile':<12} {recompiled:8.2f} s  after {args.added} new quotes")
+    print(f"{len(clusters)} clusters, {sum(map(len, clusters.values()))} quotes dropped")
+
+    cluster_of = {}
+    for representative, members in clusters.items():
+        for index in [representative, *members]:
+            cluster_of[index] = representative
+    words = WordHashes()
+    for edit, label in enumerate(EDITS):
+        eligible = found = 0
+        for original, copy, kind in copies:
+            if kind != edit:
+                continue
+            similarity = jaccard(set(shingle_hashes(quotes[original], words)),
+                                 set(shingle_hashes(quotes[copy], words)))
+            if similarity >= args.threshold:
+                eligible += 1
+                found += original in cluster_of and cluster_of[original] == cluster_of.get(copy)
+        print(f"recall {label:<12} {found}/{eligible}" + (f" ({found / eligible:.1%})" if eligible else ''))
+
+
+if __name__ == '__main__':
+    main()
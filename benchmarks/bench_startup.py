@@ -0,0 +1,115 @@
+"""Import time and first-post latency of the bot, against the fake X API
+
+Each run is a fresh interpreter in a scratch copy of the tree, so nothing is
+shared between runs except what the bot itself persists under data/ (the
+credential cache, rate-limit state). The first run is the cold start; the
+rest show the warm path. Pass ``--baseline <git rev>`` to measure an older
+revision the same way for comparison.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--baseline REV]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT
+
+from fake_x_api import FakeXServer
+
+# Runs inside the scratch tree; writes its measurements to argv[1]
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import twitter_bot
+imported = time.perf_counter()
+tweepy_at_import = 'tweepy' in sys.modules
+bot = twitter_bot.MotivationalTwitterBot()
+bot.should_post_poll = lambda: False
+posted = bot.post_daily_content()
+done = time.perf_counter()
+with open(sys.argv[1], 'w') as file:
+    json.dump({
+        'import': imported - start,
+        'first_post': done - imported,
+        'total': done - start,
+        'tweepy_at_import': tweepy_at_import,
+        'posted': bool(posted),
+    }, file)
+"""
+
+ENV = {
+    'TWITTER_API_KEY': 'bench-key',
+    'TWITTER_API_SECRET': 'bench-secret',
+    'TWITTER_ACCESS_TOKEN': 'bench-token',
+    'TWITTER_ACCESS_TOKEN_SECRET': 'bench-token-secret',
+    'TWITTER_BEARER_TOKEN': 'bench-bearer',
+}
+
+
+def copy_tree(rev, target):
+    """Materialize the working tree (rev None) or a git revision into ``target``"""
+    if rev is None:
+        shutil.copytree(ROOT, target, ignore=shutil.ignore_patterns('.git', '__pycache__', 'bot.log'))
+        return
+    os.makedirs(target)
+    archive = subprocess.run(['git', '-C', ROOT, 'archive', rev], check=True, capture_output=True).stdout
+    subprocess.run(['tar', '-x', '-C', target], input=archive, check=True)
+
+
+def measure(tree, base_url, runs):
+    env = dict(os.environ, **ENV, TWITTER_API_BASE_URL=base_url)
+    results = []
+    for run in range(runs):
+        output = os.path.join(tree, f'.startup-{run}.json')
+        subprocess.run([sys.executable, '-c', CHILD, output], cwd=tree, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(output) as file:
+            results.append(json.load(file))
+    return results
+
+
+def summarize(label, results):
+    cold, warm = results[0], results[1:] or results
+    median = {key: statistics.median(result[key] for result in warm) for key in ('import', 'first_post', 'total')}
+    print(f"{label:>10}  {cold['import'] * 1e3:9.1f}  {median['import'] * 1e3:9.1f}  "
+          f"{cold['first_post'] * 1e3:9.1f}  {median['first_post'] * 1e3:9.1f}  "
+          f"{median['total'] * 1e3:9.1f}  {'yes' if cold['tweepy_at_import'] else 'no':>7}  "
+          f"{sum(result['posted'] for result in results)}/{len(results)}")
+    return {'cold': cold, 'warm_median': median}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', help="Git revision to compare the working tree against")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    trees = [('baseline', args.baseline)] if args.baseline else []
+    trees.append(('current', None))
+
+    print("milliseconds; warm = median of runs after the first")
+    print(f"{'tree':>10}  {'import':>9}  {'import':>9}  {'1st post':>9}  {'1st post':>9}  {'total':>9}  {'tweepy':>7}  posted")
+    print(f"{'':>10}  {'cold':>9}  {'warm':>9}  {'cold':>9}  {'warm':>9}  {'warm':>9}  {'@import':>7}")
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, rev in trees:
+            tree = os.path.join(tmp, label)
+            copy_tree(rev, tree)
+            # A fresh fake API per tree, so duplicate-content checks don't carry over
+            with FakeXServer() as server:
+                report[label] = summarize(label, measure(tree, server.base_url, args.runs))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
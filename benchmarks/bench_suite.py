@@ -0,0 +1,286 @@
+"""Latency, memory and allocations of the hot paths, with saved results and a regression check
+
+Operations are measured against synthetic corpora of ``--sizes`` quotes
+(quote selection, hooks, formatting) and post histories of ``--history``
+rows (recording and looking up posts), plus the import of ``twitter_bot``.
+Every scale runs in a fresh interpreter so its peak RSS is its own. For each
+operation the suite reports p50/p90/p99 latency and, from a separate
+tracemalloc pass, the peak traced memory and the bytes still held per call.
+
+``--save`` writes the results as JSON; ``--compare`` checks them against an
+earlier file and exits 1 if any operation's latency grew by more than
+``--threshold``. Corpora up to 10M quotes work but need several GB of RAM.
+
+Usage: python benchmarks/bench_suite.py [--sizes 1000,100000] [--history 1000,100000]
+                                        [--save results.json] [--compare baseline.json --threshold 0.25]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import ROOT, iter_synthetic_quotes, percentile, time_calls
+
+# Runs in a fresh interpreter in the checkout; prints its measurements as JSON
+IMPORT_CHILD = r"""
+import json, resource, sys, time, tracemalloc
+if sys.argv[1] == 'trace':
+    tracemalloc.start()
+start = time.perf_counter()
+import twitter_bot
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'traced_peak': tracemalloc.get_traced_memory()[1]}))
+"""
+
+SECONDS_PER_DAY = 86400
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def allocations(func, calls):
+    """Peak traced memory and bytes retained per call over ``calls`` calls of ``func``"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(calls):
+            func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'alloc_peak': peak - before, 'alloc_per_call': max(0, current - before) / calls}
+
+
+def measure(func, repeat, alloc_calls, warmup=10):
+    for _ in range(min(warmup, repeat)):
+        func()
+    timings = time_calls(func, repeat)
+    result = {
+        'calls': repeat,
+        'p50': percentile(timings, 50),
+        'p90': percentile(timings, 90),
+        'p99': percentile(timings, 99),
+        'mean': statistics.fmean(timings),
+    }
+    if alloc_calls:
+        result.update(allocations(func, alloc_calls))
+    return result
+
+
+def bench_quotes(size, repeat, alloc_calls):
+    """Selection, hooks and formatting against a compiled corpus of ``size`` quotes"""
+    from accounts import Account
+    from compiler import compile_corpus
+    from twitter_bot import MotivationalTwitterBot
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='bench-suite-') as tmp:
+        source = os.path.join(tmp, 'quotes.txt')
+        with open(source, 'w', encoding='utf-8') as file:
+            file.writelines(f"{quote}\n" for quote in iter_synthetic_quotes(size))
+        account = Account('bench', data_dir=os.path.join(tmp, 'account'), quote_sources=[source],
+                          poll_sources=[os.path.join(tmp, 'polls.json')])
+        started = time.perf_counter()
+        compile_corpus(account.quote_sources, account.corpus_path, account.compile_cache_dir)
+        compile_seconds = time.perf_counter() - started
+
+        # A dry run reads the deck and post history but never writes them back
+        bot = MotivationalTwitterBot(dry_run=True, account=account)
+        random.seed(0)
+
+        def load():
+            bot.reload_quotes()
+            bot.quote_deck = None
+            bot.load_quote_deck(bot.load_quotes())
+
+        results['load_corpus'] = measure(load, max(3, repeat // 100), 0, warmup=1)
+        corpus = bot.load_quotes()
+        rng = random.Random(1)
+        picks = [rng.randrange(len(corpus)) for _ in range(1024)]
+        sample = [(index, corpus[index]) for index in picks]
+        cursor = itertools.count()
+
+        def next_quote():
+            return sample[next(cursor) % len(sample)]
+
+        results['get_random_quote'] = measure(bot.get_random_quote, repeat, alloc_calls)
+        results['add_engagement_hook'] = measure(lambda: bot.add_engagement_hook(next_quote()[1]),
+                                                 repeat, alloc_calls)
+        results['format_tweet'] = measure(lambda: bot.format_tweet(next_quote()[1]), repeat, alloc_calls)
+        results['render_quote'] = measure(lambda: bot.render_quote(*next_quote()), repeat, alloc_calls)
+        bot.reload_quotes()
+        bot.load_state_store().close()
+    return {'compile_seconds': compile_seconds, 'peak_rss': peak_rss(), 'operations': results}
+
+
+def bench_history(rows, repeat, alloc_calls):
+    """Recording and looking up posts in a history of ``rows`` posts"""
+    from state_store import SQLiteStateStore, to_signed
+
+    results = {}
+    now = time.time()
+    with tempfile.TemporaryDirectory(prefix='bench-suite-') as tmp:
+        store = SQLiteStateStore(os.path.join(tmp, 'state.db'), legacy_path=None)
+        rng = random.Random(rows)
+        keys = [rng.getrandbits(64) for _ in range(rows)]
+        # Seed the history in one transaction; record_post would commit per row
+        store.connection.execute("BEGIN")
+        store.connection.executemany(
+            "INSERT INTO posts (quote_id, tweet_id, posted_at, kind, text) VALUES (?, ?, ?, 'quote', NULL)",
+            ((to_signed(key), str(number), now - (rows - number) * 365 * SECONDS_PER_DAY / rows)
+             for number, key in enumerate(keys)),
+        )
+        store.connection.execute("COMMIT")
+
+        # Half the lookups hit a recorded quote, half miss
+        probes = [keys[rng.randrange(rows)] if number % 2 else rng.getrandbits(64) for number in range(1024)]
+        cursor = itertools.count()
+
+        results['record_post'] = measure(lambda: store.record_post(rng.getrandbits(64), None, 'quote', 'Bench quote'),
+                                         repeat, alloc_calls)
+        results['posted_within'] = measure(lambda: store.posted_within(probes[next(cursor) % len(probes)], 30),
+                                           repeat, alloc_calls)
+        results['recent_posts'] = measure(lambda: store.recent_posts(50, kind='quote'), repeat, alloc_calls)
+        store.close()
+    return {'peak_rss': peak_rss(), 'operations': results}
+
+
+def bench_import(runs):
+    """Cold ``import twitter_bot`` in fresh interpreters"""
+    def child(mode):
+        output = subprocess.run([sys.executable, '-c', IMPORT_CHILD, mode], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout
+        return json.loads(output)
+
+    samples = [child('time') for _ in range(runs)]
+    traced = child('trace')
+    timings = [sample['seconds'] for sample in samples]
+    maxrss = max(sample['maxrss'] for sample in samples)
+    operation = {
+        'calls': runs,
+        'p50': percentile(timings, 50),
+        'p90': percentile(timings, 90),
+        'p99': percentile(timings, 99),
+        'mean': statistics.fmean(timings),
+        'alloc_peak': traced['traced_peak'],
+    }
+    return {'peak_rss': maxrss if sys.platform == 'darwin' else maxrss * 1024, 'operations': {'import': operation}}
+
+
+def run_child(kind, scale, args):
+    """Run one scale in a fresh interpreter, so its peak RSS is not shared with the others"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', f"{kind}:{scale}",
+               '--repeat', str(args.repeat), '--alloc-calls', str(args.alloc_calls)]
+    return json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', '-C', ROOT, 'rev-parse', '--short', 'HEAD'], check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_scale(label, result):
+    print(f"\n{label}  (peak RSS {result['peak_rss'] / 2 ** 20:.0f} MiB"
+          + (f", compiled in {result['compile_seconds']:.2f}s" if 'compile_seconds' in result else '') + ")")
+    for name, operation in result['operations'].items():
+        alloc = ''
+        if 'alloc_peak' in operation:
+            alloc = f"  {operation['alloc_peak'] / 1024:10.1f} KiB"
+            if 'alloc_per_call' in operation:
+                alloc += f"  {operation['alloc_per_call']:9.1f} B"
+        print(f"  {name:<20} {operation['p50'] * 1e6:12.2f} {operation['p90'] * 1e6:12.2f} "
+              f"{operation['p99'] * 1e6:12.2f}{alloc}")
+
+
+def compare(results, baseline, metric, threshold, min_delta):
+    """Regressions of ``metric`` beyond ``threshold`` (relative) and ``min_delta`` seconds"""
+    regressions = []
+    for scale, result in results.items():
+        for name, operation in result['operations'].items():
+            before = baseline.get(scale, {}).get('operations', {}).get(name)
+            if before is None:
+                continue
+            old, new = before[metric], operation[metric]
+            if new > old * (1 + threshold) and new - old > min_delta:
+                regressions.append((scale, name, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,100000', help="Corpus sizes, e.g. 1000,100000,1000000,10000000")
+    parser.add_argument('--history', default='1000,100000', help="Post-history lengths")
+    parser.add_argument('--repeat', type=int, default=2000, help="Timed calls per operation")
+    parser.add_argument('--alloc-calls', type=int, default=200, help="Calls per operation under tracemalloc (0 to skip)")
+    parser.add_argument('--import-runs', type=int, default=10)
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Results file of an earlier run to check for regressions")
+    parser.add_argument('--metric', choices=['p50', 'p90', 'p99', 'mean'], default='p50')
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative slowdown (0.25 = 25%%)")
+    parser.add_argument('--min-delta-us', type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many microseconds")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        kind, scale = args.child.split(':')
+        bench = bench_quotes if kind == 'quotes' else bench_history
+        print(json.dumps(bench(int(scale), args.repeat, args.alloc_calls)))
+        return
+
+    scales = [('import', None)]
+    scales += [('quotes', int(size)) for size in args.sizes.split(',') if size]
+    scales += [('history', int(rows)) for rows in args.history.split(',') if rows]
+
+    print(f"{'operation':<22} {'p50 us':>12} {'p90 us':>12} {'p99 us':>12}  {'alloc peak':>14}  {'held/call':>11}")
+    results = {}
+    for kind, scale in scales:
+        label = kind if scale is None else f"{kind}={scale}"
+        results[label] = bench_import(args.import_runs) if scale is None else run_child(kind, scale, args)
+        print_scale(label, results[label])
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.time(),
+        'args': {key: value for key, value in vars(args).items() if key in ('sizes', 'history', 'repeat', 'alloc_calls')},
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline['results'], args.metric, args.threshold, args.min_delta_us / 1e6)
+        print(f"\nCompared {args.metric} with {args.compare} (revision {baseline.get('revision') or 'unknown'}, "
+              f"threshold {args.threshold:.0%})")
+        for scale, name, old, new in regressions:
+            print(f"  REGRESSION {scale} {name}: {old * 1e6:.2f} us -> {new * 1e6:.2f} us ({new / old - 1:+.0%})")
+        if regressions:
+            raise SystemExit(1)
+        print("  No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Shared helpers for the benchmark scripts"""
+
+import os
+import random
+import sys
+import time
+
+# Benchmarks run from a checkout, so make the bot modules importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Roughly the keyword density of data/quotes.json: most words are neutral
+WORDS = (
+    "success achieve growth learning dream goal pushing failure challenge overcome "
+    "you your the a an is are be never stop keep moving forward today tomorrow "
+    "habit focus discipline courage patience progress effort mindset and or but "
+    "not only every day life work time people what when who how it that this "
+    "will can do make take start step small big hard easy strong mind heart "
+    "world future past now one more less than nothing everything always"
+).split()
+
+
+def iter_synthetic_quotes(count, seed=0):
+    """Yield ``count`` distinct quote-like strings without holding them all"""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield f"{' '.join(rng.choices(WORDS, k=rng.randint(6, 24))).capitalize()}. #{i}"
+
+
+def synthetic_quotes(count, seed=0):
+    """Build ``count`` distinct quote-like strings"""
+    return list(iter_synthetic_quotes(count, seed))
+
+
+def source_quotes(path, count):
+    """Repeat the quotes of a real source file until there are ``count`` of them"""
+    from corpus import read_source_quotes
+
+    quotes = read_source_quotes(path)
+    return [quotes[i % len(quotes)] for i in range(count)]
+
+
+def time_calls(func, repeat):
+    """Call ``func`` ``repeat`` times and return per-call latencies in seconds"""
+    timings = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        start = clock()
+        func()
+        timings.append(clock() - start)
+    return timings
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def format_us(seconds):
+    return f"{seconds * 1e6:9.2f} us"
@@ -0,0 +1,285 @@
+"""Quote image cards, rendered ahead of time into a content-addressed cache
+
+A card is a PNG of the quote set on a template (size, colours, fonts; see
+:data:`TEMPLATES`). Cards are rendered with Pillow (10.1 or later, for
+scalable default fonts), which is only imported when cards are actually
+drawn, in a process pool by :func:`render_cards`, so pre-rendering a large
+corpus uses every core and posting never waits on it.
+
+:class:`CardCache` names each file after the quote's key and a digest of the
+template, so a quote edit or a template change simply misses and the old
+card ages out. Fetching a cached card is one ``open()``; its mtime is bumped
+through the open file and serves as the LRU clock when the cache grows past
+``max_bytes`` and :meth:`CardCache.evict` trims the least recently used.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from quote_deck import quote_key
+
+logger = logging.getLogger(__name__)
+
+# Bump when the drawing code changes so every cached card is re-rendered
+CARD_VERSION = 1
+DEFAULT_TEMPLATE = 'classic'
+DEFAULT_CACHE_BYTES = 512 << 20
+# Eviction trims the cache to this share of max_bytes, so it does not run on every render
+EVICT_TO = 0.9
+# Attribution after " - " at most this long goes on its own line
+MAX_AUTHOR_LENGTH = 48
+CARDS_AHEAD = 30
+# ImageFont.load_default(size) needs Pillow 10.1
+MIN_PILLOW_VERSION = (10, 1)
+
+TEMPLATES = {
+    'classic': {
+        'size': (1200, 675),
+        'background': '#14213d',
+        'foreground': '#ffffff',
+        'accent': '#fca311',
+        'fonts': ['DejaVuSans-Bold.ttf', 'Arial Bold.ttf', 'arialbd.ttf'],
+        'max_font_size': 64,
+        'min_font_size': 28,
+        'margin': 96,
+        'line_spacing': 1.3,
+    },
+    'light': {
+        'size': (1080, 1080),
+        'background': '#fdf6e3',
+        'foreground': '#222222',
+        'accent': '#2a9d8f',
+        'fonts': ['DejaVuSerif.ttf', 'Georgia.ttf', 'georgia.ttf'],
+        'max_font_size': 72,
+        'min_font_size': 30,
+        'margin': 110,
+        'line_spacing': 1.35,
+    },
+}
+
+
+@functools.lru_cache(maxsize=None)
+def template_digest(template):
+    """Short digest of a template's settings and the renderer version"""
+    settings = json.dumps([CARD_VERSION, template, TEMPLATES[template]], sort_keys=True)
+    return hashlib.blake2b(settings.encode('utf-8'), digest_size=6).hexdigest()
+
+
+def card_name(quote, template=DEFAULT_TEMPLATE):
+    """File name of a quote's card: quote key, then template digest"""
+    return f"{quote_key(quote):016x}-{template_digest(template)}.png"
+
+
+def require_pillow():
+    """Raise ImportError with what to install unless a recent enough Pillow is available"""
+    wanted = '.'.join(map(str, MIN_PILLOW_VERSION))
+    try:
+        import PIL
+    except ImportError:
+        raise ImportError(f"image cards need Pillow>={wanted} (pip install 'Pillow>={wanted}')") from None
+    version = tuple(int(part) for part in PIL.__version__.split('.')[:2] if part.isdigit())
+    if version < MIN_PILLOW_VERSION:
+        raise ImportError(f"image cards need Pillow>={wanted}, found {PIL.__version__} "
+                          f"(pip install --upgrade 'Pillow>={wanted}')")
+
+
+@functools.lru_cache(maxsize=64)
+def _font(fonts, size):
+    from PIL import ImageFont
+
+    for name in fonts:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def _wrap(text, font, width):
+    lines = []
+    for paragraph in text.split('\n'):
+        line = ''
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def split_attribution(quote):
+    """``(text, author)`` for a quote ending in ``" - Author"``, else ``(quote, None)``"""
+    text, separator, author = quote.rpartition(' - ')
+    if separator and text.strip() and 0 < len(author.strip()) <= MAX_AUTHOR_LENGTH:
+        return text.strip(), author.strip()
+    return quote.strip(), None
+
+
+def render_card(quote, template=DEFAULT_TEMPLATE):
+    """PNG bytes of ``quote`` drawn on ``template``
+
+    The text gets the largest font size, down to the template's minimum,
+    at which it fits; below that it is cut short with an ellipsis.
+    """
+    from PIL import Image, ImageDraw
+
+    settings = TEMPLATES[template]
+    width, height = settings['size']
+    margin = settings['margin']
+    fonts = tuple(settings['fonts'])
+    text, author = split_attribution(quote)
+    text_width = width - 2 * margin
+    author_font = _font(fonts, settings['min_font_size']) if author else None
+    author_height = int(settings['min_font_size'] * 2) if author else 0
+    text_height = height - 2 * margin - author_height
+
+    for size in range(settings['max_font_size'], settings['min_font_size'] - 1, -4):
+        font = _font(fonts, size)
+        line_height = int(size * settings['line_spacing'])
+        lines = _wrap(text, font, text_width)
+        if len(lines) * line_height <= text_height:
+            break
+    else:
+        lines = lines[:max(1, text_height // line_height)]
+        lines[-1] = lines[-1].rstrip('.,;: ') + '…'
+
+    image = Image.new('RGB', (width, height), settings['background'])
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((margin, margin - 32, margin + 120, margin - 24), fill=settings['accent'])
+    top = margin + (text_height - len(lines) * line_height) // 2
+    for number, line in enumerate(lines):
+        draw.text((margin, top + number * line_height), line, font=font, fill=settings['foreground'])
+    if author:
+        label = f"— {author}"
+        draw.text((width - margin - author_font.getlength(label), height - margin - settings['min_font_size']),
+                  label, font=author_font, fill=settings['accent'])
+
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+class CardCache:
+    """Content-addressed store of rendered cards, bounded to ``max_bytes`` by LRU eviction"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, quote, template=DEFAULT_TEMPLATE):
+        name = card_name(quote, template)
+        return os.path.join(self.directory, name[:2], name)
+
+    def has(self, quote, template=DEFAULT_TEMPLATE):
+        return os.path.exists(self.path(quote, template))
+
+    def open(self, quote, template=DEFAULT_TEMPLATE):
+        """The cached card as an open binary file, or None if it has not been rendered"""
+        try:
+            file = open(self.path(quote, template), 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            # Mark it used through the open descriptor; mtime is the LRU clock
+            os.utime(file.fileno())
+        except OSError:
+            pass
+        return file
+
+    def put(self, quote, template, data):
+        """Store a rendered card atomically; returns its size"""
+        path = self.path(quote, template)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Workers may render the same card at once; each writes its own temporary file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def entries(self):
+        """``(mtime, size, path)`` of every cached card"""
+        entries = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Delete the least recently used cards while the cache is over ``max_bytes``; returns how many"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        logger.info("Evicted %d cards from %s", evicted, self.directory)
+        return evicted
+
+
+class RenderResult:
+    def __init__(self, rendered=0, cached=0, evicted=0, bytes_written=0, seconds=0.0):
+        self.rendered = rendered
+        self.cached = cached
+        self.evicted = evicted
+        self.bytes_written = bytes_written
+        self.seconds = seconds
+
+    def __repr__(self):
+        return (f"RenderResult(rendered={self.rendered}, cached={self.cached}, evicted={self.evicted}, "
+                f"seconds={self.seconds:.2f})")
+
+
+def _render_into(directory, template, quote):
+    # Module level so the process pool can pickle it
+    return CardCache(directory).put(quote, template, render_card(quote, template))
+
+
+def render_cards(quotes, cache, template=DEFAULT_TEMPLATE, workers=None, chunksize=None):
+    """Render the cards of ``quotes`` that are not cached yet, in ``workers`` processes
+
+    ``workers`` defaults to one per CPU; with 1 the cards are drawn in this
+    process. Returns a :class:`RenderResult`; raises ImportError (see
+    :func:`require_pillow`) before drawing anything if Pillow is missing or
+    too old.
+    """
+    require_pillow()
+    started = time.perf_counter()
+    quotes = list(dict.fromkeys(quotes))
+    missing = [quote for quote in quotes if not cache.has(quote, template)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(missing) > 1:
+        chunksize = chunksize or max(1, min(256, len(missing) // (workers * 8)))
+        with ProcessPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+            sizes = list(executor.map(_render_into, repeat(cache.directory), repeat(template), missing,
+                                      chunksize=chunksize))
+    else:
+        sizes = [_render_into(cache.directory, template, quote) for quote in missing]
+    evicted = cache.evict()
+    return RenderResult(len(missing), len(quotes) - len(missing), evicted, sum(sizes), time.perf_counter() - started)
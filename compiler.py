@@ -0,0 +1,380 @@
+"""Corpus compiler: turns the editable quote sources into one compiled artifact
+
+Each source file is compiled on its own into a cached per-source corpus that
+already carries the per-quote columns the bot needs at post time:
+
+* ``KEYS`` content hash of the quote (see ``quote_deck.quote_key``)
+* ``HOOK`` engagement hook category (uint8, see ``hooks``)
+* ``WLEN`` weighted tweet length (uint16, see ``tweet_text``)
+* ``FITS`` bitmask of the category's hooks that fit next to the quote (uint32)
+* ``TRIM`` pre-trimmed text for quotes too long to post whole (JSON)
+* ``LSHB`` near-duplicate band keys (uint64 x ``near_duplicates.BANDS``, cache only)
+
+Together ``FITS`` and ``TRIM`` are the render cache: every quote-and-hook
+combination is validated against the weighted 280 limit here, so the post
+path only picks a hook from the mask instead of building and trimming text.
+
+A source is recompiled only when its SHA-256 changes (or the hook tables do), and then only its new quotes
+are classified and signed; the rest are copied from its last cache. The per-source caches
+are then merged, deduplicated by quote key, into the final corpus. Near-duplicates (see
+``near_duplicates``) are dropped in the merge too, keeping the earliest quote of each cluster, and
+listed in a JSON report when a ``report_path`` is given.
+
+:class:`PollCompiler` runs polls through the same pipeline, validating each
+one against X's poll limits (see ``polls``) on the way in.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from array import array
+from itertools import compress
+
+from corpus import QuoteCorpus, corpus_keys, pack_column, read_source_quotes, write_corpus
+from hooks import HOOKS, classify_batch, hooks_digest
+from near_duplicates import BANDS, NEAR_DUPLICATE_THRESHOLD, cluster_report, find_clusters, lsh_keys
+from polls import OPTION_SEPARATOR, read_source_polls, validate_poll
+from tweet_text import MAX_TWEET_LENGTH, hook_fits, truncate_to_fit, weighted_length
+
+logger = logging.getLogger(__name__)
+
+# Bump when the compiled columns change meaning so every source is rebuilt
+COMPILER_VERSION = 4
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fit_masks():
+    """Memoized (category, quote length) -> mask of hooks that fit"""
+    hook_lengths = [[weighted_length(hook) for hook in hooks] for hooks in HOOKS]
+    masks = {}
+
+    def mask_for(category, length):
+        key = (category, length)
+        if key not in masks:
+            masks[key] = sum(
+                1 << bit for bit, hook_length in enumerate(hook_lengths[category])
+                if hook_fits(length, hook_length)
+            )
+        return masks[key]
+
+    return mask_for
+
+
+# Per-quote cache columns: typecode and values per quote
+QUOTE_COLUMNS = {'HOOK': ('B', 1), 'WLEN': ('H', 1), 'FITS': ('I', 1), 'LSHB': ('Q', BANDS)}
+
+
+def _compute_columns(quotes):
+    categories = classify_batch(quotes)
+    lengths = [min(weighted_length(quote), 0xFFFF) for quote in quotes]
+    mask_for = _fit_masks()
+    masks = [mask_for(category, length) for category, length in zip(categories, lengths)]
+    return {
+        'HOOK': array('B', categories),
+        'WLEN': array('H', lengths),
+        'FITS': array('I', masks),
+        'LSHB': lsh_keys(quotes),
+    }
+
+
+def quote_columns(quotes, previous=None):
+    """Precompute the per-quote sections for ``quotes``
+
+    ``previous`` is the last cache of the same source: quotes it already
+    holds get their values copied from it, so an edit that adds or changes
+    a few quotes only classifies and signs those.
+    """
+    if previous is None:
+        columns = _compute_columns(quotes)
+    else:
+        columns = _reuse_columns(quotes, previous)
+    return {name: pack_column(columns[name], typecode) for name, (typecode, _) in QUOTE_COLUMNS.items()}
+
+
+def _reuse_columns(quotes, previous):
+    with QuoteCorpus(previous) as cached:
+        old_keys = cached.keys()
+        old = {name: cached.column(name, typecode) for name, (typecode, _) in QUOTE_COLUMNS.items()}
+    positions = None
+    rows = []
+    for index, key in enumerate(corpus_keys(quotes)):
+        # Quotes mostly stay where they were; look the others up
+        if index < len(old_keys) and old_keys[index] == key:
+            rows.append(index)
+            continue
+        if positions is None:
+            positions = {old_key: position for position, old_key in enumerate(old_keys)}
+        rows.append(positions.get(key))
+    fresh = _compute_columns([quote for quote, row in zip(quotes, rows) if row is None])
+
+    columns = {}
+    for name, (typecode, width) in QUOTE_COLUMNS.items():
+        values = array(typecode)
+        computed = 0
+        for row in rows:
+            if row is None:
+                values.extend(fresh[name][computed * width:(computed + 1) * width])
+                computed += 1
+            else:
+                values.extend(old[name][row * width:(row + 1) * width])
+        columns[name] = values
+    logger.debug("Compiled %d new quotes, reused %d", computed, len(rows) - computed)
+    return columns
+
+
+class CompileResult:
+    def __init__(self, path, quotes, duplicates, rebuilt, skipped, rejected=(), near_duplicates=0):
+        self.path = path
+        self.quotes = quotes
+        self.duplicates = duplicates
+        self.rebuilt = rebuilt
+        self.skipped = skipped
+        self.rejected = list(rejected)
+        self.near_duplicates = near_duplicates
+
+    def __repr__(self):
+        return (f"CompileResult(quotes={self.quotes}, duplicates={self.duplicates}, "
+                f"near_duplicates={self.near_duplicates}, rebuilt={self.rebuilt}, skipped={self.skipped})")
+
+
+class CorpusCompiler:
+    """Incrementally compile quote sources into a single corpus file
+
+    ``near_threshold`` is the similarity at which quotes count as
+    near-duplicates (None keeps them all).
+    """
+
+    def __init__(self, sources, output, cache_dir='data/.compile-cache', near_threshold=NEAR_DUPLICATE_THRESHOLD,
+                 report_path=None):
+        self.sources = list(sources)
+        self.output = output
+        self.cache_dir = cache_dir
+        self.near_threshold = near_threshold
+        self.report_path = report_path
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {'version': COMPILER_VERSION, 'sources': {}}
+        if manifest.get('version') != COMPILER_VERSION or manifest.get('hooks') != hooks_digest():
+            return {'version': COMPILER_VERSION, 'sources': {}}
+        return manifest
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _cache_path(self, source):
+        name = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{name}.corpus")
+
+    def compile_source(self, source, cache_path, previous=None):
+        """Compile one source file into its cached per-source corpus
+
+        ``previous`` is the source's last cache, if it is still valid.
+        """
+        quotes = read_source_quotes(source)
+        write_corpus(cache_path, quotes, quote_columns(quotes, previous))
+        return len(quotes)
+
+    def compile(self, force=False):
+        """Rebuild changed sources and write the merged corpus"""
+        manifest = self._load_manifest()
+        previous = manifest['sources']
+        current = {}
+        rebuilt = []
+        skipped = []
+
+        for source in self.sources:
+            if not os.path.exists(source):
+                continue
+            digest = file_sha256(source)
+            cache_path = self._cache_path(source)
+            entry = previous.get(source)
+            if not force and entry and entry['sha256'] == digest and os.path.exists(cache_path):
+                skipped.append(source)
+            else:
+                # The manifest resets when the compiler or hooks change, and with it what a cache may reuse
+                reusable = not force and entry is not None and os.path.exists(cache_path)
+                count = self.compile_source(source, cache_path, cache_path if reusable else None)
+                logger.info("Compiled %s (%d quotes)", source, count)
+                rebuilt.append(source)
+            current[source] = {'sha256': digest, 'cache': cache_path}
+
+        fingerprint = hashlib.sha256(
+            json.dumps([[source, current[source]['sha256']] for source in current]
+                       + [self.near_threshold]).encode('utf-8')
+        ).hexdigest()
+        if not force and not rebuilt and manifest.get('output_fingerprint') == fingerprint \
+                and os.path.exists(self.output):
+            with QuoteCorpus(self.output) as corpus:
+                total = len(corpus)
+            logger.info("Corpus %s is up to date (%d quotes)", self.output, total)
+            return CompileResult(self.output, total, manifest.get('duplicates', 0), [], skipped,
+                                 near_duplicates=manifest.get('near_duplicates', 0))
+
+        quotes, columns, duplicates, clusters = self._merge(current[source]['cache'] for source in current)
+        near_duplicates = sum(len(cluster['dropped']) for cluster in clusters)
+        meta = {
+            'compiler_version': COMPILER_VERSION,
+            'built_at': int(time.time()),
+            'sources': {source: current[source]['sha256'] for source in current},
+        }
+        columns['META'] = json.dumps(meta).encode('utf-8')
+        write_corpus(self.output, quotes, columns)
+
+        manifest = {
+            'version': COMPILER_VERSION,
+            'hooks': hooks_digest(),
+            'sources': current,
+            'output_fingerprint': fingerprint,
+            'duplicates': duplicates,
+            'near_duplicates': near_duplicates,
+        }
+        self._save_manifest(manifest)
+        if self.report_path:
+            self._write_report(clusters)
+        logger.info("Wrote %s (%d quotes, %d duplicates and %d near-duplicates dropped)",
+                    self.output, len(quotes), duplicates, near_duplicates)
+        return CompileResult(self.output, len(quotes), duplicates, rebuilt, skipped, near_duplicates=near_duplicates)
+
+    def _write_report(self, clusters):
+        report = {'threshold': self.near_threshold, 'clusters': clusters}
+        directory = os.path.dirname(self.report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.report_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.report_path)
+
+    def _merge(self, cache_paths):
+        quotes = []
+        categories = bytearray()
+        lengths = array('H')
+        masks = array('I')
+        bands = array('Q')
+        seen = set()
+        duplicates = 0
+        for cache_path in cache_paths:
+            with QuoteCorpus(cache_path) as cached:
+                keys = cached.keys()
+                hook_categories = cached.section('HOOK')
+                wlens = cached.column('WLEN', 'H')
+                fits = cached.column('FITS', 'I')
+                lsh = cached.column('LSHB', 'Q')
+                for index, key in enumerate(keys):
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                    quotes.append(cached[index])
+                    categories.append(hook_categories[index])
+                    lengths.append(wlens[index])
+                    masks.append(fits[index])
+                    bands.extend(lsh[index * BANDS:(index + 1) * BANDS])
+
+        clusters = find_clusters(quotes, bands, self.near_threshold) if self.near_threshold is not None else {}
+        report = cluster_report(quotes, clusters)
+        if clusters:
+            dropped = {index for members in clusters.values() for index in members}
+            kept = [index not in dropped for index in range(len(quotes))]
+            quotes = list(compress(quotes, kept))
+            categories = bytearray(compress(categories, kept))
+            lengths = array('H', compress(lengths, kept))
+            masks = array('I', compress(masks, kept))
+
+        trimmed = {
+            str(index): truncate_to_fit(quotes[index])
+            for index, length in enumerate(lengths) if length > MAX_TWEET_LENGTH
+        }
+        columns = {
+            'HOOK': bytes(categories),
+            'WLEN': pack_column(lengths, 'H'),
+            'FITS': pack_column(masks, 'I'),
+            'TRIM': json.dumps(trimmed, ensure_ascii=False).encode('utf-8'),
+        }
+        return quotes, columns, duplicates, report
+
+
+def poll_columns(polls):
+    """Options of each poll as the OOFF/OPTS sections"""
+    encoded = [OPTION_SEPARATOR.join(poll['options']).encode('utf-8') for poll in polls]
+    offsets = [0]
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+    return {'OOFF': pack_column(offsets, 'Q'), 'OPTS': b''.join(encoded)}
+
+
+class PollCompiler(CorpusCompiler):
+    """Compile poll sources into a poll corpus, rejecting polls X would refuse
+
+    Rejected polls are kept in a REJS section (question and reasons) so the
+    ``compile`` command can report them even when the source was cached.
+    """
+
+    def compile_source(self, source, cache_path, previous=None):
+        polls = []
+        rejected = []
+        for poll in read_source_polls(source):
+            problems = validate_poll(poll)
+            if problems:
+                rejected.append({'source': source, 'question': poll.get('question'), 'problems': problems})
+                logger.warning("Rejected poll %r from %s: %s", poll.get('question'), source, '; '.join(problems))
+                continue
+            polls.append({'question': poll['question'].strip(),
+                          'options': [option.strip() for option in poll['options']]})
+        columns = poll_columns(polls)
+        columns['REJS'] = json.dumps(rejected, ensure_ascii=False).encode('utf-8')
+        write_corpus(cache_path, [poll['question'] for poll in polls], columns)
+        return len(polls)
+
+    def compile(self, force=False):
+        result = super().compile(force=force)
+        with QuoteCorpus(self.output) as corpus:
+            result.rejected = json.loads(corpus.section('REJS')) if corpus.has_section('REJS') else []
+        return result
+
+    def _merge(self, cache_paths):
+        polls = []
+        rejected = []
+        seen = set()
+        duplicates = 0
+        for cache_path in cache_paths:
+            with QuoteCorpus(cache_path) as cached:
+                rejected.extend(json.loads(cached.section('REJS')))
+                for index, key in enumerate(cached.keys()):
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                    polls.append({'question': cached[index], 'options': cached.poll_options(index)})
+        columns = poll_columns(polls)
+        columns['REJS'] = json.dumps(rejected, ensure_ascii=False).encode('utf-8')
+        return [poll['question'] for poll in polls], columns, duplicates, []
+
+
+def compile_corpus(sources, output, cache_dir='data/.compile-cache', force=False,
+                   near_threshold=NEAR_DUPLICATE_THRESHOLD, report_path=None):
+    """Compile ``sources`` into ``output``; see :class:`CorpusCompiler`"""
+    return CorpusCompiler(sources, output, cache_dir, near_threshold, report_path).compile(force=force)
+
+
+def compile_polls(sources, output, cache_dir='data/.compile-cache/polls', force=False):
+    """Compile poll ``sources`` into ``output``; see :class:`PollCompiler`"""
+    return PollCompiler(sources, output, cache_dir).compile(force=force)
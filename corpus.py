@@ -0,0 +1,264 @@
+"""Compact memory-mapped quote corpus
+
+A compiled corpus is a single file laid out as::
+
+    header    magic, version, quote count, section count
+    sections  table of (name, offset, length) entries
+    OFFS      count + 1 little-endian uint64 offsets into TEXT
+    TEXT      every quote as UTF-8, back to back
+    KEYS      one uint64 quote key per quote (see quote_deck.quote_key)
+    KFPR      fingerprint of KEYS (see quote_deck.keys_fingerprint)
+    ...       optional per-quote columns added by the compiler
+
+Poll corpora use the same layout with the question as the text, plus
+``OOFF``/``OPTS``: offsets into, and the options of each poll joined by
+``\x1f``.
+
+Quote ``i`` is ``TEXT[OFFS[i]:OFFS[i + 1]]``, so fetching one quote reads two
+integers and one slice of the memory map; nothing else is parsed. The raw
+``quotes.json`` / ``quotes.txt`` files stay the editable sources and are
+imported into this format with :func:`import_sources`.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from quote_deck import keys_fingerprint, quote_key
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'QCRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+SECTION = struct.Struct('<4sQQ')
+OFFSET = struct.Struct('<Q')
+OFFSET_PAIR = struct.Struct('<QQ')
+UINT16 = struct.Struct('<H')
+UINT32 = struct.Struct('<I')
+
+
+class CorpusFormatError(ValueError):
+    """Raised when a compiled corpus file is malformed"""
+
+
+def pack_column(values, typecode):
+    """Pack integers into a little-endian column section"""
+    values = array(typecode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_column(data, typecode):
+    """Inverse of :func:`pack_column`"""
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def read_source_quotes(path):
+    """Read quotes from a JSON (``{"quotes": [...]}`` or list) or one-per-line text source"""
+    with open(path, 'r', encoding='utf-8') as file:
+        if path.endswith('.json'):
+            data = json.load(file)
+            quotes = data['quotes'] if isinstance(data, dict) else data
+        else:
+            quotes = file.read().splitlines()
+    return [quote.strip() for quote in quotes if isinstance(quote, str) and quote.strip()]
+
+
+def import_sources(paths):
+    """Load and concatenate quotes from every existing source file, dropping exact duplicates"""
+    quotes = []
+    seen = set()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        for quote in read_source_quotes(path):
+            if quote not in seen:
+                seen.add(quote)
+                quotes.append(quote)
+    return quotes
+
+
+def write_corpus(path, quotes, sections=None):
+    """Write ``quotes`` to ``path`` in the compiled corpus format
+
+    ``sections`` maps extra 4-byte section names to raw bytes that are stored
+    alongside the text (per-quote columns, metadata, ...).
+    """
+    encoded = [quote.encode('utf-8') for quote in quotes]
+    offsets = array('Q', [0])
+    total = 0
+    for blob in encoded:
+        total += len(blob)
+        offsets.append(total)
+
+    keys = array('Q', (quote_key(quote) for quote in quotes))
+    payloads = [
+        (b'OFFS', pack_column(offsets, 'Q')),
+        (b'TEXT', b''.join(encoded)),
+        (b'KEYS', pack_column(keys, 'Q')),
+        (b'KFPR', keys_fingerprint(keys).encode('ascii')),
+    ]
+    for name, data in (sections or {}).items():
+        name = name.encode('ascii') if isinstance(name, str) else name
+        if len(name) != 4:
+            raise ValueError(f"Section names must be 4 bytes: {name!r}")
+        payloads.append((name, bytes(data)))
+
+    position = HEADER.size + SECTION.size * len(payloads)
+    table = []
+    for name, data in payloads:
+        table.append(SECTION.pack(name, position, len(data)))
+        position += len(data)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(encoded), len(payloads)))
+        file.writelines(table)
+        for _, data in payloads:
+            file.write(data)
+    os.replace(tmp_path, path)
+
+
+class QuoteCorpus:
+    """Read-only, memory-mapped view of a compiled corpus"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise CorpusFormatError(f"{path}: file too small")
+        magic, version, _, count, section_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise CorpusFormatError(f"{path}: not a version {VERSION} quote corpus")
+
+        self._count = count
+        self._trimmed = None
+        self._option_offsets = None
+        self._sections = {}
+        for index in range(section_count):
+            name, offset, length = SECTION.unpack_from(self._mmap, HEADER.size + index * SECTION.size)
+            if offset + length > len(self._mmap):
+                raise CorpusFormatError(f"{path}: section {name!r} runs past end of file")
+            self._sections[name.decode('ascii')] = (offset, length)
+
+        self._offsets_base = self._sections['OFFS'][0]
+        self._text_base = self._sections['TEXT'][0]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("quote index out of range")
+        start, end = OFFSET_PAIR.unpack_from(self._mmap, self._offsets_base + index * OFFSET.size)
+        base = self._text_base
+        return self._mmap[base + start:base + end].decode('utf-8')
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def has_section(self, name):
+        return name in self._sections
+
+    def section(self, name):
+        """Raw bytes of a named section"""
+        offset, length = self._sections[name]
+        return self._mmap[offset:offset + length]
+
+    def column(self, name, typecode):
+        """A per-quote column section as an ``array``"""
+        return unpack_column(self.section(name), typecode)
+
+    def keys(self):
+        """Quote keys as an ``array('Q')``, one per quote"""
+        return self.column('KEYS', 'Q')
+
+    def fingerprint(self):
+        """Fingerprint of the quote keys, read from the corpus (computed for one compiled without it)"""
+        if 'KFPR' in self._sections:
+            return self.section('KFPR').decode('ascii')
+        return keys_fingerprint(self.keys())
+
+    def hook_category(self, index):
+        """Precompiled hook category of quote ``index``, or None if not compiled in"""
+        if 'HOOK' not in self._sections:
+            return None
+        return self._mmap[self._sections['HOOK'][0] + index]
+
+    def weighted_length(self, index):
+        """Precompiled weighted tweet length of quote ``index``, or None if not compiled in"""
+        if 'WLEN' not in self._sections:
+            return None
+        return UINT16.unpack_from(self._mmap, self._sections['WLEN'][0] + index * UINT16.size)[0]
+
+    def hook_mask(self, index):
+        """Bitmask of the hooks that fit alongside quote ``index``, or None if not compiled in"""
+        if 'FITS' not in self._sections:
+            return None
+        return UINT32.unpack_from(self._mmap, self._sections['FITS'][0] + index * UINT32.size)[0]
+
+    def trimmed(self, index):
+        """Pre-trimmed text for a quote too long to post whole, or None"""
+        if self._trimmed is None:
+            self._trimmed = json.loads(self.section('TRIM')) if 'TRIM' in self._sections else {}
+        return self._trimmed.get(str(index))
+
+    def poll_options(self, index):
+        """Options of poll ``index`` in a compiled poll corpus, or None if not compiled in"""
+        if 'OPTS' not in self._sections:
+            return None
+        if self._option_offsets is None:
+            self._option_offsets = self.column('OOFF', 'Q')
+        offset = self._sections['OPTS'][0]
+        start, end = self._option_offsets[index], self._option_offsets[index + 1]
+        return self._mmap[offset + start:offset + end].decode('utf-8').split('\x1f')
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def corpus_keys(quotes):
+    """Quote keys for a compiled corpus or a plain list of quotes"""
+    if isinstance(quotes, QuoteCorpus):
+        return quotes.keys()
+    return array('Q', (quote_key(quote) for quote in quotes))
+
+
+def corpus_fingerprint(quotes):
+    """Fingerprint of :func:`corpus_keys`, without reading the keys of a compiled corpus"""
+    if isinstance(quotes, QuoteCorpus):
+        return quotes.fingerprint()
+    return keys_fingerprint(corpus_keys(quotes))
+
+
+def is_stale(corpus_path, source_paths):
+    """True if the compiled corpus is missing or older than any source file"""
+    try:
+        built = os.path.getmtime(corpus_path)
+    except OSError:
+        return True
+    return any(os.path.exists(path) and os.path.getmtime(path) > built for path in source_paths)
@@ -0,0 +1,374 @@
+"""Engagement metrics of posted tweets, harvested into a local columnar file
+
+:class:`EngagementHarvester` reads back the ``public_metrics`` (likes,
+retweets, replies, quotes, impressions, bookmarks) of the tweets in the post
+history, 100 ids per ``get_tweets`` call, through the shared rate limiter.
+New posts are picked up from a cursor on the history, and a tweet is only
+refetched while its numbers can still move: the refresh interval grows with
+its age, and it is settled for good once it is :data:`SETTLE_AFTER` old or
+a refresh after its first day changed nothing.
+
+:class:`EngagementStore` keeps one row per tweet in ``engagement.cols``, a
+file in the compiled corpus layout (header, section table, one
+little-endian column per section), so months of history load as a handful
+of ``array`` reads and aggregate in milliseconds::
+
+    TWID  tweet id (uint64)         QKEY  quote key (uint64)
+    KIND  0 quote, 1 poll (uint8)   HOOK  hook id, 0 for none (uint16)
+    POST  posted at (float64)       FETC  last fetched at, 0 never (float64)
+    FLAG  GONE / SETTLED (uint8)    LIKE RTWT RPLY QUOT IMPR BKMK  (uint32)
+    META  JSON: history cursor, hook id -> hook text
+"""
+
+import json
+import logging
+import os
+import struct
+import time
+from array import array
+
+from corpus import HEADER, SECTION, CorpusFormatError, pack_column, unpack_column
+from hooks import HOOKS
+from metrics import NULL_METRICS
+from rate_limit import RateLimitExhausted, RetryPolicy, call_with_retries
+from tweet_text import HOOK_SEPARATOR
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ENGM'
+VERSION = 1
+
+READ_ENDPOINT = 'GET /2/tweets'
+# The most ids one get_tweets call accepts
+BATCH_SIZE = 100
+
+# public_metrics field -> column
+METRIC_COLUMNS = {
+    'like_count': 'LIKE',
+    'retweet_count': 'RTWT',
+    'reply_count': 'RPLY',
+    'quote_count': 'QUOT',
+    'impression_count': 'IMPR',
+    'bookmark_count': 'BKMK',
+}
+# Interactions counted as engagement (impressions are the denominator)
+ENGAGEMENT_COLUMNS = ('LIKE', 'RTWT', 'RPLY', 'QUOT', 'BKMK')
+
+COLUMNS = {
+    'TWID': 'Q', 'QKEY': 'Q', 'KIND': 'B', 'HOOK': 'H', 'POST': 'd', 'FETC': 'd', 'FLAG': 'B',
+    **{column: 'I' for column in METRIC_COLUMNS.values()},
+}
+KINDS = ['quote', 'poll']
+
+GONE = 1      # deleted or no longer visible; never refetched
+SETTLED = 2   # old enough, or stopped changing; never refetched
+
+# Tweets collect nearly all their engagement in the first days
+SETTLE_AFTER = 14 * 86400
+# Shortest gap between two fetches of a tweet; older tweets wait a quarter of their age
+MIN_REFRESH = 3600
+# A refresh that changes nothing settles a tweet once it is this old
+STABLE_AFTER = 86400
+
+_KNOWN_HOOKS = {hook for hooks in HOOKS for hook in hooks}
+_UINT32_MAX = 0xFFFFFFFF
+
+
+def tweet_hook(text):
+    """The engagement hook a posted tweet ends with, or None"""
+    _, separator, tail = (text or '').rpartition(HOOK_SEPARATOR)
+    return tail if separator and tail in _KNOWN_HOOKS else None
+
+
+class EngagementStore:
+    """One row of engagement columns per posted tweet, persisted to ``path``"""
+
+    def __init__(self, path):
+        self.path = path
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.cursor = 0
+        self.hooks = []
+        self._rows = None
+        self._hook_ids = None
+
+    @classmethod
+    def load(cls, path):
+        """Read the store at ``path``; an empty store if there is none yet"""
+        store = cls(path)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return store
+        try:
+            magic, version, _, count, section_count = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION:
+                raise CorpusFormatError(f"{path}: not a version {VERSION} engagement store")
+            sections = {}
+            for index in range(section_count):
+                name, offset, length = SECTION.unpack_from(data, HEADER.size + index * SECTION.size)
+                sections[name.decode('ascii')] = data[offset:offset + length]
+        except struct.error as e:
+            raise CorpusFormatError(f"{path}: truncated engagement store") from e
+
+        for name, typecode in COLUMNS.items():
+            values = unpack_column(sections[name], typecode) if name in sections else array(typecode, [0] * count)
+            if len(values) != count:
+                raise CorpusFormatError(f"{path}: column {name} has {len(values)} rows, expected {count}")
+            store.columns[name] = values
+        meta = json.loads(sections.get('META') or b'{}')
+        store.cursor = meta.get('cursor', 0)
+        store.hooks = meta.get('hooks', [])
+        return store
+
+    def save(self):
+        """Write every column back to ``path`` atomically"""
+        payloads = [(name.encode('ascii'), pack_column(self.columns[name], typecode)) for name, typecode in COLUMNS.items()]
+        meta = {'cursor': self.cursor, 'hooks': self.hooks}
+        payloads.append((b'META', json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+
+        position = HEADER.size + SECTION.size * len(payloads)
+        table = []
+        for name, data in payloads:
+            table.append(SECTION.pack(name, position, len(data)))
+            position += len(data)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, 0, len(self), len(payloads)))
+            file.writelines(table)
+            for _, data in payloads:
+                file.write(data)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.columns['TWID'])
+
+    def row(self, tweet_id):
+        """Row index of ``tweet_id``, or None"""
+        if self._rows is None:
+            self._rows = {tweet: row for row, tweet in enumerate(self.columns['TWID'])}
+        return self._rows.get(int(tweet_id))
+
+    def hook_id(self, hook):
+        if hook is None:
+            return 0
+        if self._hook_ids is None:
+            self._hook_ids = {name: number for number, name in enumerate(self.hooks, 1)}
+        number = self._hook_ids.get(hook)
+        if number is None:
+            self.hooks.append(hook)
+            number = self._hook_ids[hook] = len(self.hooks)
+        return number
+
+    def add(self, tweet_id, quote_id, kind, posted_at):
+        """Append a row for a newly posted tweet; returns its index (existing tweets keep theirs)"""
+        row = self.row(tweet_id)
+        if row is not None:
+            return row
+        row = len(self)
+        values = {'TWID': int(tweet_id), 'QKEY': quote_id, 'KIND': KINDS.index(kind) if kind in KINDS else 0,
+                  'POST': posted_at}
+        for name, column in self.columns.items():
+            column.append(values.get(name, 0))
+        self._rows[int(tweet_id)] = row
+        return row
+
+    def update(self, row, public_metrics, fetched_at, hook=None):
+        """Store a fetch of ``row``'s metrics; True if any of them changed"""
+        columns = self.columns
+        changed = False
+        for field, name in METRIC_COLUMNS.items():
+            value = min(int(public_metrics.get(field) or 0), _UINT32_MAX)
+            if columns[name][row] != value:
+                columns[name][row] = value
+                changed = True
+        if columns['FETC'][row] == 0 and hook is not None:
+            columns['HOOK'][row] = self.hook_id(hook)
+        columns['FETC'][row] = fetched_at
+        return changed
+
+    def due(self, now):
+        """Rows to fetch at ``now``: never-fetched ones first, then the stalest"""
+        posted, fetched, flags = self.columns['POST'], self.columns['FETC'], self.columns['FLAG']
+        fresh, stale = [], []
+        for row in range(len(self)):
+            if flags[row]:
+                continue
+            last = fetched[row]
+            if last == 0:
+                fresh.append(row)
+            elif now - last >= max(MIN_REFRESH, (last - posted[row]) / 4):
+                stale.append(row)
+        stale.sort(key=fetched.__getitem__)
+        return fresh + stale
+
+    def aggregate(self, by='quote', since=0.0, kind=None):
+        """Per-quote (``by='quote'``), per-hook or per-kind totals of fetched tweets posted since ``since``
+
+        Returns ``{key: [posts, impressions, engagements]}``; hooks are keyed
+        by their text (None for tweets without one). ``kind`` keeps only
+        quotes or only polls.
+        """
+        column = self.columns[{'quote': 'QKEY', 'hook': 'HOOK', 'kind': 'KIND'}[by]]
+        posted, fetched = self.columns['POST'], self.columns['FETC']
+        kinds = self.columns['KIND']
+        wanted = KINDS.index(kind) if kind is not None else None
+        impressions = self.columns['IMPR']
+        interactions = [self.columns[name] for name in ENGAGEMENT_COLUMNS]
+        totals = {}
+        for row in range(len(self)):
+            if fetched[row] == 0 or posted[row] < since or (wanted is not None and kinds[row] != wanted):
+                continue
+            entry = totals.get(column[row])
+            if entry is None:
+                entry = totals[column[row]] = [0, 0, 0]
+            entry[0] += 1
+            entry[1] += impressions[row]
+            entry[2] += sum(values[row] for values in interactions)
+        if by == 'hook':
+            return {(self.hooks[key - 1] if key else None): entry for key, entry in totals.items()}
+        if by == 'kind':
+            return {KINDS[key]: entry for key, entry in totals.items()}
+        return totals
+
+
+class HarvestResult:
+    def __init__(self):
+        self.added = 0
+        self.fetched = 0
+        self.changed = 0
+        self.gone = 0
+        self.batches = 0
+        self.remaining = 0
+        self.stopped = None
+
+    def __repr__(self):
+        return (f"HarvestResult(added={self.added}, fetched={self.fetched}, changed={self.changed}, "
+                f"gone={self.gone}, batches={self.batches}, remaining={self.remaining}, stopped={self.stopped!r})")
+
+
+class EngagementHarvester:
+    """Incrementally fetch ``public_metrics`` for the tweets in ``state_store`` into ``store``
+
+    ``client`` is a tweepy ``Client`` (or ``fake_x_api.FakeClient``);
+    reads go through ``limiter`` and ``policy`` like posts do, and a read
+    budget that will not refill within ``policy.max_wait`` ends the harvest
+    early with everything fetched so far saved.
+    """
+
+    def __init__(self, client, state_store, store, limiter, policy=None, clock=time.time, metrics=NULL_METRICS):
+        self.client = client
+        self.state_store = state_store
+        self.store = store
+        self.limiter = limiter
+        self.policy = policy or RetryPolicy()
+        self.clock = clock
+        self.metrics = metrics
+
+    def sync(self):
+        """Add rows for posts recorded since the last harvest; returns how many"""
+        added = 0
+        while True:
+            posts = self.state_store.posts_after(self.store.cursor)
+            if not posts:
+                return added
+            for post in posts:
+                try:
+                    tweet_id = int(post['tweet_id'])
+                except ValueError:
+                    continue
+                if self.store.row(tweet_id) is None:
+                    self.store.add(tweet_id, post['quote_id'], post['kind'], post['posted_at'])
+                    added += 1
+            self.store.cursor = posts[-1]['id']
+
+    def fetch(self, tweet_ids):
+        """One ``get_tweets`` call; returns (tweets, errors)"""
+        response = call_with_retries(
+            READ_ENDPOINT,
+            lambda: self.client.get_tweets(ids=tweet_ids, tweet_fields=['public_metrics'], user_auth=True),
+            self.limiter,
+            self.policy,
+            description=f"Fetching metrics of {len(tweet_ids)} tweets",
+            metrics=self.metrics
+        )
+        return response.data or [], getattr(response, 'errors', None) or []
+
+    def harvest(self, max_batches=None):
+        """Fetch every due tweet, ``BATCH_SIZE`` at a time; returns a :class:`HarvestResult`"""
+        result = HarvestResult()
+        store = self.store
+        columns = store.columns
+        try:
+            result.added = self.sync()
+            due = store.due(self.clock())
+            for start in range(0, len(due), BATCH_SIZE):
+                if max_batches is not None and result.batches >= max_batches:
+                    result.stopped = "batch limit"
+                    break
+                rows = due[start:start + BATCH_SIZE]
+                try:
+                    with self.metrics.span('harvest_fetch'):
+                        tweets, errors = self.fetch([columns['TWID'][row] for row in rows])
+                except RateLimitExhausted as e:
+                    logger.warning("Stopping the harvest: %s", e)
+                    result.stopped = str(e)
+                    break
+                result.batches += 1
+                now = self.clock()
+                for tweet in tweets:
+                    row = store.row(tweet.id)
+                    if row is None:
+                        continue
+                    first = columns['FETC'][row] == 0
+                    changed = store.update(row, tweet.public_metrics or {}, now, tweet_hook(tweet.text))
+                    result.fetched += 1
+                    result.changed += changed
+                    age = now - columns['POST'][row]
+                    if age >= SETTLE_AFTER or (not changed and not first and age >= STABLE_AFTER):
+                        columns['FLAG'][row] |= SETTLED
+                for error in errors:
+                    row = store.row(error.get('resource_id') or error.get('value') or 0)
+                    if row is not None:
+                        columns['FLAG'][row] |= GONE
+                        columns['FETC'][row] = now
+                        result.gone += 1
+            result.remaining = len(store.due(self.clock()))
+        finally:
+            store.save()
+            self.limiter.save()
+        self.metrics.increment('engagement_fetched', result.fetched)
+        return result
+
+
+def format_report(store, quote_text=None, top=5, since=0.0):
+    """Engagement per kind, per hook and for the best and worst quotes, as printable lines
+
+    ``quote_text(quote_key)`` looks up a quote's text for display.
+    """
+    def rate(entry):
+        return entry[2] / entry[1] if entry[1] else 0.0
+
+    def line(label, entry):
+        return f"  {rate(entry):6.2%}  {entry[0]:5,} posts  {entry[1]:10,} impressions  {label}"
+
+    lines = []
+    kinds = store.aggregate('kind', since)
+    if not kinds:
+        return ["No engagement metrics harvested yet"]
+    lines.append("Engagement rate (interactions / impressions) by kind:")
+    lines.extend(line(kind, entry) for kind, entry in sorted(kinds.items()))
+    lines.append("By hook:")
+    hooks = sorted(store.aggregate('hook', since).items(), key=lambda item: rate(item[1]), reverse=True)
+    lines.extend(line(hook or '(no hook)', entry) for hook, entry in hooks)
+    quotes = sorted(store.aggregate('quote', since).items(), key=lambda item: rate(item[1]), reverse=True)
+    for title, chosen in ((f"Top {top} quotes:", quotes[:top]), (f"Bottom {top} quotes:", quotes[-top:][::-1])):
+        lines.append(title)
+        for key, entry in chosen:
+            text = (quote_text(key) if quote_text else None) or f"quote {key:016x}"
+            lines.append(line(text[:80], entry))
+    return lines
@@ -0,0 +1,592 @@
+"""Local stand-in for the parts of the X API v2 the bot uses
+
+:class:`FakeXAPI` mimics the behaviour that matters to the bot: per-endpoint
+rate-limit windows with the real ``x-rate-limit-*`` headers, 429 responses,
+403s for duplicate content, chunked media uploads, a mentions timeline with
+``since_id`` paging and expansions, and injectable failures. :class:`FakeXServer`
+serves it over HTTP so the real client code can be pointed at it::
+
+    python fake_x_api.py --port 8080
+    TWITTER_API_BASE_URL=http://127.0.0.1:8080 python twitter_bot.py
+
+:class:`FakeClient` and :class:`FakeAsyncClient` skip HTTP altogether and
+call a :class:`FakeXAPI` in process, for simulations that post thousands of
+times a second (see ``simulate.py``).
+"""
+
+import argparse
+import bisect
+import email.parser
+import email.policy
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from async_x_api import APIError, APIResponse, AsyncXClient
+
+from rate_limit import endpoint_key
+
+_OAUTH_TOKEN = re.compile(r'oauth_token="([^"]*)"')
+_PATH_ID = re.compile(r'(?<!^)/(\d+)(?=/|$)')
+_MENTION = re.compile(r'@(\w+)')
+
+# Requests per 15-minute window, per endpoint and user (user-context limits)
+DEFAULT_LIMITS = {
+    'POST /2/tweets': 100,
+    'GET /2/tweets': 900,
+    'GET /2/users/me': 75,
+    'POST /2/media/upload/initialize': 180,
+    'POST /2/media/upload/:id/append': 1800,
+    'POST /2/media/upload/:id/finalize': 180,
+    'GET /2/users/:id/mentions': 180,
+}
+
+# The most ids one GET /2/tweets lookup accepts
+MAX_LOOKUP_IDS = 100
+# Page sizes a mentions request may ask for
+MIN_MENTIONS_PAGE, MAX_MENTIONS_PAGE = 5, 100
+
+
+class FakeXAPI:
+    """In-memory model of the X API's posting endpoints
+
+    Requests are attributed to a user by their OAuth access token, so rate
+    limits and duplicate-content checks apply per account as they do on X.
+    Requests without a token act as :attr:`user`. A text is a duplicate if
+    the same user posted it within ``duplicate_window`` seconds (ever, when
+    None); X does not document its own window.
+    """
+
+    def __init__(self, limits=None, window=900, daily_tweet_limit=None, clock=time.time, duplicate_window=None):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.window = window
+        self.daily_tweet_limit = daily_tweet_limit
+        self.duplicate_window = duplicate_window
+        self.clock = clock
+        self.user = {'id': '1000', 'name': 'Fake Bot', 'username': 'fakebot'}
+        self.users = {None: self.user}
+        self.tweets = []
+        self.tweets_by_id = {}
+        self.media = {}
+        # User id -> ids of the tweets mentioning them, oldest first (ids only grow)
+        self.mentions = {}
+        self.requests = []
+        self.statuses = {}
+        self._windows = {}
+        self._daily = {}
+        self._texts = {}
+        self._failures = []
+        self._next_id = 1_800_000_000_000_000_000
+        self._lock = threading.Lock()
+        self.routes = {
+            'GET /2/users/me': self._get_me,
+            'POST /2/tweets': self._create_tweet,
+            'GET /2/tweets': self._get_tweets,
+            'POST /2/media/upload/initialize': self._media_initialize,
+            'POST /2/media/upload/:id/append': self._media_append,
+            'POST /2/media/upload/:id/finalize': self._media_finalize,
+            'GET /2/users/:id/mentions': self._get_mentions,
+        }
+
+    def mention(self, token, text, in_reply_to_tweet_id=None):
+        """Post ``text`` as the user of ``token``, e.g. a fan replying to one of the bot's tweets; returns its id"""
+        body = {'text': text}
+        if in_reply_to_tweet_id is not None:
+            body['reply'] = {'in_reply_to_tweet_id': str(in_reply_to_tweet_id)}
+        status, _, payload = self.handle('POST', '/2/tweets', body, token)
+        if status != 201:
+            raise ValueError(f"Could not post {text!r}: {payload}")
+        return payload['data']['id']
+
+    def fail_next(self, status, count=1, retry_after=None):
+        """Make the next ``count`` requests fail with ``status``"""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * count)
+
+    # -- request handling --------------------------------------------------
+
+    def user_for(self, token):
+        """The fake user an access token belongs to, created on first sight"""
+        user = self.users.get(token)
+        if user is None:
+            number = len(self.users)
+            user = self.users[token] = {'id': str(1000 + number), 'name': f"Fake Bot {number}",
+                                        'username': f"fakebot{number}"}
+        return user
+
+    def handle(self, method, url, body=None, token=None):
+        """Process one request made with access ``token``; returns (status, headers, json body)"""
+        with self._lock:
+            status, headers, payload = self._handle(method, url, body, token)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            return status, headers, payload
+
+    def _handle(self, method, url, body, token):
+        endpoint = endpoint_key(method, url)
+        self.requests.append((endpoint, body))
+        now = self.clock()
+        user = self.user_for(token)
+
+        headers = {}
+        limit = self.limits.get(endpoint)
+        if limit is not None:
+            start, used = self._windows.get((user['id'], endpoint), (now, 0))
+            if now >= start + self.window:
+                start, used = now, 0
+            reset = int(start + self.window)
+            if used >= limit:
+                headers.update(self._limit_headers(limit, 0, reset))
+                return 429, headers, {'title': 'Too Many Requests', 'detail': 'Too Many Requests', 'status': 429}
+            used += 1
+            self._windows[(user['id'], endpoint)] = (start, used)
+            headers.update(self._limit_headers(limit, limit - used, reset))
+
+        if self._failures:
+            status, retry_after = self._failures.pop(0)
+            if retry_after is not None:
+                headers['retry-after'] = str(retry_after)
+            return status, headers, {'title': 'Injected failure', 'status': status}
+
+        route = self.routes.get(endpoint)
+        if route is None:
+            return 404, headers, {'title': 'Not Found Error', 'status': 404}
+        parts = urlsplit(url)
+        # Ids in the path (/2/media/upload/<id>/append) follow as extra arguments
+        return route(now, headers, body or {}, parse_qs(parts.query), user, *_PATH_ID.findall(parts.path))
+
+    def _limit_headers(self, limit, remaining, reset):
+        return {
+            'x-rate-limit-limit': str(limit),
+            'x-rate-limit-remaining': str(remaining),
+            'x-rate-limit-reset': str(reset),
+        }
+
+    def _get_me(self, now, headers, body, query, user):
+        return 200, headers, {'data': dict(user)}
+
+    def _create_tweet(self, now, headers, body, query, user):
+        if self.daily_tweet_limit is not None:
+            daily = self._daily[user['id']] = [
+                stamp for stamp in self._daily.get(user['id'], []) if stamp > now - 86400
+            ]
+            reset = int((daily[0] if daily else now) + 86400)
+            remaining = self.daily_tweet_limit - len(daily)
+            if remaining <= 0:
+                headers.update({
+                    'x-user-limit-24hour-limit': str(self.daily_tweet_limit),
+                    'x-user-limit-24hour-remaining': '0',
+                    'x-user-limit-24hour-reset': str(reset),
+                })
+                return 429, headers, {'title': 'Too Many Requests', 'detail': 'Too Many Requests', 'status': 429}
+            headers.update({
+                'x-user-limit-24hour-limit': str(self.daily_tweet_limit),
+                'x-user-limit-24hour-remaining': str(remaining - 1),
+                'x-user-limit-24hour-reset': str(reset),
+            })
+
+        text = body.get('text', '')
+        poll = body.get('poll')
+        if poll is not None and not 2 <= len(poll.get('options', [])) <= 4:
+            return 400, headers, {'title': 'Invalid Request', 'detail': 'Polls need 2 to 4 options', 'status': 400}
+        media_ids = [str(media_id) for media_id in (body.get('media') or {}).get('media_ids', [])]
+        for media_id in media_ids:
+            media = self.media.get(media_id)
+            if media is None or media['owner'] != user['id'] or media['state'] != 'succeeded':
+                return 400, headers, {'title': 'Invalid Request', 'detail': f"Media id {media_id} is not usable",
+                                      'status': 400}
+        texts = self._texts.setdefault(user['id'], {})
+        posted_at = texts.get(text)
+        if posted_at is not None and (self.duplicate_window is None or now - posted_at < self.duplicate_window):
+            return 403, headers, {
+                'title': 'Forbidden',
+                'detail': 'You are not allowed to create a Tweet with duplicate content.',
+                'status': 403,
+            }
+
+        self._next_id += 1
+        tweet = {'id': str(self._next_id), 'text': text, 'created_at': now, 'author_id': user['id']}
+        if poll is not None:
+            tweet['poll'] = poll
+        if media_ids:
+            tweet['media_ids'] = media_ids
+        reply = body.get('reply')
+        names = set(_MENTION.findall(text))
+        mentioned = {known['id'] for known in self.users.values() if known['username'] in names}
+        if reply:
+            parent = self.tweets_by_id.get(str(reply.get('in_reply_to_tweet_id')))
+            tweet['in_reply_to_tweet_id'] = reply.get('in_reply_to_tweet_id')
+            tweet['referenced_tweets'] = [{'type': 'replied_to', 'id': tweet['in_reply_to_tweet_id']}]
+            if parent is not None:
+                tweet['conversation_id'] = parent.get('conversation_id', parent['id'])
+                # A reply mentions the author it replies to, as on X
+                mentioned.add(parent['author_id'])
+        mentioned.discard(user['id'])
+        for mentioned_id in mentioned:
+            self.mentions.setdefault(mentioned_id, []).append(int(tweet['id']))
+        texts[text] = now
+        if self.daily_tweet_limit is not None:
+            daily.append(now)
+        self.tweets.append(tweet)
+        self.tweets_by_id[tweet['id']] = tweet
+        return 201, headers, {'data': {'id': tweet['id'], 'text': text}}
+
+    def _media_initialize(self, now, headers, body, query, user):
+        total = body.get('total_bytes')
+        if not isinstance(total, int) or total <= 0 or not body.get('media_type'):
+            return 400, headers, {'title': 'Invalid Request', 'detail': 'media_type and total_bytes are required',
+                                  'status': 400}
+        self._next_id += 1
+        media_id = str(self._next_id)
+        self.media[media_id] = {'owner': user['id'], 'media_type': body['media_type'], 'total_bytes': total,
+                                'segments': {}, 'state': 'initialized'}
+        return 200, headers, {'data': {'id': media_id, 'media_key': f"3_{media_id}", 'expires_after_secs': 86400}}
+
+    def _media_append(self, now, headers, body, query, user, media_id=None):
+        media = self.media.get(media_id)
+        if media is None or media['owner'] != user['id'] or media['state'] != 'initialized':
+            return 400, headers, {'title': 'Invalid Request', 'detail': f"Unknown upload {media_id}", 'status': 400}
+        chunk = body.get('media')
+        if not isinstance(chunk, bytes) or str(body.get('segment_index', '')) == '':
+            return 400, headers, {'title': 'Invalid Request', 'detail': 'media and segment_index are required',
+                                  'status': 400}
+        media['segments'][int(body['segment_index'])] = len(chunk)
+        return 200, headers, {}
+
+    def _media_finalize(self, now, headers, body, query, user, media_id=None):
+        media = self.media.get(media_id)
+        if media is None or media['owner'] != user['id']:
+            return 400, headers, {'title': 'Invalid Request', 'detail': f"Unknown upload {media_id}", 'status': 400}
+        received = sum(media['segments'].values())
+        if received != media['total_bytes'] or sorted(media['segments']) != list(range(len(media['segments']))):
+            return 400, headers, {'title': 'Invalid Request',
+                                  'detail': f"Received {received} of {media['total_bytes']} bytes", 'status': 400}
+        media['state'] = 'succeeded'
+        return 200, headers, {'data': {'id': media_id, 'media_key': f"3_{media_id}", 'size': received,
+                                       'expires_after_secs': 86400}}
+
+    def public_metrics(self, tweet, now):
+        """Made-up but stable metrics: engagement levels off after a few days
+        
+        Each paragraph has its own appeal, so a quote keeps its pull whatever
+        hook follows it.
+        """
+        paragraphs = tweet['text'].split('\n\n')
+        appeal = sum(zlib.crc32(paragraph.encode('utf-8')) % 1000 for paragraph in paragraphs) // len(paragraphs)
+        growth = 1 - math.exp(-max(0.0, now - tweet['created_at']) / 86400)
+        impressions = int((100 + appeal * 4) * growth)
+        return {
+            'retweet_count': impressions * appeal // 100_000,
+            'reply_count': impressions // 400,
+            'like_count': impressions * (appeal + 200) // 40_000,
+            'quote_count': impressions // 1000,
+            'bookmark_count': impressions // 500,
+            'impression_count': impressions,
+        }
+
+    def _get_tweets(self, now, headers, body, query, user):
+        ids = [value for value in ','.join(query.get('ids', [])).split(',') if value]
+        if not 1 <= len(ids) <= MAX_LOOKUP_IDS:
+            return 400, headers, {'title': 'Invalid Request',
+                                  'detail': f"ids must hold 1 to {MAX_LOOKUP_IDS} tweet ids", 'status': 400}
+        fields = ','.join(query.get('tweet.fields', [])).split(',')
+        data, errors = [], []
+        for tweet_id in ids:
+            tweet = self.tweets_by_id.get(tweet_id)
+            if tweet is None:
+                errors.append({'value': tweet_id, 'detail': f"Could not find tweet with ids: [{tweet_id}].",
+                               'title': 'Not Found Error', 'resource_type': 'tweet', 'parameter': 'ids',
+                               'resource_id': tweet_id})
+                continue
+            item = {'id': tweet['id'], 'text': tweet['text']}
+            if 'public_metrics' in fields:
+                item['public_metrics'] = self.public_metrics(tweet, now)
+            data.append(item)
+        payload = {'data': data} if data else {}
+        if errors:
+            payload['errors'] = errors
+        return 200, headers, payload
+
+
+    def _get_mentions(self, now, headers, body, query, user, user_id=None):
+        """Mentions of ``user_id``, newest first, after ``since_id`` and before ``pagination_token``"""
+        def param(name, default=None):
+            return query.get(name, [default])[0]
+
+        try:
+            page = int(param('max_results', 10))
+            since_id = int(param('since_id', 0))
+            until = int(param('pagination_token') or 1 << 64)
+            start_time = param('start_time')
+            start = datetime.fromisoformat(start_time.replace('Z', '+00:00')).timestamp() if start_time else None
+        except ValueError as e:
+            return 400, headers, {'title': 'Invalid Request', 'detail': str(e), 'status': 400}
+        if not MIN_MENTIONS_PAGE <= page <= MAX_MENTIONS_PAGE:
+            return 400, headers, {'title': 'Invalid Request', 'status': 400,
+                                  'detail': f"max_results must be {MIN_MENTIONS_PAGE} to {MAX_MENTIONS_PAGE}"}
+
+        ids = self.mentions.get(user_id, [])
+        # Only the tweets inside (since_id, until) are looked at, so a poll costs what is new
+        newer = ids[bisect.bisect_right(ids, since_id):bisect.bisect_left(ids, until)]
+        selected = []
+        for tweet_id in reversed(newer):
+            tweet = self.tweets_by_id[str(tweet_id)]
+            if start is not None and tweet['created_at'] < start:
+                break
+            selected.append(tweet)
+            if len(selected) > page:
+                break
+        more = len(selected) > page
+        selected = selected[:page]
+
+        fields = set(','.join(query.get('tweet.fields', [])).split(','))
+        expansions = set(','.join(query.get('expansions', [])).split(','))
+        data = [self._tweet_object(tweet, fields) for tweet in selected]
+        includes = {}
+        if 'referenced_tweets.id' in expansions:
+            referenced = {reference['id'] for tweet in selected for reference in tweet.get('referenced_tweets', [])}
+            tweets = [self._tweet_object(self.tweets_by_id[tweet_id], fields)
+                      for tweet_id in sorted(referenced) if tweet_id in self.tweets_by_id]
+            if tweets:
+                includes['tweets'] = tweets
+        if 'author_id' in expansions:
+            authors = {tweet['author_id'] for tweet in selected}
+            includes['users'] = [dict(known) for known in self.users.values() if known['id'] in authors]
+
+        meta = {'result_count': len(data)}
+        if data:
+            meta.update(newest_id=data[0]['id'], oldest_id=data[-1]['id'])
+        if more:
+            meta['next_token'] = data[-1]['id']
+        payload = {'meta': meta}
+        if data:
+            payload['data'] = data
+        if includes:
+            payload['includes'] = includes
+        return 200, headers, payload
+
+    def _tweet_object(self, tweet, fields):
+        item = {'id': tweet['id'], 'text': tweet['text']}
+        if 'author_id' in fields:
+            item['author_id'] = tweet['author_id']
+        if 'conversation_id' in fields:
+            item['conversation_id'] = tweet.get('conversation_id', tweet['id'])
+        if 'created_at' in fields:
+            item['created_at'] = datetime.fromtimestamp(tweet['created_at'], timezone.utc).isoformat()
+        if 'referenced_tweets' in fields and tweet.get('referenced_tweets'):
+            item['referenced_tweets'] = [dict(reference) for reference in tweet['referenced_tweets']]
+        return item
+
+
+def _api_response(status, headers, payload):
+    return APIResponse(status, {name.lower(): value for name, value in headers.items()},
+                       json.dumps(payload).encode('utf-8'))
+
+
+class FakeClient:
+    """In-process stand-in for the ``tweepy.Client`` methods the bot calls
+
+    Errors are raised as ``async_x_api.APIError``, which carries the status
+    and rate-limit headers the way tweepy's exceptions do.
+    """
+
+    def __init__(self, api, token=None):
+        self.api = api
+        self.token = token
+
+    def _call(self, method, path, body=None):
+        status, headers, payload = self.api.handle(method, path, body, self.token)
+        if not 200 <= status < 300:
+            raise APIError(_api_response(status, headers, payload))
+        return payload
+
+    def get_me(self):
+        return SimpleNamespace(data=SimpleNamespace(**self._call('GET', '/2/users/me')['data']))
+
+    def create_tweet(self, text=None, poll_options=None, poll_duration_minutes=None,
+                     in_reply_to_tweet_id=None, media_ids=None, **kwargs):
+        body = {'text': text}
+        if media_ids:
+            body['media'] = {'media_ids': [str(media_id) for media_id in media_ids]}
+        if poll_options is not None:
+            body['poll'] = {'options': list(poll_options), 'duration_minutes': poll_duration_minutes}
+        if in_reply_to_tweet_id is not None:
+            body['reply'] = {'in_reply_to_tweet_id': str(in_reply_to_tweet_id)}
+        return SimpleNamespace(data=self._call('POST', '/2/tweets', body)['data'])
+
+    def get_tweets(self, ids, tweet_fields=None, user_auth=False, **kwargs):
+        path = f"/2/tweets?ids={','.join(str(tweet_id) for tweet_id in ids)}"
+        if tweet_fields:
+            path += f"&tweet.fields={','.join(tweet_fields)}"
+        payload = self._call('GET', path)
+        tweets = [SimpleNamespace(**{**tweet, 'id': int(tweet['id'])}) for tweet in payload.get('data', [])]
+        return SimpleNamespace(data=tweets or None, errors=payload.get('errors', []))
+
+
+    def get_users_mentions(self, id, since_id=None, start_time=None, max_results=None, pagination_token=None,
+                           expansions=None, tweet_fields=None, user_fields=None, user_auth=False, **kwargs):
+        query = {'since_id': since_id, 'max_results': max_results, 'pagination_token': pagination_token,
+                 'start_time': start_time.isoformat() if isinstance(start_time, datetime) else start_time,
+                 'expansions': ','.join(expansions or []) or None,
+                 'tweet.fields': ','.join(tweet_fields or []) or None,
+                 'user.fields': ','.join(user_fields or []) or None}
+        path = f"/2/users/{id}/mentions?" + urlencode({name: value for name, value in query.items() if value is not None})
+        payload = self._call('GET', path)
+        includes = payload.get('includes', {})
+        return SimpleNamespace(
+            data=[_tweet(tweet) for tweet in payload.get('data', [])] or None,
+            includes={'users': [SimpleNamespace(**{**user, 'id': int(user['id'])}) for user in includes.get('users', [])],
+                      'tweets': [_tweet(tweet) for tweet in includes.get('tweets', [])]},
+            errors=payload.get('errors', []),
+            meta=payload.get('meta', {}),
+        )
+
+
+def _tweet(tweet):
+    """A tweet of a response as tweepy exposes it: integer ids, references as objects"""
+    fields = {**tweet, 'id': int(tweet['id'])}
+    for name in ('author_id', 'conversation_id'):
+        if name in fields:
+            fields[name] = int(fields[name])
+    if 'referenced_tweets' in fields:
+        fields['referenced_tweets'] = [SimpleNamespace(type=reference['type'], id=int(reference['id']))
+                                       for reference in fields['referenced_tweets']]
+    return SimpleNamespace(**fields)
+
+
+class FakeAsyncClient(AsyncXClient):
+    """:class:`async_x_api.AsyncXClient` answering from a :class:`FakeXAPI` instead of the network"""
+
+    def __init__(self, api, credentials, limiter=None):
+        super().__init__(credentials, limiter, base_url='http://fake.invalid')
+        self.api = api
+
+    async def request(self, method, path, body=None, form=None):
+        body = form if form is not None else body
+        response = _api_response(*self.api.handle(method, path, body, self.credentials['access_token']))
+        if self.limiter is not None:
+            self.limiter.update_from_headers(endpoint_key(method, path), response.headers)
+        if not 200 <= response.status_code < 300:
+            raise APIError(response)
+        return response
+
+
+def _parse_form(content_type, raw):
+    """Fields of a multipart/form-data body; file parts as bytes"""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + raw)
+    form = {}
+    for part in message.iter_parts():
+        value = part.get_payload(decode=True)
+        form[part.get_param('name', header='content-disposition')] = (
+            value if part.get_filename() else value.decode('utf-8'))
+    return form
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle plus the
+    # client's delayed ACK adds ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def _respond(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type') or ''
+        if content_type.startswith('multipart/form-data'):
+            body = _parse_form(content_type, raw)
+        else:
+            try:
+                body = json.loads(raw) if raw else None
+            except json.JSONDecodeError:
+                body = None
+        match = _OAUTH_TOKEN.search(self.headers.get('Authorization') or '')
+        token = match.group(1) if match else None
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        status, headers, payload = self.server.api.handle(method, self.path, body, token)
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_POST(self):
+        self._respond('POST')
+
+    def do_DELETE(self):
+        self._respond('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeXServer:
+    """Serve a :class:`FakeXAPI` over HTTP on a background thread
+
+    ``latency`` seconds are added to every response to stand in for the
+    round trip to the real API.
+    """
+
+    def __init__(self, api=None, host='127.0.0.1', port=0, latency=0.0):
+        self.api = api or FakeXAPI()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self.api
+        self.httpd.latency = latency
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake X API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--daily-tweet-limit', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    args = parser.parse_args()
+
+    server = FakeXServer(FakeXAPI(daily_tweet_limit=args.daily_tweet_limit), args.host, args.port, args.latency)
+    print(f"Fake X API listening on {server.base_url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Engagement hooks appended to quotes, grouped by quote category"""
+
+import hashlib
+import json
+import random
+import re
+from bisect import bisect_right
+
+# Categories in priority order: a quote belongs to the first one whose keywords it contains
+SUCCESS, GROWTH, MOTIVATION, CHALLENGE, GENERAL = range(5)
+CATEGORY_NAMES = ['success', 'growth', 'motivation', 'challenge', 'general']
+
+CATEGORY_KEYWORDS = [
+    ['success', 'achieve', 'accomplish', 'win', 'victory'],
+    ['grow', 'learn', 'improve', 'better', 'change'],
+    ['motivation', 'inspire', 'dream', 'goal', 'push'],
+    ['fail', 'challenge', 'difficult', 'struggle', 'overcome'],
+]
+
+# Chance of adding a hook to a quote that matched no specific category
+GENERAL_HOOK_RATE = 0.7
+
+HOOKS = [
+    # Success hooks
+    [
+        "🏆 What does success mean to you?",
+        "🎯 What's your biggest goal right now?",
+        "� Share your success story below!",
+        "� What's your next milestone?",
+        "✨ Tag someone crushing their goals!"
+    ],
+    # Growth hooks
+    [
+        "🌱 What are you learning today?",
+        "� How are you growing this week?",
+        "🔄 What positive change are you making?",
+        "� Share your biggest lesson learned!",
+        "🎓 What skill are you developing?"
+    ],
+    # Motivation hooks
+    [
+        "🔥 What keeps you motivated?",
+        "⚡ What's driving you today?",
+        "💭 Share what inspires you most!",
+        "🎪 What dream are you chasing?",
+        "💪 Who's your biggest inspiration?"
+    ],
+    # Challenge hooks
+    [
+        "💪 What challenge are you overcoming?",
+        "� How do you bounce back from setbacks?",
+        "🌟 Share how you turned failure into fuel!",
+        "🛡️ What's your comeback story?",
+        "⚡ How do you stay strong in tough times?"
+    ],
+    # General hooks
+    [
+        "💭 What do you think?",
+        "👇 Share your thoughts below!",
+        "🔄 RT if you agree!",
+        "💪 Who needs to see this today?",
+        "✨ Tag someone who inspires you!",
+        "🎯 What's your take on this?",
+        "💡 How does this resonate with you?",
+        "🌟 What's your perspective?",
+        "👑 Share this with your squad!",
+        "� Let's discuss in the comments!",
+        "🚀 Ready to take action?",
+        "🔋 How do you apply this to your life?",
+        "🎨 What's your story?",
+        "📢 Drop a 💪 if you're ready!",
+        "🌈 What motivates you most?"
+    ],
+]
+
+
+KEYWORD_CATEGORY = {
+    keyword: category
+    for category, keywords in enumerate(CATEGORY_KEYWORDS)
+    for keyword in keywords
+}
+
+
+def _trie_pattern(words):
+    """Regex alternation for ``words`` factored into a prefix trie
+
+    ``re`` tries alternatives one by one at every position; sharing prefixes
+    (``s(?:truggle|uccess)``) means each position costs one branch per
+    distinct first letter instead of one per keyword.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if '' in node else body
+
+    return emit(trie)
+
+
+# Zero-width lookahead so overlapping keywords are all reported (e.g. "growing"
+# contains both "grow" and "win"), exactly like the substring checks it replaces
+_MATCHER = re.compile(f"(?=({_trie_pattern(KEYWORD_CATEGORY)}))")
+
+
+def classify_hook_category(text):
+    """Return the hook category for a quote in a single pass over its text"""
+    best = GENERAL
+    for match in _MATCHER.finditer(text.lower()):
+        category = KEYWORD_CATEGORY[match.group(1)]
+        if category < best:
+            best = category
+            if best == SUCCESS:
+                break
+    return best
+
+
+def classify_batch(texts):
+    """Classify a whole corpus at once, returning one category byte per quote
+
+    The quotes are lowercased and joined into one buffer, and each keyword is
+    located with ``str.find`` over that buffer. After a hit the search skips
+    to the next quote, so every keyword costs at most one hit per quote, and
+    categories are applied lowest priority first so the highest one wins.
+    """
+    lowered = [text.lower() for text in texts]
+    categories = bytearray([GENERAL]) * len(lowered)
+    if not lowered:
+        return categories
+
+    ends = []
+    position = 0
+    for text in lowered:
+        position += len(text) + 1
+        ends.append(position)
+    # Keywords never contain a newline, so no hit can straddle two quotes
+    find = '\n'.join(lowered).find
+
+    for category in reversed(range(len(CATEGORY_KEYWORDS))):
+        for keyword in CATEGORY_KEYWORDS[category]:
+            hit = find(keyword)
+            while hit != -1:
+                quote = bisect_right(ends, hit)
+                categories[quote] = category
+                hit = find(keyword, ends[quote])
+    return categories
+
+
+def hooks_digest():
+    """Fingerprint of the hook tables, so compiled render results can be invalidated"""
+    payload = json.dumps([CATEGORY_KEYWORDS, HOOKS, GENERAL_HOOK_RATE], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def choose_hook(category, rng=random, mask=None):
+    """Pick a hook for ``category``, or None if the quote should go out without one
+
+    ``mask`` restricts the choice to hooks whose bit is set (bit ``i`` is
+    ``HOOKS[category][i]``), e.g. the hooks that still fit in the tweet.
+    """
+    if category == GENERAL and rng.random() >= GENERAL_HOOK_RATE:
+        return None
+    hooks = HOOKS[category]
+    if mask is not None:
+        hooks = [hook for bit, hook in enumerate(hooks) if mask >> bit & 1]
+        if not hooks:
+            return None
+    return rng.choice(hooks)
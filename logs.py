@@ -0,0 +1,200 @@
+"""Logging pipeline: JSON lines to a rotating file, written off the calling thread
+
+:func:`setup_logging` puts a ``QueueHandler`` on the root logger, so a log
+call only builds its record and puts it on a queue; a ``QueueListener``
+thread encodes the records and does the disk and console writes. The file
+(``bot.log`` by default) gets one JSON object per line::
+
+    {"ts": "2026-10-16T09:30:00.123Z", "level": "INFO", "logger": "root",
+     "message": "Queued quote 1f0d00a815122e590df16f19", "thread": "MainThread"}
+
+plus ``exc`` for a traceback and any ``extra`` fields of the call. It rolls
+over to ``bot.log.1``, ``bot.log.2``, ... when it reaches ``max_bytes`` and
+when a new ``rotate_every`` period (a UTC day by default) begins. The
+console keeps the plain text format. ``LOG_LEVEL`` sets the root level;
+call sites pass %-style arguments, so a message below it costs one level
+check and is never formatted.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+DEFAULT_LOG_PATH = 'bot.log'
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_MAX_BYTES = 10 << 20
+DEFAULT_BACKUPS = 7
+ROTATE_EVERY = 86400
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every record has; anything else was passed through ``extra``
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+_TRACEBACKS = logging.Formatter()
+
+_listener = None
+
+
+def log_level(value=None):
+    """The level named by ``value`` (default ``LOG_LEVEL``), e.g. ``DEBUG`` or ``20``"""
+    value = str(value or os.getenv('LOG_LEVEL') or DEFAULT_LEVEL).strip().upper()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value)
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level {value!r}")
+    return level
+
+
+def apply_log_level(level=None):
+    """Set the root logger to ``level`` (default ``LOG_LEVEL``); an unknown name falls back to INFO"""
+    try:
+        level = log_level(level)
+    except ValueError as e:
+        logging.getLogger().setLevel(logging.INFO)
+        logging.getLogger(__name__).warning("%s, logging at INFO", e)
+        return logging.INFO
+    logging.getLogger().setLevel(level)
+    return level
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and thread, then traceback and ``extra`` fields"""
+
+    def __init__(self):
+        super().__init__()
+        self._encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+        self._second = None
+        self._stamp = ''
+
+    def timestamp(self, created):
+        second = int(created)
+        # Records come in bursts within one second; format its prefix once
+        if second != self._second:
+            self._second = second
+            self._stamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        return f"{self._stamp}.{int((created - second) * 1000):03d}Z"
+
+    def format(self, record):
+        entry = {
+            'ts': self.timestamp(record.created),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+        for name in record.__dict__.keys() - _RECORD_FIELDS:
+            entry[name] = record.__dict__[name]
+        return self._encoder.encode(entry)
+
+
+class RotatingJsonFileHandler(RotatingFileHandler):
+    """JSON lines, rolled over at ``max_bytes`` and at the start of every ``rotate_every`` seconds
+
+    Periods are aligned to the epoch (UTC midnights for a day). A file left
+    from an earlier period is rolled over before the first new record.
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUPS,
+                 rotate_every=ROTATE_EVERY, clock=time.time):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.setFormatter(JsonFormatter())
+        self.rotate_every = rotate_every
+        self.clock = clock
+        self.rollover_at = self._period_end(clock())
+        try:
+            if rotate_every and os.path.getmtime(self.baseFilename) < self.rollover_at - rotate_every:
+                self.rollover_at = 0
+        except OSError:
+            pass
+
+    def _period_end(self, now):
+        return (now // self.rotate_every + 1) * self.rotate_every if self.rotate_every else math.inf
+
+    def shouldRollover(self, record):
+        # The base class formats every record an extra time to measure it; rolling
+        # over once the file has passed max_bytes only needs the stream position
+        if self.stream is None:
+            self.stream = self._open()
+        written = self.stream.tell()
+        if self.clock() >= self.rollover_at:
+            if written:
+                return True
+            # Nothing to roll over yet; wait for the end of this period
+            self.rollover_at = self._period_end(self.clock())
+        return 0 < self.maxBytes <= written
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._period_end(self.clock())
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # Merge the arguments now, as they may change once the call returns, but keep the
+        # traceback apart from the message and leave all encoding to the listener thread.
+        # This is the root logger's only handler and runs last, so the record is not copied.
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+def setup_logging(path=DEFAULT_LOG_PATH, level=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUPS,
+                  rotate_every=ROTATE_EVERY, stream=None):
+    """Send every log record through a queue to the JSON file at ``path`` and the console
+
+    ``stream`` is the console (stderr by default); ``path`` None leaves the
+    file out. Replaces the root logger's handlers and returns the listener,
+    which :func:`stop_logging` flushes (it also runs at exit).
+    """
+    global _listener
+    stop_logging()
+    handlers = []
+    if path:
+        handlers.append(RotatingJsonFileHandler(path, max_bytes, backup_count, rotate_every))
+    console = logging.StreamHandler(stream)
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers.append(console)
+
+    # Records only ever show the thread name: skip the caller lookup and process
+    # details (see "Optimization" in the logging docs)
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    apply_log_level(level)
+    return _listener
+
+
+def stop_logging():
+    """Write out whatever is still queued and stop the listener thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+# Registered after the logging module's own shutdown hook, so it runs first
+atexit.register(stop_logging)
@@ -0,0 +1,182 @@
+"""Per-stage timings and counters of the posting runs
+
+A :class:`Metrics` collects how long each stage of ``post_daily_content``
+took (loading the corpus, selecting, formatting, journaling, API calls,
+rate-limit waits, retry backoff, ...) and counts retries, API errors and
+failures by exception type. :meth:`Metrics.export` writes them as a
+Prometheus textfile (for node_exporter's textfile collector) when the path
+ends in ``.prom``, and as a JSON run summary otherwise.
+
+Stages nest: ``run`` covers the whole call, ``select`` includes any
+``load_corpus`` it triggered, and ``api_call`` is the time spent inside the
+HTTP request alone.
+
+Instrumentation is off unless a metrics path is given; the bot then uses
+:data:`NULL_METRICS`, whose methods do nothing.
+"""
+
+import json
+import os
+import threading
+import time
+
+PREFIX = 'twitter_bot_'
+
+COUNTER_HELP = {
+    'runs': "Posting runs, by outcome",
+    'posts': "Outbox entries handled, by kind and outcome",
+    'retries': "API calls retried after a transient failure",
+    'api_errors': "Failed API call attempts, by exception type",
+    'post_failures': "Posts that failed for good in a run, by exception type",
+    'rate_limit_waits': "Times a call slept for rate-limit budget",
+    'engagement_fetched': "Tweets whose engagement metrics were fetched",
+    'card_misses': "Quotes posted as text because their image card was not rendered yet",
+    'card_upload_failures': "Image card uploads that failed, by exception type",
+    'mentions_fetched': "Mentions read from the mentions timeline",
+    'replies': "Replies to mentions handled, by outcome and hook category",
+}
+
+
+class _Span:
+    """Times one stage; adds its duration to the owning :class:`Metrics` on exit"""
+
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Thread-safe stage timings and labelled counters, exported to ``path``"""
+
+    enabled = True
+
+    def __init__(self, path=None):
+        self.path = path
+        self.started = time.time()
+        # stage -> [count, total seconds, longest]
+        self.stages = {}
+        # (name, ((label, value), ...)) -> count
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage):
+        """Context manager timing one pass through ``stage``"""
+        return _Span(self, stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                totals = self.stages[stage] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def summary(self):
+        """Everything collected so far, as a JSON-serializable dict"""
+        with self._lock:
+            stages = {
+                stage: {'count': count, 'seconds': total, 'max_seconds': longest}
+                for stage, (count, total, longest) in sorted(self.stages.items())
+            }
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        return {'started': self.started, 'exported': time.time(), 'stages': stages, 'counters': counters}
+
+    def prometheus(self):
+        """The Prometheus text exposition of :meth:`summary`"""
+        summary = self.summary()
+        lines = [
+            f"# HELP {PREFIX}stage_seconds Time spent in each stage of the posting runs",
+            f"# TYPE {PREFIX}stage_seconds summary",
+        ]
+        for stage, totals in summary['stages'].items():
+            lines.append(f'{PREFIX}stage_seconds_sum{{stage="{_escape(stage)}"}} {totals["seconds"]:.6f}')
+            lines.append(f'{PREFIX}stage_seconds_count{{stage="{_escape(stage)}"}} {totals["count"]}')
+
+        by_name = {}
+        for counter in summary['counters']:
+            by_name.setdefault(counter['name'], []).append(counter)
+        for name, counters in by_name.items():
+            metric = f"{PREFIX}{name}_total"
+            lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name.replace('_', ' '))}")
+            lines.append(f"# TYPE {metric} counter")
+            for counter in counters:
+                labels = ','.join(f'{key}="{_escape(value)}"' for key, value in counter['labels'].items())
+                lines.append(f"{metric}{{{labels}}} {counter['value']}" if labels else f"{metric} {counter['value']}")
+
+        lines.append(f"# HELP {PREFIX}last_export_timestamp_seconds When these metrics were written")
+        lines.append(f"# TYPE {PREFIX}last_export_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}last_export_timestamp_seconds {summary['exported']:.3f}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path=None):
+        """Write the metrics to ``path`` (default ``self.path``) atomically"""
+        path = path or self.path
+        if path is None:
+            return
+        if path.endswith('.prom'):
+            content = self.prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=2) + '\n'
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # The textfile collector must never see a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+class NullMetrics:
+    """Instrumentation turned off: the same interface, doing nothing"""
+
+    enabled = False
+    path = None
+    _span = _NullSpan()
+
+    def span(self, stage):
+        return self._span
+
+    def observe(self, stage, seconds):
+        pass
+
+    def increment(self, name, amount=1, **labels):
+        pass
+
+    def export(self, path=None):
+        pass
+
+
+NULL_METRICS = NullMetrics()
@@ -0,0 +1,248 @@
+"""Crash-safe outbox between content generation and publishing
+
+Generated posts are appended to a journal (``data/outbox.jsonl``) before any
+API call is made; the publisher then drains the journal, appending what
+happened to each entry. Every record is fsync'd, so after a crash the
+journal still says which posts are waiting, which were in flight and which
+went out (with their tweet id).
+
+Records are JSON lines keyed by an idempotency key::
+
+    {"op": "queued",   "key": ..., "kind": "quote", "text": ..., ...}
+    {"op": "attempt",  "key": ..., "at": ...}
+    {"op": "progress", "key": ..., "thread_ids": [...]}
+    {"op": "sent",     "key": ..., "tweet_id": ..., "at": ...}
+    {"op": "dropped",  "key": ..., "reason": ..., "at": ...}
+
+An entry is pending until it is ``sent`` or ``dropped``. Queuing a key that
+is already pending is a no-op, so re-running a generation step after a crash
+does not queue the same post twice. ``progress`` records let a multi-part
+post (a thread) resume where a failed attempt stopped.
+"""
+
+import fcntl
+import functools
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# What the publish callback tells the drain to do with an entry
+SENT, RETRY, DROP = 'sent', 'retry', 'drop'
+
+# Rewrite the journal without settled entries once it holds this many records
+COMPACT_AFTER = 200
+
+
+def idempotency_key(kind, source):
+    """Key for a post of ``source`` (the quote or poll question) as ``kind``"""
+    return hashlib.blake2b(f"{kind}\0{source}".encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _publish(publish, entry):
+    try:
+        return publish(entry)
+    except Exception as e:
+        logger.exception("Publishing outbox entry %s failed", entry['key'])
+        return RETRY, str(e)
+
+
+class Outbox:
+    """Append-only journal of posts waiting to be published"""
+
+    def __init__(self, path='data/outbox.jsonl', max_attempts=5, clock=time.time):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # -- journal -----------------------------------------------------------
+
+    @contextmanager
+    def lock(self):
+        """Exclusive access across processes, held while queuing or draining"""
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b'\n':
+                # A crash cut the last record short: end it, or this record would be glued onto it and lost too
+                line = '\n' + line
+            os.write(fd, line.encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _records(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for number, line in enumerate(lines, 1):
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-append; anything else is corruption
+                if number != len(lines):
+                    logger.warning("Skipping unreadable outbox record %s:%d", self.path, number)
+        return records
+
+    def _replay(self):
+        """Fold the journal into ``{key: entry}``, in queue order"""
+        entries = {}
+        for record in self._records():
+            op, key = record.get('op'), record.get('key')
+            if op == 'queued':
+                entry = {name: value for name, value in record.items() if name != 'op'}
+                entry.update(status='pending', attempts=0)
+                entries[key] = entry
+                continue
+            entry = entries.get(key)
+            if entry is None:
+                continue
+            if op == 'attempt':
+                entry['attempts'] += 1
+            elif op == 'progress':
+                entry.update((name, value) for name, value in record.items() if name not in ('op', 'key'))
+            elif op == 'sent':
+                entry.update(status='sent', tweet_id=record.get('tweet_id'))
+            elif op == 'dropped':
+                entry.update(status='dropped', reason=record.get('reason'))
+        return entries
+
+    def entries(self):
+        return list(self._replay().values())
+
+    def pending(self):
+        return [entry for entry in self._replay().values() if entry['status'] == 'pending']
+
+    # -- queuing -----------------------------------------------------------
+
+    def enqueue(self, kind, text, source=None, **fields):
+        """Journal a post; returns its key (an already-pending key is not queued twice)"""
+        source = text if source is None else source
+        key = idempotency_key(kind, source)
+        with self.lock():
+            entry = self._replay().get(key)
+            if entry is not None and entry['status'] == 'pending':
+                return key
+            record = {'op': 'queued', 'key': key, 'kind': kind, 'text': text, 'source': source,
+                      'queued_at': self.clock()}
+            record.update(fields)
+            self._append(record)
+        return key
+
+    def progress(self, key, **fields):
+        """Journal partial progress on an entry (merged into it on replay)
+
+        Called from a publish callback, while :meth:`drain` holds the lock.
+        """
+        record = {'op': 'progress', 'key': key}
+        record.update(fields)
+        self._append(record)
+
+    # -- draining ----------------------------------------------------------
+
+    def drain(self, publish, limit=None, workers=1):
+        """Publish pending entries oldest first, up to ``limit`` of them
+
+        ``publish(entry)`` returns ``(SENT, tweet_id)``, ``(RETRY, reason)``
+        or ``(DROP, reason)``. A RETRY stops the drain (the API is down or
+        out of budget) and leaves the entry for the next run. With
+        ``workers`` above 1, that many entries are published at once from a
+        thread pool; the journal is still written from this thread, and a
+        RETRY stops the drain after the batch it came in. Returns the list
+        of ``(entry, outcome, detail)`` handled.
+        """
+        handled = []
+        with self.lock():
+            entries = self.pending()
+            if limit is not None:
+                entries = entries[:limit]
+            batch_size = max(1, workers)
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbox') if workers > 1 else None
+            try:
+                for start in range(0, len(entries), batch_size):
+                    batch = []
+                    for entry in entries[start:start + batch_size]:
+                        if entry['attempts'] >= self.max_attempts:
+                            self._append({'op': 'dropped', 'key': entry['key'], 'at': self.clock(),
+                                          'reason': f"gave up after {entry['attempts']} attempts"})
+                            handled.append((entry, DROP, 'too many attempts'))
+                            continue
+                        self._append({'op': 'attempt', 'key': entry['key'], 'at': self.clock()})
+                        batch.append(entry)
+
+                    results = (executor.map if executor else map)(functools.partial(_publish, publish), batch)
+                    retry = False
+                    for entry, (outcome, detail) in zip(batch, results):
+                        if outcome == SENT:
+                            self._append({'op': 'sent', 'key': entry['key'], 'tweet_id': detail, 'at': self.clock()})
+                        elif outcome == DROP:
+                            self._append({'op': 'dropped', 'key': entry['key'], 'reason': detail, 'at': self.clock()})
+                        handled.append((entry, outcome, detail))
+                        retry = retry or outcome == RETRY
+                    if retry:
+                        break
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+            self._compact()
+        return handled
+
+    def _compact(self):
+        """Rewrite the journal with only pending entries once it has grown long"""
+        records = self._records()
+        if len(records) < COMPACT_AFTER:
+            return
+        keep = {entry['key'] for entry in self._replay().values() if entry['status'] == 'pending'}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for record in records:
+                if record.get('key') in keep:
+                    file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class MemoryOutbox(Outbox):
+    """:class:`Outbox` whose journal is a list in memory, for simulations"""
+
+    def __init__(self, max_attempts=5, clock=time.time):
+        self.path = None
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.journal = []
+
+    @contextmanager
+    def lock(self):
+        yield
+
+    def _append(self, record):
+        self.journal.append(record)
+
+    def _records(self):
+        return list(self.journal)
+
+    def _compact(self):
+        # Dropping settled entries costs nothing here, so keep the journal to what is pending
+        keep = {entry['key'] for entry in self._replay().values() if entry['status'] == 'pending'}
+        self.journal = [record for record in self.journal if record.get('key') in keep]
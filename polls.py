@@ -0,0 +1,57 @@
+"""Poll sources and the limits X enforces on polls
+
+Polls live in ``data/polls.json`` (``{"polls": [{"question": ..., "options":
+[...]}, ...]}``) and are compiled into ``data/polls.corpus`` like quotes: the
+question is the corpus text and the options are an extra indexed section.
+Every poll is checked against X's limits at compile time, so one that X
+would reject never makes it into the corpus. Option lengths are measured
+with the weighted tweet length, so an emoji counts as two characters; that
+errs on the side of rejecting an option X might have accepted.
+"""
+
+import json
+
+from tweet_text import MAX_TWEET_LENGTH, weighted_length
+
+MIN_POLL_OPTIONS = 2
+MAX_POLL_OPTIONS = 4
+MAX_OPTION_LENGTH = 25
+POLL_DURATION_MINUTES = 1440
+
+# Options are stored back to back in the OPTS section, split on this
+OPTION_SEPARATOR = '\x1f'
+
+
+def read_source_polls(path):
+    """Read polls from a JSON source (``{"polls": [...]}`` or a bare list)"""
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    polls = data['polls'] if isinstance(data, dict) else data
+    return [poll for poll in polls if isinstance(poll, dict)]
+
+
+def validate_poll(poll):
+    """Reasons X would reject ``poll``; an empty list means it is postable"""
+    problems = []
+    question = poll.get('question')
+    options = poll.get('options')
+    if not isinstance(question, str) or not question.strip():
+        problems.append("missing question")
+    elif weighted_length(question.strip()) > MAX_TWEET_LENGTH:
+        problems.append(f"question is over {MAX_TWEET_LENGTH} characters")
+    if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+        return problems + ["options must be a list of strings"]
+
+    options = [option.strip() for option in options]
+    if not MIN_POLL_OPTIONS <= len(options) <= MAX_POLL_OPTIONS:
+        problems.append(f"{len(options)} options, need {MIN_POLL_OPTIONS} to {MAX_POLL_OPTIONS}")
+    for option in options:
+        if not option:
+            problems.append("empty option")
+        elif weighted_length(option) > MAX_OPTION_LENGTH:
+            problems.append(f"option {option!r} is over {MAX_OPTION_LENGTH} characters")
+        elif OPTION_SEPARATOR in option or '\n' in option:
+            problems.append(f"option {option!r} contains a control character")
+    if len(set(options)) != len(options):
+        problems.append("duplicate options")
+    return problems
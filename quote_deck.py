@@ -0,0 +1,229 @@
+"""Shuffled-deck quote selection with a persisted cursor.
+
+The deck stores a seeded permutation of the corpus plus a cursor into it.
+Drawing a quote is ``order[cursor]`` followed by a cursor bump, so every pick
+costs the same no matter how large the corpus or the posting history gets,
+and no quote repeats until the whole deck has been dealt.
+
+State lives in two files next to each other:
+
+* ``<path>``      small JSON document (seed, epoch, cursor, fingerprint)
+* ``<path>.bin``  the quote keys and the permutation as packed 64-bit arrays
+
+Only the JSON document is rewritten after a normal draw; the binary arrays
+are rewritten when the deck is reshuffled or synced against a changed corpus.
+Loading a deck reads the JSON document and memory-maps the arrays, so a
+process that deals one quote only touches the pages it reads.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import random
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# Number of trailing picks from the previous epoch that must not open the next one
+REPEAT_BUFFER = 10
+
+
+def quote_key(text):
+    """Stable 64-bit key for a quote's text"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def keys_fingerprint(keys):
+    """Fingerprint of a corpus's quote keys, as kept by the deck and compiled into the corpus"""
+    return hashlib.blake2b(keys.tobytes(), digest_size=16).hexdigest()
+
+
+def _atomic_write(path, data, mode='w'):
+    tmp_path = f"{path}.tmp"
+    kwargs = {'encoding': 'utf-8'} if 'b' not in mode else {}
+    with open(tmp_path, mode, **kwargs) as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class QuoteDeck:
+    """Seeded permutation of a corpus with a persisted draw cursor"""
+
+    def __init__(self, path='data/quote_deck.json', seed=None):
+        self.path = path
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(64)
+        self.epoch = 0
+        self.cursor = 0
+        self.fingerprint = None
+        self.keys = array('Q')
+        self.order = array('Q')
+        self._arrays_dirty = False
+        self._mapped = None
+
+    # -- persistence -------------------------------------------------------
+
+    @classmethod
+    def load(cls, path='data/quote_deck.json'):
+        """Load a deck from disk, returning an empty deck if none exists"""
+        deck = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            with open(f"{path}.bin", 'rb') as file:
+                length = os.fstat(file.fileno()).st_size
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if length else None
+        except FileNotFoundError:
+            return deck
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Could not read quote deck %s, starting a new one: %s", path, e)
+            return deck
+
+        size = meta.get('size', 0)
+        if length != size * 16:
+            logger.warning("Quote deck %s is truncated, starting a new one", path)
+            if mapped is not None:
+                mapped.close()
+            return deck
+
+        deck.seed = meta['seed']
+        deck.epoch = meta['epoch']
+        deck.cursor = meta['cursor']
+        deck.fingerprint = meta['fingerprint']
+        if mapped is not None:
+            # Read in place; _detach copies the arrays out before anything rewrites them
+            deck._mapped = mapped
+            view = memoryview(mapped).cast('Q')
+            deck.keys, deck.order = view[:size], view[size:]
+        return deck
+
+    def _detach(self):
+        """Copy memory-mapped arrays into memory, before they are replaced or their file rewritten"""
+        if self._mapped is None:
+            return
+        keys, order = array('Q', self.keys), array('Q', self.order)
+        self.keys.release()
+        self.order.release()
+        self._mapped.close()
+        self.keys, self.order, self._mapped = keys, order, None
+
+    def save(self):
+        """Persist the cursor, and the arrays if they changed (a deck without a path lives in memory)"""
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self._arrays_dirty or not os.path.exists(f"{self.path}.bin"):
+            _atomic_write(f"{self.path}.bin", self.keys.tobytes() + self.order.tobytes(), 'wb')
+            self._arrays_dirty = False
+        meta = {
+            'seed': self.seed,
+            'epoch': self.epoch,
+            'cursor': self.cursor,
+            'size': len(self.keys),
+            'fingerprint': self.fingerprint,
+        }
+        _atomic_write(self.path, json.dumps(meta))
+
+    # -- corpus sync -------------------------------------------------------
+
+    def sync(self, keys, fingerprint=None):
+        """Bring the deck in line with the corpus described by ``keys``
+
+        ``keys`` holds one quote key per corpus position. Quotes that were
+        removed drop out of the deck, quotes that were added are shuffled
+        into the part of the deck that has not been dealt yet, and quotes
+        that merely moved keep their place. Returns True if anything changed.
+        ``fingerprint`` is the :func:`keys_fingerprint` of ``keys`` when the
+        caller already has it (a compiled corpus stores its own).
+        """
+        if not isinstance(keys, array) or keys.typecode != 'Q':
+            keys = array('Q', keys)
+        fingerprint = fingerprint or keys_fingerprint(keys)
+        if fingerprint == self.fingerprint:
+            return False
+        self._detach()
+
+        if not self.keys:
+            self.keys = keys
+            self.fingerprint = fingerprint
+            self._reshuffle(array('Q'))
+            return True
+
+        new_index = {key: index for index, key in enumerate(keys)}
+        old_keys = self.keys
+        dealt = array('Q')
+        pending = array('Q')
+        seen = set()
+        for position, old_index in enumerate(self.order):
+            key = old_keys[old_index]
+            index = new_index.get(key)
+            if index is None or key in seen:
+                continue
+            seen.add(key)
+            (dealt if position < self.cursor else pending).append(index)
+
+        rng = self._rng('sync', fingerprint)
+        for index, key in enumerate(keys):
+            if key in seen:
+                continue
+            seen.add(key)
+            # Append and swap into a random undealt slot (one Fisher-Yates step)
+            pending.append(index)
+            slot = rng.randrange(len(pending))
+            pending[slot], pending[-1] = pending[-1], pending[slot]
+
+        added = len(keys) - len(old_keys)
+        logger.info("Quote deck synced with corpus (%+d quotes, %d still to deal)", added, len(pending))
+        self.keys = keys
+        self.fingerprint = fingerprint
+        self.order = dealt + pending
+        self.cursor = len(dealt)
+        self._arrays_dirty = True
+        return True
+
+    # -- dealing -----------------------------------------------------------
+
+    def draw(self):
+        """Deal the next corpus index, reshuffling when the deck runs out"""
+        if not self.order:
+            raise IndexError("draw from an empty quote deck")
+        if self.cursor >= len(self.order):
+            self._reshuffle(array('Q', self.order[-REPEAT_BUFFER:]))
+        index = self.order[self.cursor]
+        self.cursor += 1
+        return index
+
+    def upcoming(self, count):
+        """The next ``count`` corpus indexes this epoch will deal, without dealing them"""
+        return array('Q', self.order[self.cursor:self.cursor + count])
+
+    def remaining(self):
+        """Number of quotes left before the deck is reshuffled"""
+        return len(self.order) - self.cursor
+
+    def _rng(self, *salt):
+        return random.Random(f"{self.seed}:{self.epoch}:" + ":".join(map(str, salt)))
+
+    def _reshuffle(self, recent):
+        """Start a new epoch with a fresh permutation of the whole corpus"""
+        self._detach()
+        self.epoch += 1
+        order = list(range(len(self.keys)))
+        self._rng('shuffle').shuffle(order)
+
+        # Open with the first entries that were not among the last few picks of the previous epoch
+        buffer = min(len(recent), len(order) // 2)
+        if buffer:
+            recent_set = set(recent[-buffer:])
+            if recent_set.intersection(order[:buffer]):
+                head = [index for index in order if index not in recent_set][:buffer]
+                head_set = set(head)
+                order = head + [index for index in order if index not in head_set]
+
+        self.order = array('Q', order)
+        self.cursor = 0
+        self._arrays_dirty = True
+        logger.info("Quote deck reshuffled (epoch %d, %d quotes)", self.epoch, len(order))
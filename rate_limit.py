@@ -0,0 +1,353 @@
+"""Shared rate-limit budget and retry engine for X API calls
+
+X reports each endpoint's budget in response headers:
+
+* ``x-rate-limit-limit`` / ``-remaining`` / ``-reset`` for the 15-minute window
+* ``x-user-limit-24hour-limit`` / ``-remaining`` / ``-reset`` for daily caps
+* ``Retry-After`` on some 429 and 503 responses
+
+:class:`RateLimiter` keeps one token bucket per endpoint (and per daily cap),
+refilled from those headers and persisted to disk, so back-to-back cron runs
+spend a single budget instead of each discovering it with a 429.
+:func:`call_with_retries` wraps an API call with that budget plus jittered
+exponential backoff that never retries sooner than the server asked.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from metrics import NULL_METRICS
+
+logger = logging.getLogger(__name__)
+
+# The 15-minute window and the daily cap are tracked as separate buckets
+WINDOW_HEADERS = ('x-rate-limit-limit', 'x-rate-limit-remaining', 'x-rate-limit-reset')
+DAILY_HEADERS = ('x-user-limit-24hour-limit', 'x-user-limit-24hour-remaining', 'x-user-limit-24hour-reset')
+DAILY_SUFFIX = ' [24h]'
+
+# Numeric path segments (tweet/user ids) after the API version share one bucket
+_ID_SEGMENT = re.compile(r'(?<!^)/\d+(?=/|$)')
+
+
+def endpoint_key(method, url):
+    """Normalize a request into a bucket name such as ``POST /2/tweets``"""
+    path = re.sub(r'^[a-z]+://[^/]+', '', url).split('?', 1)[0]
+    return f"{method.upper()} {_ID_SEGMENT.sub('/:id', path)}"
+
+
+class RateLimitExhausted(Exception):
+    """Raised when an endpoint's budget will not refill within the allowed wait"""
+
+    def __init__(self, endpoint, wait):
+        super().__init__(f"{endpoint} budget exhausted for another {wait:.0f}s")
+        self.endpoint = endpoint
+        self.wait = wait
+
+
+class ResponseInterrupted(Exception):
+    """Raised when a connection breaks after part of the response has arrived
+
+    The server had the whole request by then and may have acted on it, so
+    resending a POST could publish it twice; it is never retried here.
+    """
+
+
+class TokenBucket:
+    """Budget for one endpoint: ``remaining`` tokens until ``reset`` (epoch seconds)"""
+
+    def __init__(self, limit=None, remaining=None, reset=0.0, blocked_until=0.0):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.blocked_until = blocked_until
+
+    def wait_time(self, now):
+        """Seconds to wait before a call may be made"""
+        wait = max(0.0, self.blocked_until - now)
+        if self.remaining is not None and self.remaining <= 0 and now < self.reset:
+            wait = max(wait, self.reset - now)
+        return wait
+
+    def take(self, now):
+        """Spend a token locally; the next response's headers correct any drift"""
+        if self.reset and now >= self.reset:
+            # Window rolled over since we last heard from the server
+            self.remaining = self.limit
+        if self.remaining is not None:
+            self.remaining = max(0, self.remaining - 1)
+
+    def to_dict(self):
+        return {
+            'limit': self.limit,
+            'remaining': self.remaining,
+            'reset': self.reset,
+            'blocked_until': self.blocked_until,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('limit'), data.get('remaining'), data.get('reset', 0.0), data.get('blocked_until', 0.0))
+
+
+class RateLimiter:
+    """Per-endpoint token buckets fed by response headers and persisted to ``path``"""
+
+    def __init__(self, path='data/rate_limits.json', clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.buckets = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    # -- persistence -------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning("Ignoring unreadable rate-limit state %s: %s", self.path, e)
+            return {}
+        return {name: TokenBucket.from_dict(bucket) for name, bucket in data.items()}
+
+    def load(self):
+        if self.path is None:
+            return
+        with self._file_lock():
+            buckets = self._read()
+        with self._lock:
+            self.buckets = buckets
+
+    def save(self):
+        """Write our buckets back, keeping whichever view of each is more pessimistic"""
+        if self.path is None:
+            return
+        with self._file_lock():
+            merged = self._read()
+            now = self.clock()
+            with self._lock:
+                for name, bucket in self.buckets.items():
+                    other = merged.get(name)
+                    if other is None:
+                        merged[name] = bucket
+                        continue
+                    newer = bucket.reset > other.reset or (bucket.reset == other.reset and _fewer(bucket, other))
+                    chosen = TokenBucket.from_dict((bucket if newer else other).to_dict())
+                    chosen.blocked_until = max(bucket.blocked_until, other.blocked_until)
+                    merged[name] = chosen
+            # Forget windows that ended long ago
+            merged = {
+                name: bucket for name, bucket in merged.items()
+                if max(bucket.reset, bucket.blocked_until) > now - 86400
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({name: bucket.to_dict() for name, bucket in merged.items()}, file, indent=2)
+            os.replace(tmp_path, self.path)
+
+    # -- budget ------------------------------------------------------------
+
+    def _bucket(self, name):
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            bucket = self.buckets[name] = TokenBucket()
+        return bucket
+
+    def wait_time(self, endpoint):
+        """Seconds until ``endpoint`` (and its daily cap) has budget again"""
+        now = self.clock()
+        with self._lock:
+            return max(
+                self._bucket(endpoint).wait_time(now),
+                self._bucket(endpoint + DAILY_SUFFIX).wait_time(now),
+            )
+
+    def take(self, endpoint):
+        now = self.clock()
+        with self._lock:
+            self._bucket(endpoint).take(now)
+            self._bucket(endpoint + DAILY_SUFFIX).take(now)
+
+    def update_from_headers(self, endpoint, headers):
+        """Refill buckets from the rate-limit headers of a response"""
+        now = self.clock()
+        with self._lock:
+            for suffix, names in (('', WINDOW_HEADERS), (DAILY_SUFFIX, DAILY_HEADERS)):
+                values = [headers.get(name) for name in names]
+                if None in values:
+                    continue
+                try:
+                    limit, remaining, reset = (int(value) for value in values)
+                except ValueError:
+                    continue
+                bucket = self._bucket(endpoint + suffix)
+                bucket.limit, bucket.remaining, bucket.reset = limit, remaining, float(reset)
+
+            retry_after = parse_retry_after(headers.get('retry-after'), now)
+            if retry_after:
+                bucket = self._bucket(endpoint)
+                bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+
+    def response_hook(self, response, *args, **kwargs):
+        """``requests`` response hook that feeds every API response into the limiter"""
+        self.update_from_headers(endpoint_key(response.request.method, response.url), response.headers)
+
+
+def _fewer(bucket, other):
+    if bucket.remaining is None:
+        return False
+    return other.remaining is None or bucket.remaining < other.remaining
+
+
+def parse_retry_after(value, now):
+    """Seconds to wait from a ``Retry-After`` header (delta seconds or HTTP date)"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RetryPolicy:
+    """Jittered exponential backoff: ``base * 2**attempt`` capped at ``max_delay``
+
+    ``max_wait`` bounds how long a single call will sleep for budget; a
+    longer wait (e.g. an exhausted daily cap) fails fast instead of blocking.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=30.0, max_delay=900.0, max_wait=900.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.rng = rng or random
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number ``attempt`` (0-based)"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return self.rng.uniform(ceiling / 2, ceiling)
+
+
+def error_status(error):
+    """HTTP status of a failed API call, or None for network-level errors"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def is_retryable(error):
+    """429s, server errors and network failures are worth retrying; other 4xx are not
+
+    Nor is a :class:`ResponseInterrupted` request, which may already have gone through.
+    """
+    if isinstance(error, ResponseInterrupted):
+        return False
+    status = error_status(error)
+    return status is None or status == 429 or status >= 500
+
+
+def _budget_wait(endpoint, limiter, policy):
+    """Seconds to sleep before the next attempt; raises if that is longer than allowed"""
+    wait = limiter.wait_time(endpoint)
+    if wait > policy.max_wait:
+        raise RateLimitExhausted(endpoint, wait)
+    if wait > 0:
+        logger.warning("Waiting %.0fs for %s rate-limit budget", wait, endpoint)
+    return wait
+
+
+def _retry_delay(error, endpoint, limiter, policy, attempt, description):
+    """Seconds to sleep before retrying after ``error``; raises if it should not be retried"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        limiter.update_from_headers(endpoint, headers)
+    if not is_retryable(error) or attempt == policy.max_attempts - 1:
+        raise error
+
+    # Never retry sooner than the server's reset / Retry-After
+    delay = max(policy.backoff(attempt), limiter.wait_time(endpoint))
+    if delay > policy.max_wait:
+        raise RateLimitExhausted(endpoint, delay) from error
+    logger.warning("%s failed (%s), retrying in %.0fs (%d/%d)",
+                   description, error, delay, attempt + 1, policy.max_attempts)
+    return delay
+
+
+def call_with_retries(endpoint, func, limiter, policy=None, sleep=time.sleep, description="API call",
+                      metrics=NULL_METRICS):
+    """Call ``func()`` within ``endpoint``'s budget, retrying transient failures
+
+    Returns whatever ``func`` returns. Raises :class:`RateLimitExhausted` if
+    the budget will not refill within ``policy.max_wait``, and re-raises the
+    last error once it is permanent or retries are used up. Time spent in the
+    call, waiting for budget and backing off goes to ``metrics``.
+    """
+    policy = policy or RetryPolicy()
+    for attempt in range(policy.max_attempts):
+        wait = _budget_wait(endpoint, limiter, policy)
+        if wait > 0:
+            metrics.increment('rate_limit_waits', endpoint=endpoint)
+            with metrics.span('rate_limit_wait'):
+                sleep(wait)
+
+        limiter.take(endpoint)
+        try:
+            with metrics.span('api_call'):
+                return func()
+        except Exception as e:
+            metrics.increment('api_errors', endpoint=endpoint, error=type(e).__name__)
+            delay = _retry_delay(e, endpoint, limiter, policy, attempt, description)
+            metrics.increment('retries', endpoint=endpoint)
+            with metrics.span('retry_backoff'):
+                sleep(delay)
+
+
+async def call_with_retries_async(endpoint, func, limiter, policy=None, sleep=asyncio.sleep, description="API call",
+                                  metrics=NULL_METRICS):
+    """:func:`call_with_retries` for a coroutine function, sleeping without blocking the loop"""
+    policy = policy or RetryPolicy()
+    for attempt in range(policy.max_attempts):
+        wait = _budget_wait(endpoint, limiter, policy)
+        if wait > 0:
+            metrics.increment('rate_limit_waits', endpoint=endpoint)
+            with metrics.span('rate_limit_wait'):
+                await sleep(wait)
+
+        limiter.take(endpoint)
+        try:
+            with metrics.span('api_call'):
+                return await func()
+        except Exception as e:
+            metrics.increment('api_errors', endpoint=endpoint, error=type(e).__name__)
+            delay = _retry_delay(e, endpoint, limiter, policy, attempt, description)
+            metrics.increment('retries', endpoint=endpoint)
+            with metrics.span('retry_backoff'):
+                await sleep(delay)
@@ -0,0 +1,249 @@
+"""Replies to the account's mentions, polled incrementally
+
+:class:`MentionResponder` reads ``GET /2/users/:id/mentions`` from a
+``since_id`` cursor kept in the post history's meta table, so a poll only
+pages through mentions that arrived since the last one. The authors and the
+tweets the mentions reply to come back in the same response as expansions.
+A mention replying to one of the account's own posts is answered from the
+replies of that post's hook category (the hook it ended with, else the
+category of its text); any other mention gets a general reply.
+
+Replies are journaled in their own outbox before the cursor moves past
+their mentions, then published from a bounded thread pool through the
+shared rate limiter. A crash or an exhausted budget leaves them queued for
+the next poll, and a sweep cut short resumes from its pagination token.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+
+from engagement import tweet_hook
+from hooks import CATEGORY_NAMES, GENERAL, HOOKS, classify_hook_category
+from metrics import NULL_METRICS
+from outbox import DROP, RETRY, SENT
+from rate_limit import RateLimitExhausted, RetryPolicy, call_with_retries, error_status, is_retryable
+
+logger = logging.getLogger(__name__)
+
+MENTIONS_ENDPOINT = 'GET /2/users/:id/mentions'
+TWEETS_ENDPOINT = 'POST /2/tweets'
+# The largest page the mentions timeline returns
+PAGE_SIZE = 100
+CURSOR_KEY = 'mentions_cursor'
+REPLY_WORKERS = 4
+
+EXPANSIONS = ['author_id', 'referenced_tweets.id']
+TWEET_FIELDS = ['author_id', 'conversation_id', 'referenced_tweets']
+
+# Replies by hook category, in the order of hooks.HOOKS
+REPLIES = [
+    [
+        "🏆 Love that, @{username}! Keep stacking those wins.",
+        "🎯 That's the spirit, @{username}. Go get it!",
+        "🚀 Big goals, @{username}! Rooting for you.",
+    ],
+    [
+        "🌱 Love that you're growing, @{username}! Keep learning.",
+        "📚 Great lesson, @{username}. Thanks for sharing it!",
+        "🔄 Small changes add up, @{username}. Keep going!",
+    ],
+    [
+        "🔥 That's what keeps the fire going, @{username}!",
+        "⚡ Love the energy, @{username}. Keep chasing it!",
+        "💭 Thanks for sharing what drives you, @{username}!",
+    ],
+    [
+        "💪 Respect, @{username}. Every setback is a setup for a comeback.",
+        "🛡️ You've got this, @{username}. Keep pushing through!",
+        "🌟 That takes strength, @{username}. Thanks for sharing it.",
+    ],
+    [
+        "🙌 Thanks for joining in, @{username}!",
+        "💡 Love your take, @{username}!",
+        "✨ Appreciate you, @{username}. Have a great day!",
+    ],
+]
+
+_HOOK_CATEGORY = {hook: category for category, hooks in enumerate(HOOKS) for hook in hooks}
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class PollResult:
+    def __init__(self):
+        self.started = False
+        self.pages = 0
+        self.fetched = 0
+        self.queued = 0
+        self.skipped = 0
+        self.sent = 0
+        self.dropped = 0
+        self.pending = 0
+        self.stopped = None
+
+    def __repr__(self):
+        return (f"PollResult(pages={self.pages}, fetched={self.fetched}, queued={self.queued}, "
+                f"skipped={self.skipped}, sent={self.sent}, dropped={self.dropped}, pending={self.pending}, "
+                f"stopped={self.stopped!r})")
+
+
+class MentionResponder:
+    """Poll the mentions of ``user_id`` into ``outbox`` and publish the replies
+
+    ``client`` is a tweepy ``Client`` (or ``fake_x_api.FakeClient``) and
+    ``state_store`` holds the cursor. Like the engagement harvester, calls
+    go through ``limiter`` and ``policy``; a budget that will not refill
+    within ``policy.max_wait`` ends the poll early. ``workers`` replies are
+    published at once.
+    """
+
+    def __init__(self, client, state_store, outbox, limiter, user_id, policy=None, clock=time.time,
+                 metrics=NULL_METRICS, workers=REPLY_WORKERS):
+        self.client = client
+        self.state_store = state_store
+        self.outbox = outbox
+        self.limiter = limiter
+        self.user_id = int(user_id)
+        self.policy = policy or RetryPolicy()
+        self.clock = clock
+        self.metrics = metrics
+        self.workers = workers
+
+    def fetch(self, **params):
+        """One page of the mentions timeline, with authors and replied-to tweets expanded"""
+        return call_with_retries(
+            MENTIONS_ENDPOINT,
+            lambda: self.client.get_users_mentions(self.user_id, max_results=PAGE_SIZE, expansions=EXPANSIONS,
+                                                   tweet_fields=TWEET_FIELDS, user_auth=True, **params),
+            self.limiter,
+            self.policy,
+            description="Fetching mentions",
+            metrics=self.metrics
+        )
+
+    def category(self, mention, tweets):
+        """Hook category of the post ``mention`` replies to; GENERAL if it is not one of ours"""
+        for reference in getattr(mention, 'referenced_tweets', None) or ():
+            parent = tweets.get(int(reference.id)) if reference.type == 'replied_to' else None
+            if parent is not None and int(getattr(parent, 'author_id', 0) or 0) == self.user_id:
+                hook = tweet_hook(parent.text)
+                return _HOOK_CATEGORY[hook] if hook else classify_hook_category(parent.text)
+        return GENERAL
+
+    def reply_text(self, mention, author, category):
+        # Chosen by mention id, so a requeued reply gets the same text
+        replies = REPLIES[category]
+        return replies[mention.id % len(replies)].format(username=author.username)
+
+    def queue(self, response, answered, result):
+        """Journal a reply to each mention of one page worth answering"""
+        includes = getattr(response, 'includes', None) or {}
+        users = {int(user.id): user for user in includes.get('users', [])}
+        tweets = {int(tweet.id): tweet for tweet in includes.get('tweets', [])}
+        for mention in response.data or ():
+            result.fetched += 1
+            author_id = int(getattr(mention, 'author_id', 0) or 0)
+            author = users.get(author_id)
+            # One reply per person and conversation; never to ourselves
+            conversation = (author_id, int(getattr(mention, 'conversation_id', None) or mention.id))
+            if author is None or author_id == self.user_id or conversation in answered:
+                result.skipped += 1
+                continue
+            answered.add(conversation)
+            category = self.category(mention, tweets)
+            self.outbox.enqueue('reply', self.reply_text(mention, author, category), source=str(mention.id),
+                                in_reply_to=str(mention.id), category=CATEGORY_NAMES[category])
+            result.queued += 1
+
+    def poll(self, max_pages=None):
+        """Fetch new mentions, queue their replies and publish what is queued; returns a :class:`PollResult`"""
+        result = PollResult()
+        cursor = self.state_store.get_meta(CURSOR_KEY)
+        if cursor is None:
+            # Answer what arrives from now on, not the account's whole mention history
+            self.state_store.set_meta(CURSOR_KEY, {'start_time': _iso(self.clock())})
+            result.started = True
+            return result
+
+        # Kept in the cursor while a sweep is cut short, so resuming it does not answer anyone twice
+        answered = {tuple(pair) for pair in cursor.pop('answered', [])}
+        try:
+            while True:
+                if max_pages is not None and result.pages >= max_pages:
+                    result.stopped = "page limit"
+                    break
+                params = {'since_id': cursor['since_id']} if cursor.get('since_id') else {
+                    'start_time': cursor['start_time']}
+                if cursor.get('next_token'):
+                    params['pagination_token'] = cursor['next_token']
+                try:
+                    with self.metrics.span('mentions_fetch'):
+                        response = self.fetch(**params)
+                except RateLimitExhausted as e:
+                    logger.warning("Stopping the mentions poll: %s", e)
+                    result.stopped = str(e)
+                    break
+                result.pages += 1
+                meta = getattr(response, 'meta', None) or {}
+                # Pages run newest to oldest; the sweep's first page holds its newest mention
+                if 'next_token' not in cursor and meta.get('newest_id'):
+                    cursor['newest_id'] = str(meta['newest_id'])
+                self.queue(response, answered, result)
+
+                if meta.get('next_token'):
+                    cursor['next_token'] = meta['next_token']
+                    cursor['answered'] = sorted(answered)
+                else:
+                    cursor.pop('next_token', None)
+                    cursor.pop('answered', None)
+                    newest = cursor.pop('newest_id', None)
+                    if newest is not None:
+                        cursor = {'since_id': newest}
+                # Only now are this page's replies safely journaled
+                self.state_store.set_meta(CURSOR_KEY, cursor)
+                if 'next_token' not in cursor:
+                    break
+        finally:
+            self.limiter.save()
+        self.metrics.increment('mentions_fetched', result.fetched)
+        self.publish_pending(result)
+        return result
+
+    def publish(self, entry):
+        """Post one queued reply; returns the outcome the outbox should record"""
+        try:
+            response = call_with_retries(
+                TWEETS_ENDPOINT,
+                lambda: self.client.create_tweet(text=entry['text'], in_reply_to_tweet_id=entry['in_reply_to']),
+                self.limiter,
+                self.policy,
+                description=f"Replying to mention {entry['in_reply_to']}",
+                metrics=self.metrics
+            )
+        except RateLimitExhausted as e:
+            return RETRY, str(e)
+        except Exception as e:
+            if error_status(e) == 401 or is_retryable(e):
+                return RETRY, str(e)
+            # A deleted mention, a conversation closed to replies or a duplicate text never gets through
+            logger.warning("Not replying to mention %s: %s", entry['in_reply_to'], e)
+            return DROP, str(e)
+        return SENT, str(response.data['id'])
+
+    def publish_pending(self, result, limit=None):
+        try:
+            with self.metrics.span('publish_replies'):
+                handled = self.outbox.drain(self.publish, limit, workers=self.workers)
+        finally:
+            self.limiter.save()
+        for entry, outcome, _ in handled:
+            self.metrics.increment('replies', outcome=outcome, category=entry.get('category', ''))
+            if outcome == SENT:
+                result.sent += 1
+            elif outcome == DROP:
+                result.dropped += 1
+        result.pending = len(self.outbox.pending())
+        return handled
@@ -0,0 +1,217 @@
+"""In-process posting schedule for daemon mode
+
+Instead of a fresh GitHub Actions runner per post, ``python twitter_bot.py
+--daemon`` keeps one bot (HTTP session, corpus, deck, rate limiter) alive and
+fires the same daily slots from a hashed timer wheel.
+"""
+
+import logging
+import math
+import os
+import re
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_PATH = '.github/workflows/daily-quote.yml'
+
+# Fallback when the workflow file is missing: the same UTC slots it defines
+DEFAULT_SLOTS = [
+    (4, 30), (5, 30), (6, 30), (8, 10), (9, 30), (10, 30),
+    (11, 30), (12, 30), (13, 30), (14, 30), (15, 30),
+]
+
+_DAILY_CRON = re.compile(r"cron:\s*['\"](\d{1,2})\s+(\d{1,2})\s+\*\s+\*\s+\*['\"]")
+
+
+def load_schedule(path=WORKFLOW_PATH):
+    """Daily (hour, minute) UTC slots from the workflow's ``M H * * *`` cron lines"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+    except OSError:
+        return list(DEFAULT_SLOTS)
+    slots = sorted({(int(hour), int(minute)) for minute, hour in _DAILY_CRON.findall(text)})
+    return slots or list(DEFAULT_SLOTS)
+
+
+def next_occurrence(slot, now):
+    """Epoch seconds of the next time ``slot`` (hour, minute UTC) comes round after ``now``"""
+    hour, minute = slot
+    current = datetime.fromtimestamp(now, timezone.utc)
+    candidate = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate.timestamp() <= now:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+class Timer:
+    __slots__ = ('tick', 'callback', 'cancelled')
+
+    def __init__(self, tick, callback):
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) schedule, and each tick only looks at one slot"""
+
+    def __init__(self, tick=1.0, slots=512, now=None):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current = int((time.time() if now is None else now) // tick)
+
+    def schedule(self, when, callback):
+        """Run ``callback`` once the wheel has advanced past epoch time ``when``"""
+        target = max(math.ceil(when / self.tick), self.current + 1)
+        timer = Timer(target, callback)
+        self.slots[target % len(self.slots)].append(timer)
+        return timer
+
+    def advance(self, now):
+        """Fire every timer due at or before ``now``, in due order"""
+        target = int(now // self.tick)
+        if target <= self.current:
+            return 0
+        if target - self.current >= len(self.slots):
+            # Slept through a full rotation (e.g. a suspended host): sweep everything
+            candidates = range(len(self.slots))
+        else:
+            candidates = [tick % len(self.slots) for tick in range(self.current + 1, target + 1)]
+        self.current = target
+
+        due = []
+        for index in candidates:
+            slot = self.slots[index]
+            if not slot:
+                continue
+            keep = []
+            for timer in slot:
+                if timer.cancelled:
+                    continue
+                (due if timer.tick <= target else keep).append(timer)
+            slot[:] = keep
+
+        due.sort(key=lambda timer: timer.tick)
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception:
+                logger.exception("Scheduled task failed")
+        return len(due)
+
+    def __len__(self):
+        return sum(1 for slot in self.slots for timer in slot if not timer.cancelled)
+
+
+class FileWatcher:
+    """Detect changes to a set of files by polling their mtimes"""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._stamps = {path: self._stamp(path) for path in self.paths}
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def changed(self):
+        """Paths whose mtime or size changed since the last call"""
+        changed = []
+        for path in self.paths:
+            stamp = self._stamp(path)
+            if stamp != self._stamps[path]:
+                self._stamps[path] = stamp
+                changed.append(path)
+        return changed
+
+
+class BotDaemon:
+    """Keep one bot alive and post on the daily schedule
+
+    ``bot_factory(reload_config)`` builds the bot. A change to one of
+    ``content_paths`` (the quote sources) makes the live bot reload its
+    corpus; a change to one of ``config_paths`` rebuilds the bot.
+    ``metrics`` (a ``metrics.Metrics``) is exported after every post. With
+    ``cards``, the bot's upcoming image cards are rendered after each post, as
+    a task of its own so the next slot is scheduled first.
+    """
+
+    def __init__(self, bot_factory, slots=None, content_paths=(), config_paths=('.env',),
+                 watch_interval=30.0, tick=1.0, metrics=None, cards=False):
+        self.bot_factory = bot_factory
+        self.metrics = metrics
+        self.cards = cards
+        self.slots = slots or load_schedule()
+        self.content_watcher = FileWatcher(content_paths)
+        self.config_watcher = FileWatcher(config_paths)
+        self.watch_interval = watch_interval
+        self.tick = tick
+        self.wheel = TimerWheel(tick)
+        self.stop_event = threading.Event()
+        self.bot = None
+
+    def _schedule_slot(self, slot):
+        when = next_occurrence(slot, time.time())
+        self.wheel.schedule(when, lambda: self._post(slot))
+        logger.info("Next post for slot %02d:%02d UTC at %s", slot[0], slot[1],
+                    datetime.fromtimestamp(when, timezone.utc).strftime('%Y-%m-%d %H:%M'))
+
+    def _post(self, slot):
+        try:
+            self.bot.post_daily_content()
+        finally:
+            if self.metrics is not None:
+                self.metrics.export()
+            self._schedule_slot(slot)
+            if self.cards:
+                self.wheel.schedule(time.time(), self._render_cards)
+
+    def _render_cards(self):
+        self.bot.prerender_cards()
+
+    def _watch(self):
+        try:
+            if self.config_watcher.changed():
+                logger.info("Configuration changed, rebuilding the bot")
+                self.bot.flush_state()
+                self.bot = self.bot_factory(reload_config=True)
+            elif self.content_watcher.changed():
+                logger.info("Quote sources changed, reloading the corpus")
+                self.bot.reload_quotes()
+        finally:
+            self.wheel.schedule(time.time() + self.watch_interval, self._watch)
+
+    def request_stop(self, signum=None, frame=None):
+        logger.info("Shutdown requested%s", f" (signal {signum})" if signum else '')
+        self.stop_event.set()
+
+    def run(self):
+        """Run until SIGINT/SIGTERM, then flush the bot's state"""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self.request_stop)
+
+        self.bot = self.bot_factory(reload_config=False)
+        for slot in self.slots:
+            self._schedule_slot(slot)
+        self.wheel.schedule(time.time() + self.watch_interval, self._watch)
+        logger.info("Daemon started with %d daily slots", len(self.slots))
+
+        try:
+            while not self.stop_event.is_set():
+                self.wheel.advance(time.time())
+                self.stop_event.wait(self.tick)
+        finally:
+            self.bot.flush_state()
+            logger.info("Daemon stopped, state flushed")
@@ -0,0 +1,243 @@
+"""Offline simulation of the posting pipeline
+
+``python twitter_bot.py simulate --days 365 --count 100`` runs the real bot
+(quote and poll selection, hooks, formatting, outbox, post history) for every
+slot of the workflow's cron schedule over N days, for one or many accounts.
+Nothing touches the network or the real ``data/`` state:
+
+* the API is an in-process :class:`fake_x_api.FakeXAPI` (status codes,
+  rate-limit headers, duplicate-content 403s) reached without HTTP,
+* time comes from a :class:`SimulatedClock` that jumps from slot to slot,
+* post history lives in an in-memory SQLite database, the outbox in a list,
+  the decks in memory, and compiled corpora in a temporary directory.
+
+The report gives the repeat rate of quotes and polls, the spread of hook
+categories that went out, and how often the API turned a post away (e.g. a
+duplicate-content 403 for a catalog that cycles faster than X's window).
+"""
+
+import contextlib
+import io
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from accounts import Account
+from compiler import compile_corpus, compile_polls
+from fake_x_api import FakeAsyncClient, FakeClient, FakeXAPI
+from hooks import CATEGORY_NAMES, HOOKS
+from outbox import MemoryOutbox
+from quote_deck import QuoteDeck
+from scheduler import load_schedule
+from state_store import SQLiteStateStore
+from tweet_text import HOOK_SEPARATOR
+
+# Simulations start at midnight UTC on 2026-01-01, so runs are comparable
+DEFAULT_START = 1767225600
+
+# How long the fake API rejects a repeated text; X keeps its own window undocumented
+DUPLICATE_WINDOW = 30 * 86400
+
+HOOK_CATEGORY = {hook: CATEGORY_NAMES[category] for category, hooks in enumerate(HOOKS) for hook in hooks}
+NO_HOOK = 'none'
+
+
+class SimulatedClock:
+    """A clock that only moves when told to; pass it wherever ``time.time`` is expected"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SimulationReport:
+    """Totals of one or more simulated accounts"""
+
+    def __init__(self, days, slots):
+        self.days = days
+        self.slots = slots
+        self.accounts = 0
+        self.runs = 0
+        self.failed_runs = 0
+        self.elapsed = 0.0
+        # kind -> [posts, distinct per account, repeated inside the no-repeat window, shortest gap in seconds]
+        self.kinds = {}
+        self.hooks = {name: 0 for name in CATEGORY_NAMES + [NO_HOOK]}
+        self.statuses = {}
+
+    def merge(self, other):
+        """Add another report's totals to this one"""
+        self.accounts += other.accounts
+        self.runs += other.runs
+        self.failed_runs += other.failed_runs
+        for kind, (posts, distinct, repeated, gap) in other.kinds.items():
+            totals = self.kinds.setdefault(kind, [0, 0, 0, None])
+            totals[0] += posts
+            totals[1] += distinct
+            totals[2] += repeated
+            if gap is not None:
+                totals[3] = gap if totals[3] is None else min(totals[3], gap)
+        for name, count in other.hooks.items():
+            self.hooks[name] += count
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def add_posts(self, posts, windows):
+        """Fold in one account's ``[(quote_id, posted_at, kind), ...]``"""
+        last_seen = {}
+        for quote_id, posted_at, kind in sorted(posts, key=lambda post: post[1]):
+            totals = self.kinds.setdefault(kind, [0, 0, 0, None])
+            totals[0] += 1
+            previous = last_seen.get((kind, quote_id))
+            if previous is None:
+                totals[1] += 1
+            else:
+                gap = posted_at - previous
+                if gap < windows.get(kind, 0) * 86400:
+                    totals[2] += 1
+                totals[3] = gap if totals[3] is None else min(totals[3], gap)
+            last_seen[(kind, quote_id)] = posted_at
+
+    def add_tweets(self, tweets):
+        """Tally the hook category of every quote that went out (the last part, for threads)"""
+        parents = {tweet.get('in_reply_to_tweet_id') for tweet in tweets}
+        for tweet in tweets:
+            if 'poll' in tweet or tweet['id'] in parents:
+                continue
+            _, separator, tail = tweet['text'].rpartition(HOOK_SEPARATOR)
+            self.hooks[HOOK_CATEGORY.get(tail, NO_HOOK) if separator else NO_HOOK] += 1
+
+    def format(self):
+        lines = [
+            f"Simulated {self.days} days x {len(self.slots)} daily slots for {self.accounts} accounts "
+            f"in {self.elapsed:.1f}s ({self.runs / max(self.elapsed, 1e-9):,.0f} runs/s)",
+            f"Runs: {self.runs:,} ({self.failed_runs:,} failed)",
+            "API responses: " + ", ".join(f"{status} x{count:,}" for status, count in sorted(self.statuses.items())),
+        ]
+        for kind, (posts, distinct, repeated, gap) in sorted(self.kinds.items()):
+            shortest = f"{gap / 86400:.1f} days" if gap is not None else "n/a"
+            lines.append(
+                f"{kind.capitalize()}s: {posts:,} posted, {distinct:,} distinct, "
+                f"{posts - distinct:,} repeats ({(posts - distinct) / posts:.1%}), "
+                f"{repeated:,} inside the no-repeat window ({repeated / posts:.2%}), shortest gap {shortest}"
+            )
+        total = sum(self.hooks.values())
+        if total:
+            lines.append("Hook categories: " + ", ".join(
+                f"{name} {count / total:.1%}" for name, count in self.hooks.items()))
+        return "\n".join(lines)
+
+
+def simulation_account(account, directory, compiled):
+    """Copy of ``account`` whose state lives under ``directory`` instead of ``data/``
+
+    Its corpora are copied from ``compiled``, which maps source lists to
+    corpora built once for every account that shares them.
+    """
+    copy = Account(account.name, account.env_prefix, os.path.join(directory, 'accounts', account.name),
+                   account.quote_sources, account.poll_sources)
+    key = (tuple(account.quote_sources), tuple(account.poll_sources))
+    shared = compiled.get(key)
+    if shared is None:
+        name = f"shared{len(compiled)}"
+        shared = compiled[key] = Account(name, data_dir=os.path.join(directory, name),
+                                         quote_sources=account.quote_sources, poll_sources=account.poll_sources)
+        with _quiet():
+            compile_corpus(shared.quote_sources, shared.corpus_path, shared.compile_cache_dir)
+            compile_polls(shared.poll_sources, shared.poll_corpus_path, os.path.join(shared.compile_cache_dir, 'polls'))
+    os.makedirs(copy.data_dir, exist_ok=True)
+    for source, target in ((shared.corpus_path, copy.corpus_path), (shared.poll_corpus_path, copy.poll_corpus_path)):
+        if os.path.exists(source):
+            # copy2 keeps the mtime, so the copy is as fresh as the sources it was built from
+            shutil.copy2(source, target)
+    return copy
+
+
+@contextlib.contextmanager
+def _quiet():
+    """Silence the bot's per-post output and logging; the report counts what went wrong"""
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.CRITICAL)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        root.setLevel(level)
+
+
+def simulate_account(account, bot_factory, days, slots, start=DEFAULT_START, seed=0, windows=None,
+                     daily_tweet_limit=None, duplicate_window=DUPLICATE_WINDOW):
+    """Post every slot of ``days`` days for one account; returns its :class:`SimulationReport`
+
+    ``bot_factory(account, client, async_client, clock)`` builds the bot;
+    ``windows`` maps post kinds to their no-repeat window in days.
+    """
+    report = SimulationReport(days, slots)
+    # Hooks and the poll coin flip draw from the module-level RNG
+    random.seed(seed)
+    clock = SimulatedClock(start)
+    api = FakeXAPI(daily_tweet_limit=daily_tweet_limit, clock=clock, duplicate_window=duplicate_window)
+    async_client = FakeAsyncClient(api, {'api_key': '', 'api_secret': '', 'access_token': None,
+                                         'access_token_secret': ''})
+    offsets = sorted(hour * 3600 + minute * 60 for hour, minute in slots)
+    with _quiet():
+        bot = bot_factory(account, FakeClient(api), async_client, clock)
+        async_client.limiter = bot.rate_limiter
+        # Keep the rate-limit budget, post history, outbox and decks in memory
+        bot.rate_limiter.path = None
+        bot.state_store = SQLiteStateStore(':memory:', legacy_path=None, clock=clock)
+        bot.outbox = MemoryOutbox(clock=clock)
+        bot.quote_deck = QuoteDeck(None, seed=seed)
+        bot.poll_deck = QuoteDeck(None, seed=seed)
+
+        for day in range(days):
+            midnight = start + day * 86400
+            for offset in offsets:
+                clock.now = midnight + offset
+                report.runs += 1
+                if not bot.post_daily_content():
+                    report.failed_runs += 1
+        bot.flush_state()
+
+    posts = bot.state_store.recent_posts(limit=-1)
+    report.add_posts([(post['quote_id'], post['posted_at'], post['kind']) for post in posts], windows or {})
+    report.add_tweets(api.tweets)
+    report.statuses = dict(api.statuses)
+    report.accounts = 1
+    bot.state_store.close()
+    return report
+
+
+def simulate(accounts, bot_factory, days=365, slots=None, start=DEFAULT_START, seed=0, windows=None,
+             daily_tweet_limit=None, duplicate_window=DUPLICATE_WINDOW, workers=1):
+    """Simulate ``days`` days of the schedule for every account; returns a :class:`SimulationReport`
+
+    Accounts are independent, so with ``workers`` > 1 they are simulated in
+    that many processes (``bot_factory`` must then be picklable).
+    """
+    slots = slots or load_schedule()
+    report = SimulationReport(days, slots)
+    began = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='simulate-') as directory:
+        compiled = {}
+        jobs = [
+            (simulation_account(account, directory, compiled), bot_factory, days, slots, start, seed + number, windows,
+             daily_tweet_limit, duplicate_window)
+            for number, account in enumerate(accounts)
+        ]
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                results = list(executor.map(simulate_account, *zip(*jobs)))
+        else:
+            results = [simulate_account(*job) for job in jobs]
+    for result in results:
+        report.merge(result)
+    report.elapsed = time.perf_counter() - began
+    return report
@@ -0,0 +1,268 @@
+"""Post history storage
+
+Every post the bot makes is recorded as ``(quote id, tweet id, timestamp,
+kind)``. :class:`StateStore` is the interface the bot codes against;
+:class:`SQLiteStateStore` is the default backend. It uses a WAL-mode
+database, so overlapping cron and ``workflow_dispatch`` runs append
+concurrently instead of clobbering each other's JSON rewrites, and
+"was this posted in the last N days" is one indexed lookup.
+
+The legacy ``data/used_quotes.json`` history is imported the first time the
+database is opened.
+"""
+
+import abc
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+
+from quote_deck import quote_key
+
+logger = logging.getLogger(__name__)
+
+LEGACY_USED_QUOTES = 'data/used_quotes.json'
+DEFAULT_DB_PATH = 'data/state.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id INTEGER PRIMARY KEY,
+    quote_id INTEGER NOT NULL,
+    tweet_id TEXT,
+    posted_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_quote_time ON posts (quote_id, posted_at);
+CREATE INDEX IF NOT EXISTS posts_time ON posts (posted_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def to_signed(key):
+    """Map an unsigned 64-bit quote key into SQLite's signed INTEGER range"""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class StateStore(abc.ABC):
+    """Interface for post-history backends"""
+
+    @abc.abstractmethod
+    def record_post(self, quote_id, tweet_id, kind, text=None, posted_at=None):
+        """Append a post to the history"""
+
+    @abc.abstractmethod
+    def posted_within(self, quote_id, days, now=None):
+        """Whether ``quote_id`` was posted in the last ``days`` days"""
+
+    @abc.abstractmethod
+    def last_posted(self, quote_id):
+        """Timestamp of the latest post of ``quote_id``, or None if it was never posted"""
+
+    @abc.abstractmethod
+    def recent_posts(self, limit=50, kind=None):
+        """Newest-first list of ``{'quote_id', 'tweet_id', 'posted_at', 'kind', 'text'}``"""
+
+    @abc.abstractmethod
+    def posts_after(self, row_id, limit=1000):
+        """Oldest-first posts with a tweet id, recorded after history row ``row_id``
+
+        Each post also carries its row ``id``, so a reader can resume from
+        the last one it saw.
+        """
+
+    @abc.abstractmethod
+    def quote_text(self, quote_id):
+        """Text of the latest post of ``quote_id``, or None"""
+
+    @abc.abstractmethod
+    def get_meta(self, key, default=None):
+        """Value stored under ``key`` with :meth:`set_meta`, or ``default``"""
+
+    @abc.abstractmethod
+    def set_meta(self, key, value):
+        """Store a JSON-serializable ``value`` under ``key``"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SQLiteStateStore(StateStore):
+    """Post history in a WAL-mode SQLite database"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, legacy_path=LEGACY_USED_QUOTES, clock=time.time, read_only=False):
+        """With ``read_only``, open an existing database without creating or migrating anything"""
+        self.path = path
+        self.clock = clock
+        self._lock = threading.Lock()
+        if read_only:
+            # Without a -wal file no process has the database open, and even a read-only
+            # connection would create -wal and -shm files; immutable reads just the main file
+            mode = 'mode=ro' if os.path.exists(f"{path}-wal") else 'immutable=1'
+            uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?{mode}"
+            self.connection = sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None,
+                                              check_same_thread=False)
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: every write below opens its own BEGIN IMMEDIATE transaction
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        if legacy_path:
+            self.migrate_json(legacy_path)
+
+    def _write(self, statements):
+        """Run ``[(sql, params), ...]`` as one transaction that excludes other writers"""
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def record_post(self, quote_id, tweet_id, kind, text=None, posted_at=None):
+        posted_at = self.clock() if posted_at is None else posted_at
+        self._write([(
+            "INSERT INTO posts (quote_id, tweet_id, posted_at, kind, text) VALUES (?, ?, ?, ?, ?)",
+            (to_signed(quote_id), tweet_id, posted_at, kind, text),
+        )])
+
+    def posted_within(self, quote_id, days, now=None):
+        now = self.clock() if now is None else now
+        rows = self._query(
+            "SELECT 1 FROM posts WHERE quote_id = ? AND posted_at >= ? LIMIT 1",
+            (to_signed(quote_id), now - days * 86400),
+        )
+        return bool(rows)
+
+    def last_posted(self, quote_id):
+        rows = self._query("SELECT MAX(posted_at) FROM posts WHERE quote_id = ?", (to_signed(quote_id),))
+        return rows[0][0]
+
+    def recent_posts(self, limit=50, kind=None):
+        sql = "SELECT quote_id, tweet_id, posted_at, kind, text FROM posts"
+        params = []
+        if kind is not None:
+            sql += " WHERE kind = ?"
+            params.append(kind)
+        sql += " ORDER BY posted_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return [
+            {'quote_id': to_unsigned(quote_id), 'tweet_id': tweet_id, 'posted_at': posted_at, 'kind': kind, 'text': text}
+            for quote_id, tweet_id, posted_at, kind, text in self._query(sql, params)
+        ]
+
+    def posts_after(self, row_id, limit=1000):
+        rows = self._query(
+            "SELECT id, quote_id, tweet_id, posted_at, kind, text FROM posts "
+            "WHERE id > ? AND tweet_id IS NOT NULL ORDER BY id LIMIT ?",
+            (row_id, limit),
+        )
+        return [
+            {'id': row, 'quote_id': to_unsigned(quote_id), 'tweet_id': tweet_id, 'posted_at': posted_at, 'kind': kind,
+             'text': text}
+            for row, quote_id, tweet_id, posted_at, kind, text in rows
+        ]
+
+    def quote_text(self, quote_id):
+        rows = self._query("SELECT text FROM posts WHERE quote_id = ? AND text IS NOT NULL "
+                           "ORDER BY posted_at DESC LIMIT 1", (to_signed(quote_id),))
+        return rows[0][0] if rows else None
+
+    def get_meta(self, key, default=None):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def set_meta(self, key, value):
+        self._write([("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))])
+
+    def migrate_json(self, path):
+        """Import a legacy used_quotes.json once; returns the number of entries imported"""
+        try:
+            with open(path, 'rb') as file:
+                raw = file.read()
+            used_quotes = json.loads(raw).get('used_quotes', [])
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            return 0
+        except (json.JSONDecodeError, AttributeError, OSError) as e:
+            logger.warning("Not migrating unreadable %s: %s", path, e)
+            return 0
+
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Checked inside the write lock so concurrent first runs import it only once
+                if cursor.execute("SELECT 1 FROM meta WHERE key = 'migrated_used_quotes'").fetchone():
+                    cursor.execute("ROLLBACK")
+                    return 0
+                # The file has no timestamps: keep its order, ending at its mtime
+                cursor.executemany(
+                    "INSERT INTO posts (quote_id, tweet_id, posted_at, kind, text) VALUES (?, NULL, ?, 'quote', ?)",
+                    [
+                        (to_signed(quote_key(quote)), mtime - (len(used_quotes) - position), quote)
+                        for position, quote in enumerate(used_quotes)
+                    ],
+                )
+                cursor.execute(
+                    "INSERT INTO meta (key, value) VALUES ('migrated_used_quotes', ?)",
+                    (json.dumps({'path': path, 'sha256': digest, 'entries': len(used_quotes)}),),
+                )
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+        logger.info("Imported %d posts from %s into %s", len(used_quotes), path, self.path)
+        return len(used_quotes)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+def open_state_store(backend=None, path=None, legacy_path=LEGACY_USED_QUOTES, clock=time.time, read_only=False):
+    """Open the configured backend (``STATE_BACKEND``, default ``sqlite``)
+
+    With ``read_only`` nothing is written: an existing database is opened
+    read-only, and a missing one is stood in for by an in-memory database
+    holding just the legacy history.
+    """
+    backend = backend or os.getenv('STATE_BACKEND', 'sqlite')
+    if backend == 'sqlite':
+        path = path or os.getenv('STATE_DB_PATH', DEFAULT_DB_PATH)
+        if read_only:
+            if os.path.exists(path):
+                return SQLiteStateStore(path, clock=clock, read_only=True)
+            return SQLiteStateStore(':memory:', legacy_path, clock)
+        return SQLiteStateStore(path, legacy_path, clock)
+    raise ValueError(f"Unknown state backend: {backend}")
@@ -0,0 +1,53 @@
+"""Shared fixtures: a fake X API on a simulated clock, and bots that post to it"""
+
+import os
+import sys
+
+import pytest
+
+# Tests run from a checkout, so make the bot modules importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from accounts import Account  # noqa: E402
+from fake_x_api import FakeAsyncClient, FakeClient, FakeXAPI  # noqa: E402
+from simulate import DEFAULT_START, SimulatedClock  # noqa: E402
+from twitter_bot import MotivationalTwitterBot  # noqa: E402
+
+FAKE_CREDENTIALS = {'api_key': '', 'api_secret': '', 'access_token': None, 'access_token_secret': ''}
+
+
+@pytest.fixture
+def clock():
+    return SimulatedClock(DEFAULT_START)
+
+
+@pytest.fixture
+def api(clock):
+    return FakeXAPI(clock=clock)
+
+
+@pytest.fixture
+def account(tmp_path):
+    return Account('test', data_dir=str(tmp_path), quote_sources=[str(tmp_path / 'quotes.txt')],
+                   poll_sources=[str(tmp_path / 'polls.json')])
+
+
+@pytest.fixture
+def make_bot(account, clock):
+    """Build a bot on ``account``'s data directory; each call is a fresh process's view of it"""
+    bots = []
+
+    def make(api, **options):
+        async_client = FakeAsyncClient(api, FAKE_CREDENTIALS)
+        bot = MotivationalTwitterBot(account=account, client=FakeClient(api), async_client=async_client,
+                                     clock=clock, **options)
+        async_client.limiter = bot.rate_limiter
+        bots.append(bot)
+        return bot
+
+    yield make
+    for bot in bots:
+        if bot.state_store is not None:
+            bot.state_store.close()
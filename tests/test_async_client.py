@@ -0,0 +1,81 @@
+"""Keep-alive reuse: a stale idle connection is retried, a response cut short is not"""
+
+import asyncio
+
+from async_x_api import AsyncXClient
+from rate_limit import ResponseInterrupted, is_retryable
+
+CREDENTIALS = {'api_key': 'key', 'api_secret': 'secret', 'access_token': 'token', 'access_token_secret': 'shh'}
+
+
+def respond(body):
+    return (f"HTTP/1.1 201 Created\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+            .encode('latin-1') + body)
+
+
+async def read_request(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = next(int(line.split(b':')[1]) for line in head.split(b'\r\n') if line.lower().startswith(b'content-length'))
+    await reader.readexactly(length)
+
+
+async def run(after_first):
+    """Two POSTs on one client; ``after_first(reader, writer)`` decides what the server does with the second"""
+    received = []
+
+    async def handle(reader, writer):
+        connection = len(received)
+        received.append(0)
+        while True:
+            try:
+                await read_request(reader)
+            except asyncio.IncompleteReadError:
+                break
+            received[connection] += 1
+            if connection == 0 and received[0] == 1:
+                writer.write(respond(b'{"data": {"id": "1"}}'))
+                await writer.drain()
+                if await after_first(reader, writer):
+                    break
+            else:
+                writer.write(respond(b'{"data": {"id": "2"}}'))
+                await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    client = AsyncXClient(CREDENTIALS, base_url=f"http://127.0.0.1:{port}")
+    try:
+        await client.create_tweet("First")
+        try:
+            return await client.create_tweet("Second"), received
+        except Exception as e:
+            return e, received
+    finally:
+        await client.aclose()
+        server.close()
+        await server.wait_closed()
+
+
+def test_idle_connection_closed_by_the_server_is_resent():
+    async def close_idle(reader, writer):
+        return True
+
+    result, received = asyncio.run(run(close_idle))
+    assert result == {'id': '2'}
+    # The first connection only ever saw the first request
+    assert received == [1, 1]
+
+
+def test_response_cut_short_is_not_resent():
+    async def cut_next_response(reader, writer):
+        await read_request(reader)
+        writer.write(b'HTTP/1.1 201 Created\r\nContent-Length: 100\r\n\r\n{"data"')
+        await writer.drain()
+        return True
+
+    result, received = asyncio.run(run(cut_next_response))
+    assert isinstance(result, ResponseInterrupted)
+    assert not is_retryable(result)
+    # No second connection: the server saw "Second" once
+    assert received == [1]
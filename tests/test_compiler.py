@@ -0,0 +1,90 @@
+"""Incremental compiles: only changed sources are rebuilt, and a compiler or hook change rebuilds everything"""
+
+import json
+
+import pytest
+
+import compiler
+from compiler import compile_corpus
+from corpus import QuoteCorpus
+from hooks import classify_batch
+from tweet_text import weighted_length
+
+FIRST = ["Keep going, one step at a time", "Discipline beats motivation on the hard days"]
+SECOND = ["Rest is part of the work", "Your future self is watching"]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    (tmp_path / 'quotes.json').write_text(json.dumps({'quotes': FIRST}), encoding='utf-8')
+    (tmp_path / 'quotes.txt').write_text('\n'.join(SECOND) + '\n', encoding='utf-8')
+    return [str(tmp_path / 'quotes.json'), str(tmp_path / 'quotes.txt')]
+
+
+@pytest.fixture
+def build(sources, tmp_path, monkeypatch):
+    """Compile the sources; ``build.computed`` lists how many quotes each classification pass saw"""
+    computed = []
+    compute_columns = compiler._compute_columns
+
+    def counting(quotes):
+        computed.append(len(quotes))
+        return compute_columns(quotes)
+
+    monkeypatch.setattr(compiler, '_compute_columns', counting)
+
+    def build(force=False):
+        computed.clear()
+        return compile_corpus(sources, str(tmp_path / 'quotes.corpus'), str(tmp_path / 'cache'), force=force,
+                              near_threshold=None)
+
+    build.computed = computed
+    build.output = str(tmp_path / 'quotes.corpus')
+    return build
+
+
+def test_first_compile_builds_every_source(build, sources):
+    result = build()
+    assert (result.rebuilt, result.skipped, result.quotes) == (sources, [], 4)
+    quotes = FIRST + SECOND
+    with QuoteCorpus(build.output) as corpus:
+        assert list(corpus) == quotes
+        assert [corpus.hook_category(index) for index in range(4)] == list(classify_batch(quotes))
+        assert [corpus.weighted_length(index) for index in range(4)] == [weighted_length(quote) for quote in quotes]
+
+
+def test_only_changed_sources_are_rebuilt(build, sources):
+    build()
+    result = build()
+    assert (result.rebuilt, result.skipped) == ([], sources)
+    assert build.computed == []
+
+    with open(sources[1], 'a', encoding='utf-8') as file:
+        file.write("Progress over perfection\n")
+    result = build()
+    assert (result.rebuilt, result.skipped) == ([sources[1]], [sources[0]])
+    # Only the added quote is classified; the rest come from the source's last cache
+    assert build.computed == [1]
+    with QuoteCorpus(build.output) as corpus:
+        assert list(corpus) == FIRST + SECOND + ["Progress over perfection"]
+
+
+def test_force_rebuilds_from_scratch(build, sources):
+    build()
+    result = build(force=True)
+    assert result.rebuilt == sources
+    assert build.computed == [2, 2]
+
+
+@pytest.mark.parametrize('change', ['COMPILER_VERSION', 'hooks_digest'])
+def test_compiler_or_hook_change_rebuilds_everything(build, sources, monkeypatch, change):
+    build()
+    if change == 'COMPILER_VERSION':
+        monkeypatch.setattr(compiler, 'COMPILER_VERSION', compiler.COMPILER_VERSION + 1)
+    else:
+        monkeypatch.setattr(compiler, 'hooks_digest', lambda: 'changed hook tables')
+    result = build()
+    assert (result.rebuilt, result.skipped) == (sources, [])
+    # Nothing may be copied from caches built by the old compiler or hooks
+    assert build.computed == [2, 2]
+    assert build().rebuilt == []
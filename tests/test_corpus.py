@@ -0,0 +1,54 @@
+"""The compiled corpus format: quotes read back by offset, keys, and malformed files"""
+
+import json
+
+import pytest
+
+from corpus import CorpusFormatError, QuoteCorpus, corpus_fingerprint, corpus_keys, import_sources, write_corpus
+
+QUOTES = ["Keep going", "Café au lait, then work ☕", "Small steps 👣 every day", "Dream big. Start small."]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / 'quotes.corpus')
+    write_corpus(path, QUOTES, {'XTRA': b'extra bytes'})
+    with QuoteCorpus(path) as corpus:
+        yield corpus
+
+
+def test_quotes_read_back_by_index(corpus):
+    assert len(corpus) == len(QUOTES)
+    assert list(corpus) == QUOTES
+    assert corpus[2] == QUOTES[2]
+    assert corpus[-1] == QUOTES[-1]
+    with pytest.raises(IndexError):
+        corpus[len(QUOTES)]
+
+
+def test_keys_and_extra_sections(corpus):
+    assert corpus.keys() == corpus_keys(QUOTES)
+    assert corpus_fingerprint(corpus) == corpus_fingerprint(QUOTES)
+    assert corpus.section('XTRA') == b'extra bytes'
+    # Columns the compiler adds are simply absent from a plain corpus
+    assert corpus.hook_category(0) is None
+    assert corpus.poll_options(0) is None
+
+
+def test_malformed_files_are_rejected(tmp_path):
+    path = tmp_path / 'quotes.corpus'
+    path.write_bytes(b'{"quotes": []}')
+    with pytest.raises(CorpusFormatError):
+        QuoteCorpus(str(path))
+
+    write_corpus(str(path), QUOTES)
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(CorpusFormatError):
+        QuoteCorpus(str(path))
+
+
+def test_sources_are_merged_without_exact_duplicates(tmp_path):
+    (tmp_path / 'quotes.json').write_text(json.dumps({'quotes': QUOTES[:3]}), encoding='utf-8')
+    (tmp_path / 'quotes.txt').write_text(f"{QUOTES[1]}\n\n  {QUOTES[3]}  \n", encoding='utf-8')
+    paths = [str(tmp_path / name) for name in ('quotes.json', 'quotes.txt', 'missing.txt')]
+    assert import_sources(paths) == QUOTES
@@ -0,0 +1,49 @@
+"""Dealing skips recent posts, and falls back to the least recently posted draw"""
+
+from corpus import corpus_keys
+from quote_deck import QuoteDeck, quote_key
+from twitter_bot import NO_REPEAT_DAYS
+
+QUOTES = [f"Quote number {number}" for number in range(8)]
+
+
+def deck_of(quotes):
+    deck = QuoteDeck(None, seed=1)
+    deck.sync(corpus_keys(quotes))
+    return deck
+
+
+def test_fresh_draw_is_preferred(api, clock, make_bot):
+    bot = make_bot(api)
+    state = bot.load_state_store()
+    for quote in QUOTES[1:]:
+        state.record_post(quote_key(quote), None, 'quote', quote, posted_at=clock() - 86400)
+    assert bot.deal(QUOTES, deck_of(QUOTES), NO_REPEAT_DAYS) == 0
+
+
+def test_all_recent_falls_back_to_the_oldest_candidate(api, clock, make_bot):
+    bot = make_bot(api)
+    state = bot.load_state_store()
+    # Every quote went out inside the window; number 5 longest ago
+    for number, quote in enumerate(QUOTES):
+        days_ago = 20 if number == 5 else 1 + number / 10
+        state.record_post(quote_key(quote), None, 'quote', quote, posted_at=clock() - days_ago * 86400)
+    assert bot.deal(QUOTES, deck_of(QUOTES), NO_REPEAT_DAYS) == 5
+    assert bot.deal(QUOTES, deck_of(QUOTES), NO_REPEAT_DAYS, strict=True) is None
+
+
+def test_exhausted_strict_deal_waits_for_the_oldest_post(api, clock, make_bot):
+    bot = make_bot(api)
+    state = bot.load_state_store()
+    for number, quote in enumerate(QUOTES):
+        state.record_post(quote_key(quote), None, 'poll', quote, posted_at=clock() - (20 + number) * 86400)
+    deck = deck_of(QUOTES)
+    assert bot.deal(QUOTES, deck, NO_REPEAT_DAYS, strict=True) is None
+
+    # Nothing is drawn again until the oldest post (number 7, 27 days ago) leaves the window
+    cursor = deck.cursor
+    clock.now += 3 * 86400 - 60
+    assert bot.deal(QUOTES, deck, NO_REPEAT_DAYS, strict=True) is None
+    assert deck.cursor == cursor
+    clock.now += 120
+    assert bot.deal(QUOTES, deck, NO_REPEAT_DAYS, strict=True) == 7
@@ -0,0 +1,43 @@
+"""A dry run previews the next post from the account's state without writing any of it"""
+
+import os
+
+from quote_deck import quote_key
+from state_store import SQLiteStateStore
+from twitter_bot import MotivationalTwitterBot
+
+QUOTES = [f"Quote number {number}" for number in range(5)]
+
+
+def snapshot(directory):
+    return {
+        os.path.relpath(os.path.join(root, name), directory): os.path.getmtime(os.path.join(root, name))
+        for root, _, names in os.walk(directory) for name in names
+    }
+
+
+def test_dry_run_writes_nothing(account, clock, tmp_path):
+    (tmp_path / 'quotes.txt').write_text('\n'.join(QUOTES) + '\n', encoding='utf-8')
+    before = snapshot(tmp_path)
+
+    bot = MotivationalTwitterBot(dry_run=True, account=account, clock=clock)
+    assert bot.post_daily_content()
+    bot.flush_state()
+    assert not bot.load_state_store().recent_posts(1)
+    bot.state_store.close()
+    assert snapshot(tmp_path) == before
+
+
+def test_dry_run_reads_the_history_read_only(account, clock, tmp_path):
+    (tmp_path / 'quotes.txt').write_text('\n'.join(QUOTES) + '\n', encoding='utf-8')
+    store = SQLiteStateStore(account.path('state.db'), legacy_path=None, clock=clock)
+    store.record_post(quote_key(QUOTES[0]), '1', 'quote', QUOTES[0])
+    store.close()
+    before = snapshot(tmp_path)
+
+    bot = MotivationalTwitterBot(dry_run=True, account=account, clock=clock)
+    assert bot.post_daily_content()
+    bot.flush_state()
+    assert [post['text'] for post in bot.load_state_store().recent_posts(5)] == [QUOTES[0]]
+    bot.state_store.close()
+    assert snapshot(tmp_path) == before
@@ -0,0 +1,56 @@
+"""The single-pass and batch hook classifiers agree with the substring scans they replaced"""
+
+import os
+import random
+
+import pytest
+
+from corpus import read_source_quotes
+from hooks import CATEGORY_KEYWORDS, CHALLENGE, GENERAL, GROWTH, SUCCESS, classify_batch, classify_hook_category
+
+QUOTES_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'quotes.json')
+
+
+def classify_substring_scan(text):
+    """The original add_engagement_hook logic: one any() scan per category"""
+    quote_lower = text.lower()
+    for category, keywords in enumerate(CATEGORY_KEYWORDS):
+        if any(word in quote_lower for word in keywords):
+            return category
+    return GENERAL
+
+
+CASES = [
+    ("Success is a journey", SUCCESS),
+    ("Keep GROWING", SUCCESS),  # "growing" contains "win"
+    ("Learn from every struggle", GROWTH),
+    ("Overcome it", CHALLENGE),
+    ("Rest well", GENERAL),
+    ("", GENERAL),
+    ("İstanbul taught me to improve", GROWTH),  # lowercases to a longer string
+]
+
+
+@pytest.mark.parametrize('text, category', CASES)
+def test_known_quotes(text, category):
+    assert classify_substring_scan(text) == category
+    assert classify_hook_category(text) == category
+
+
+def test_agrees_on_the_bundled_quotes():
+    quotes = read_source_quotes(QUOTES_JSON)
+    expected = [classify_substring_scan(quote) for quote in quotes]
+    assert [classify_hook_category(quote) for quote in quotes] == expected
+    assert list(classify_batch(quotes)) == expected
+
+
+def test_agrees_on_random_keyword_soup():
+    rng = random.Random(0)
+    pieces = [keyword for keywords in CATEGORY_KEYWORDS for keyword in keywords]
+    pieces += [keyword[:3] for keyword in pieces] + [' ', 'x', 'ING', 'İ']
+    quotes = [''.join(rng.choice(pieces) for _ in range(rng.randrange(6))) for _ in range(5000)]
+    expected = [classify_substring_scan(quote) for quote in quotes]
+    assert [classify_hook_category(quote) for quote in quotes] == expected
+    # Batching must not let a keyword run from the end of one quote into the next
+    assert list(classify_batch(quotes)) == expected
+    assert list(classify_batch(["suc", "cess"])) == [GENERAL, GENERAL]
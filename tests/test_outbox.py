@@ -0,0 +1,79 @@
+"""The outbox journal: replay after a crash, idempotent queuing and drain outcomes"""
+
+import pytest
+
+from outbox import DROP, RETRY, SENT, Outbox
+
+
+@pytest.fixture
+def outbox(tmp_path, clock):
+    return Outbox(str(tmp_path / 'outbox.jsonl'), max_attempts=2, clock=clock)
+
+
+def test_record_after_a_torn_last_line_survives(outbox):
+    first = outbox.enqueue('quote', "First")
+    # A crash mid-append leaves half a record without its newline
+    with open(outbox.path, 'a', encoding='utf-8') as file:
+        file.write('{"op": "sent", "key": "')
+    second = outbox.enqueue('quote', "Second")
+
+    assert [entry['key'] for entry in outbox.pending()] == [first, second]
+    handled = outbox.drain(lambda entry: (SENT, '1'))
+    assert [outcome for _, outcome, _ in handled] == [SENT, SENT]
+    assert outbox.pending() == []
+
+
+def test_torn_last_line_is_ignored_on_replay(outbox):
+    key = outbox.enqueue('quote', "Only")
+    with open(outbox.path, 'a', encoding='utf-8') as file:
+        file.write('{"op": "sent", "key": "' + key)
+    assert [entry['key'] for entry in outbox.pending()] == [key]
+
+
+def test_enqueue_is_idempotent_while_pending(outbox):
+    key = outbox.enqueue('quote', "Keep going", source="Keep going")
+    assert outbox.enqueue('quote', "Keep going, formatted differently", source="Keep going") == key
+    assert len(outbox.pending()) == 1
+    # The same content as another kind is another post
+    assert outbox.enqueue('poll', "Keep going") != key
+
+    outbox.drain(lambda entry: (SENT, '1'))
+    # Once sent, the same content can be queued again
+    assert outbox.enqueue('quote', "Keep going") == key
+    assert len(outbox.pending()) == 1
+
+
+def test_drain_outcomes(outbox):
+    sent, dropped, retried = (outbox.enqueue('quote', text) for text in ("Sent", "Dropped", "Retried"))
+    outcomes = {sent: (SENT, '100'), dropped: (DROP, 'rejected'), retried: (RETRY, 'API down')}
+    published = []
+
+    def publish(entry):
+        published.append(entry['key'])
+        return outcomes[entry['key']]
+
+    handled = outbox.drain(publish)
+    assert [(entry['key'], outcome) for entry, outcome, _ in handled] == [
+        (sent, SENT), (dropped, DROP), (retried, RETRY)]
+    entries = {entry['key']: entry for entry in outbox.entries()}
+    assert entries[sent]['status'] == 'sent' and entries[sent]['tweet_id'] == '100'
+    assert entries[dropped]['status'] == 'dropped' and entries[dropped]['reason'] == 'rejected'
+    assert entries[retried]['status'] == 'pending' and entries[retried]['attempts'] == 1
+
+    # A RETRY stops the drain, so later entries wait for the next run
+    later = outbox.enqueue('quote', "Later")
+    handled = outbox.drain(publish)
+    assert [(entry['key'], outcome) for entry, outcome, _ in handled] == [(retried, RETRY)]
+    assert later not in published[3:]
+
+    # Past max_attempts the entry is given up on instead of published again
+    handled = outbox.drain(lambda entry: (SENT, '200'))
+    assert [(entry['key'], outcome) for entry, outcome, _ in handled] == [(retried, DROP), (later, SENT)]
+    assert outbox.pending() == []
+
+
+def test_progress_is_merged_on_replay(outbox):
+    key = outbox.enqueue('quote', "Part one", thread=["Part one", "Part two"])
+    outbox.progress(key, thread_ids=['1'])
+    outbox.progress(key, thread_ids=['1', '2'])
+    assert outbox.pending()[0]['thread_ids'] == ['1', '2']
@@ -0,0 +1,66 @@
+"""The poll catalog: X's poll limits are enforced at compile time, and rejects are reported"""
+
+import json
+import os
+
+import pytest
+
+from compiler import compile_polls
+from corpus import QuoteCorpus
+from polls import MAX_OPTION_LENGTH, read_source_polls, validate_poll
+
+GOOD = {'question': "Your go-to stress buster? 🧘", 'options': ["Music", "Exercise", "Nature walk", "Deep breathing"]}
+
+
+@pytest.mark.parametrize('poll, problem', [
+    ({'options': ["Yes", "No"]}, "missing question"),
+    ({'question': "  ", 'options': ["Yes", "No"]}, "missing question"),
+    ({'question': "x" * 281, 'options': ["Yes", "No"]}, "question is over 280 characters"),
+    ({'question': "Pick", 'options': "Yes, No"}, "options must be a list of strings"),
+    ({'question': "Pick", 'options': ["Yes", 2]}, "options must be a list of strings"),
+    ({'question': "Pick", 'options': ["Only one"]}, "1 options, need 2 to 4"),
+    ({'question': "Pick", 'options': ["A", "B", "C", "D", "E"]}, "5 options, need 2 to 4"),
+    ({'question': "Pick", 'options': ["Yes", " "]}, "empty option"),
+    ({'question': "Pick", 'options': ["Yes", "No", "Yes "]}, "duplicate options"),
+    ({'question': "Pick", 'options': ["Yes", "Line\nbreak"]}, "option 'Line\\nbreak' contains a control character"),
+])
+def test_invalid_polls_are_explained(poll, problem):
+    assert problem in validate_poll(poll)
+
+
+def test_option_length_is_weighted():
+    assert validate_poll(GOOD) == []
+    # 12 emoji are 24 weighted characters, a 13th tips the option over the limit
+    assert validate_poll({'question': "Pick", 'options': ["💪" * 12, "No"]}) == []
+    assert validate_poll({'question': "Pick", 'options': ["💪" * 13, "No"]}) == [
+        f"option {'💪' * 13!r} is over {MAX_OPTION_LENGTH} characters"
+    ]
+
+
+def test_compile_keeps_valid_polls_and_reports_rejects(tmp_path):
+    source = tmp_path / 'polls.json'
+    polls = [GOOD, {'question': "Too few?", 'options': ["Yes"]}, "not a poll",
+             {'question': " Morning or night? ", 'options': [" Morning ", "Night"]}, dict(GOOD)]
+    source.write_text(json.dumps({'polls': polls}), encoding='utf-8')
+    assert len(read_source_polls(str(source))) == 4
+
+    output, cache = str(tmp_path / 'polls.corpus'), str(tmp_path / 'cache')
+    result = compile_polls([str(source)], output, cache)
+    assert (result.quotes, result.duplicates) == (2, 1)
+    assert [(reject['question'], reject['problems']) for reject in result.rejected] == [
+        ("Too few?", ["1 options, need 2 to 4"])
+    ]
+    with QuoteCorpus(output) as corpus:
+        assert list(corpus) == [GOOD['question'], "Morning or night?"]
+        assert corpus.poll_options(0) == GOOD['options']
+        assert corpus.poll_options(1) == ["Morning", "Night"]
+
+    # An unchanged source is served from the cache, and its rejects are still reported
+    cached = compile_polls([str(source)], output, cache)
+    assert cached.rebuilt == []
+    assert cached.rejected == result.rejected
+
+
+def test_bundled_catalog_is_valid():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'polls.json')
+    assert all(validate_poll(poll) == [] for poll in read_source_polls(path))
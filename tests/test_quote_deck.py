@@ -0,0 +1,66 @@
+"""The shuffled deck: no repeats within an epoch or across its boundary, corpus syncs, and persistence"""
+
+from quote_deck import REPEAT_BUFFER, QuoteDeck, keys_fingerprint
+
+KEYS = list(range(1000, 1040))
+
+
+def deck_of(keys, seed=1, path=None):
+    deck = QuoteDeck(path, seed=seed)
+    deck.sync(keys)
+    return deck
+
+
+def test_an_epoch_deals_every_quote_once():
+    deck = deck_of(KEYS)
+    dealt = [deck.draw() for _ in KEYS]
+    assert sorted(dealt) == list(range(len(KEYS)))
+    assert deck.epoch == 1 and deck.remaining() == 0
+
+
+def test_same_seed_deals_the_same_order():
+    first, second = deck_of(KEYS, seed=7), deck_of(KEYS, seed=7)
+    assert [first.draw() for _ in range(100)] == [second.draw() for _ in range(100)]
+
+
+def test_last_picks_do_not_open_the_next_epoch():
+    for seed in range(50):
+        deck = deck_of(KEYS, seed=seed)
+        ending = [deck.draw() for _ in KEYS][-REPEAT_BUFFER:]
+        opening = [deck.draw() for _ in range(REPEAT_BUFFER)]
+        assert deck.epoch == 2
+        assert not set(ending) & set(opening)
+
+
+def test_sync_keeps_dealt_quotes_dealt():
+    deck = deck_of(KEYS)
+    dealt = {KEYS[deck.draw()] for _ in range(15)}
+
+    # One quote removed, two added, and the rest moved to new positions
+    keys = [1040, 1041] + [key for key in reversed(KEYS) if key != 1020]
+    assert deck.sync(keys)
+    assert not deck.sync(keys)
+    rest = [keys[deck.draw()] for _ in range(deck.remaining())]
+    assert sorted(rest) == sorted(set(keys) - dealt)
+    assert deck.epoch == 1
+
+
+def test_save_and_load_continue_the_same_deal(tmp_path):
+    path = str(tmp_path / 'quote_deck.json')
+    deck = deck_of(KEYS, path=path)
+    for _ in range(25):
+        deck.draw()
+    deck.save()
+
+    loaded = QuoteDeck.load(path)
+    assert (loaded.seed, loaded.epoch, loaded.cursor) == (deck.seed, deck.epoch, deck.cursor)
+    assert loaded.fingerprint == keys_fingerprint(deck.keys)
+    assert [loaded.draw() for _ in range(30)] == [deck.draw() for _ in range(30)]
+
+
+def test_truncated_deck_starts_over(tmp_path):
+    path = str(tmp_path / 'quote_deck.json')
+    deck_of(KEYS, path=path).save()
+    with open(f"{path}.bin", 'r+b') as file:
+        file.truncate(16)
+    assert QuoteDeck.load(path).fingerprint is None
@@ -0,0 +1,100 @@
+"""Retries, backoff and the persisted rate-limit budget, against the fake X API"""
+
+import random
+
+import pytest
+
+from async_x_api import APIError
+from fake_x_api import FakeClient, FakeXAPI
+from rate_limit import RateLimiter, RateLimitExhausted, RetryPolicy, call_with_retries
+
+TWEETS = 'POST /2/tweets'
+
+
+@pytest.fixture
+def limiter(clock, tmp_path):
+    return RateLimiter(str(tmp_path / 'rate_limits.json'), clock=clock)
+
+
+def post(client, limiter, sleeps, text='Keep going', **policy):
+    """Post through the retry engine; sleeping moves the limiter's clock on instead of waiting"""
+    def sleep(seconds):
+        sleeps.append(seconds)
+        limiter.clock.now += seconds
+
+    policy = RetryPolicy(rng=random.Random(0), **policy)
+    return call_with_retries(TWEETS, lambda: client.create_tweet(text=text), limiter, policy, sleep=sleep)
+
+
+def test_transient_errors_are_retried_with_growing_backoff(api, limiter):
+    api.fail_next(503, count=2)
+    sleeps = []
+    response = post(FakeClient(api), limiter, sleeps, base_delay=10)
+    assert response.data['text'] == 'Keep going'
+    assert len(api.tweets) == 1
+    # Full jitter between half and all of base * 2**attempt
+    assert len(sleeps) == 2
+    assert 5 <= sleeps[0] <= 10
+    assert 10 <= sleeps[1] <= 20
+
+
+def test_retries_stop_after_max_attempts(api, limiter):
+    api.fail_next(503, count=3)
+    sleeps = []
+    with pytest.raises(APIError) as raised:
+        post(FakeClient(api), limiter, sleeps, max_attempts=3)
+    assert raised.value.response.status_code == 503
+    assert len(sleeps) == 2
+    assert not api.tweets
+
+
+def test_client_errors_are_not_retried(api, limiter):
+    api.fail_next(400)
+    sleeps = []
+    with pytest.raises(APIError):
+        post(FakeClient(api), limiter, sleeps)
+    assert sleeps == []
+    assert len(api.requests) == 1
+
+
+def test_429_is_retried_no_sooner_than_retry_after(api, limiter):
+    api.fail_next(429, retry_after=120)
+    sleeps = []
+    post(FakeClient(api), limiter, sleeps, base_delay=1)
+    assert len(sleeps) == 1
+    assert sleeps[0] >= 120
+    assert len(api.tweets) == 1
+
+
+def test_429_past_max_wait_fails_fast(api, limiter):
+    api.fail_next(429, retry_after=3600)
+    sleeps = []
+    with pytest.raises(RateLimitExhausted):
+        post(FakeClient(api), limiter, sleeps, max_wait=60)
+    assert sleeps == []
+
+
+def test_exhausted_budget_is_persisted_for_the_next_run(clock, limiter):
+    api = FakeXAPI(limits={TWEETS: 2}, clock=clock)
+    client = FakeClient(api)
+    sleeps = []
+    for number in range(2):
+        post(client, limiter, sleeps, text=f"Quote {number}", max_wait=60)
+    # The third post learns from the 429's headers that the window is spent
+    with pytest.raises(RateLimitExhausted):
+        post(client, limiter, sleeps, text="Quote 2", max_wait=60)
+    limiter.save()
+
+    # A later run waits out the same window without asking the API again
+    requests = len(api.requests)
+    restarted = RateLimiter(limiter.path, clock=clock)
+    assert 0 < restarted.wait_time(TWEETS) <= api.window
+    with pytest.raises(RateLimitExhausted):
+        post(client, restarted, sleeps, text="Quote 2", max_wait=60)
+    assert len(api.requests) == requests
+
+    clock.now += api.window + 1
+    assert restarted.wait_time(TWEETS) == 0
+    post(client, restarted, sleeps, text="Quote 2", max_wait=60)
+    assert [tweet['text'] for tweet in api.tweets] == ["Quote 0", "Quote 1", "Quote 2"]
+    assert sleeps == []
@@ -0,0 +1,31 @@
+"""The mentions cursor lives in the post history, so a restarted bot picks up where it stopped"""
+
+from responder import CURSOR_KEY
+
+
+def test_since_id_cursor_survives_a_restart(api, clock, make_bot):
+    bot = make_bot(api)
+    post = api.handle('POST', '/2/tweets', {'text': "Keep going"})[2]['data']['id']
+    # The first poll only starts the cursor: older mentions are never answered
+    api.mention('fan', "@fakebot loved this one", post)
+    clock.now += 60
+    assert bot.respond_to_mentions().started
+
+    clock.now += 60
+    first = api.mention('fan', "@fakebot this helped today", post)
+    result = bot.respond_to_mentions()
+    assert (result.fetched, result.sent) == (1, 1)
+    assert bot.load_state_store().get_meta(CURSOR_KEY) == {'since_id': first}
+    bot.state_store.close()
+
+    # A new process with the same state.db asks only for what came after the cursor
+    restarted = make_bot(api)
+    result = restarted.respond_to_mentions()
+    assert (result.fetched, result.sent) == (0, 0)
+
+    clock.now += 60
+    second = api.mention('other', "@fakebot good morning")
+    result = restarted.respond_to_mentions()
+    assert (result.fetched, result.sent) == (1, 1)
+    replies = [tweet for tweet in api.tweets if tweet['author_id'] == api.user['id'] and tweet['id'] != post]
+    assert [tweet['in_reply_to_tweet_id'] for tweet in replies] == [first, second]
@@ -0,0 +1,91 @@
+"""The SQLite post history and the one-off import of used_quotes.json"""
+
+import json
+import os
+
+import pytest
+
+from quote_deck import quote_key
+from state_store import SQLiteStateStore, StateStore
+
+DAY = 86400
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'), legacy_path=None, clock=clock)
+    yield store
+    store.close()
+
+
+def test_incomplete_backend_fails_when_created():
+    class Partial(StateStore):
+        def record_post(self, quote_id, tweet_id, kind, text=None, posted_at=None):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_posted_within_and_last_posted(store, clock):
+    key = quote_key("Keep going")
+    assert store.last_posted(key) is None
+    assert not store.posted_within(key, 30)
+    store.record_post(key, '1', 'quote', "Keep going", posted_at=clock() - 40 * DAY)
+    assert not store.posted_within(key, 30)
+    store.record_post(key, '2', 'quote', "Keep going", posted_at=clock() - 10 * DAY)
+    assert store.posted_within(key, 30)
+    assert store.last_posted(key) == clock() - 10 * DAY
+
+
+def test_high_quote_keys_round_trip(store):
+    # Keys use all 64 bits; SQLite integers are signed
+    key = (1 << 64) - 5
+    store.record_post(key, '1', 'quote', "Top bit set")
+    assert store.recent_posts(1)[0]['quote_id'] == key
+    assert store.quote_text(key) == "Top bit set"
+
+
+def test_recent_posts_and_posts_after(store, clock):
+    for number in range(4):
+        kind = 'poll' if number == 2 else 'quote'
+        # The third post's tweet id is unknown (recovered duplicate)
+        tweet_id = None if number == 3 else str(100 + number)
+        store.record_post(quote_key(f"Post {number}"), tweet_id, kind, f"Post {number}", posted_at=clock() + number)
+    assert [post['text'] for post in store.recent_posts(2)] == ["Post 3", "Post 2"]
+    assert [post['text'] for post in store.recent_posts(kind='poll')] == ["Post 2"]
+    after = store.posts_after(0)
+    assert [post['tweet_id'] for post in after] == ['100', '101', '102']
+    assert store.posts_after(after[1]['id'])[0]['tweet_id'] == '102'
+
+
+def test_meta_round_trips_json(store):
+    assert store.get_meta('cursor', 'none') == 'none'
+    store.set_meta('cursor', {'since_id': '42'})
+    assert store.get_meta('cursor') == {'since_id': '42'}
+
+
+def test_migrate_json_imports_once(tmp_path, clock):
+    legacy = tmp_path / 'used_quotes.json'
+    legacy.write_text(json.dumps({'used_quotes': ["First", "Second"]}), encoding='utf-8')
+    mtime = os.path.getmtime(legacy)
+    path = str(tmp_path / 'state.db')
+    with SQLiteStateStore(path, legacy_path=str(legacy), clock=clock) as store:
+        posts = store.recent_posts()
+        assert [post['text'] for post in posts] == ["Second", "First"]
+        assert all(post['tweet_id'] is None and post['kind'] == 'quote' for post in posts)
+        # Oldest first, ending just before the file's mtime
+        assert posts[0]['posted_at'] == mtime - 1
+        assert store.get_meta('migrated_used_quotes')['entries'] == 2
+
+    with SQLiteStateStore(path, legacy_path=str(legacy), clock=clock) as store:
+        assert store.migrate_json(str(legacy)) == 0
+        assert len(store.recent_posts()) == 2
+
+
+def test_unreadable_legacy_file_is_skipped(tmp_path, clock):
+    legacy = tmp_path / 'used_quotes.json'
+    legacy.write_text("{not json", encoding='utf-8')
+    with SQLiteStateStore(str(tmp_path / 'state.db'), legacy_path=str(legacy), clock=clock) as store:
+        assert store.recent_posts() == []
+        assert store.get_meta('migrated_used_quotes') is None
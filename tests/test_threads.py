@@ -0,0 +1,62 @@
+"""Threads: the reply chain over HTTP, and resuming one from the outbox's progress records"""
+
+import asyncio
+
+from async_x_api import AsyncXClient
+from fake_x_api import FakeXAPI, FakeXServer
+from outbox import RETRY, SENT
+from rate_limit import RateLimiter
+
+PARTS = ["Part one of the quote... (1/3)", "Part two of the quote... (2/3)", "Part three of the quote. (3/3)"]
+
+
+def queue_thread(bot):
+    return bot.load_outbox().enqueue('quote', PARTS[0], source=' '.join(PARTS), thread=PARTS)
+
+
+def test_thread_resumes_after_the_last_posted_part(clock, make_bot):
+    api = FakeXAPI(limits={'POST /2/tweets': 2}, clock=clock)
+    bot = make_bot(api, threads=True, max_wait=60)
+    key = queue_thread(bot)
+
+    assert not bot.publish_pending()
+    entry = bot.load_outbox().pending()[0]
+    assert entry['key'] == key
+    first, second = entry['thread_ids']
+    assert [tweet['id'] for tweet in api.tweets] == [first, second]
+    assert api.tweets[1]['in_reply_to_tweet_id'] == first
+
+    # A new run still sees the spent window, and does not touch the API
+    requests = len(api.requests)
+    restarted = make_bot(api, threads=True, max_wait=60)
+    handled = restarted.load_outbox().drain(restarted.publish_entry)
+    assert [outcome for _, outcome, _ in handled] == [RETRY]
+    assert len(api.requests) == requests
+
+    clock.now += api.window + 1
+    assert restarted.publish_pending()
+    assert [tweet['text'] for tweet in api.tweets] == PARTS
+    assert api.tweets[2]['in_reply_to_tweet_id'] == second
+    sent = {entry['key']: entry for entry in restarted.load_outbox().entries()}[key]
+    assert sent['status'] == SENT
+    assert sent['tweet_id'] == first
+    assert restarted.load_state_store().recent_posts(1)[0]['tweet_id'] == first
+
+
+def test_thread_chain_over_http(tmp_path):
+    credentials = {'api_key': 'key', 'api_secret': 'secret', 'access_token': 'token', 'access_token_secret': 'shh'}
+    with FakeXServer() as server:
+        client = AsyncXClient(credentials, RateLimiter(str(tmp_path / 'rate_limits.json')), base_url=server.base_url)
+
+        async def post():
+            try:
+                return await client.post_thread(PARTS)
+            finally:
+                await client.aclose()
+
+        ids = asyncio.run(post())
+    tweets = server.api.tweets
+    assert [tweet['id'] for tweet in tweets] == ids
+    assert [tweet['text'] for tweet in tweets] == PARTS
+    assert [tweet.get('in_reply_to_tweet_id') for tweet in tweets] == [None] + ids[:-1]
+    assert {tweet['author_id'] for tweet in tweets} == {server.api.user_for('token')['id']}
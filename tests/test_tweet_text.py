@@ -0,0 +1,62 @@
+"""Weighted tweet length as X counts it, and trimming/splitting against it"""
+
+import pytest
+
+from tweet_text import MAX_TWEET_LENGTH, URL_LENGTH, hook_fits, split_thread, truncate_to_fit, weighted_length
+
+
+@pytest.mark.parametrize('text, length', [
+    ("Keep going", 10),
+    ("“Curly quotes” and a dash — fine", 32),
+    ("日本語", 6),
+    ("👍", 2),
+    ("👍🏽", 2),
+    ("👨‍👩‍👧‍👦", 2),
+    ("🇺🇸", 2),
+    ("1️⃣", 2),
+    ("❤️", 2),
+    ("©", 1),
+    ("Go 💪🔥!", 8),
+])
+def test_code_point_and_emoji_weights(text, length):
+    assert weighted_length(text) == length
+
+
+def test_text_is_nfc_normalized_first():
+    composed, decomposed = "Caf\u00e9", "Cafe\u0301"
+    assert len(decomposed) == 5
+    assert weighted_length(decomposed) == weighted_length(composed) == 4
+
+
+@pytest.mark.parametrize('text, length', [
+    ("https://example.com/" + "a" * 100, URL_LENGTH),
+    ("Read www.example.org/path today", 5 + URL_LENGTH + 6),
+    ("See example.com.", 4 + URL_LENGTH + 1),
+    ("http://a.co and http://b.co", 2 * URL_LENGTH + 5),
+    ("hello.world is not a link", 25),
+    ("e.g. this", 9),
+])
+def test_urls_count_as_23(text, length):
+    assert weighted_length(text) == length
+
+
+def test_truncate_to_fit_respects_the_weighted_limit():
+    text = "Dream big 🌟 " * 40
+    trimmed = truncate_to_fit(text)
+    assert trimmed.endswith("...")
+    assert weighted_length(trimmed) <= MAX_TWEET_LENGTH
+    assert text.startswith(trimmed[:-3])
+    assert truncate_to_fit("Short") == "Short"
+
+
+def test_split_thread_keeps_every_word():
+    text = " ".join(f"Sentence {number} is about 日本 and 💪 progress." for number in range(20))
+    parts = split_thread(text)
+    assert len(parts) > 1
+    assert all(weighted_length(part) <= MAX_TWEET_LENGTH for part in parts)
+    assert " ".join(parts).split() == text.split()
+
+
+def test_hook_fits_counts_the_separator():
+    assert hook_fits(MAX_TWEET_LENGTH - 12, 10)
+    assert not hook_fits(MAX_TWEET_LENGTH - 11, 10)
@@ -0,0 +1,183 @@
+"""Tweet length accounting, compatible with twitter-text's v3 configuration
+
+X does not count characters with ``len()``. The text is NFC-normalized and
+then weighed per code point: a few Latin/punctuation ranges weigh 1 and
+everything else (CJK, most symbols, ...) weighs 2. On top of that, every
+emoji sequence (ZWJ families, skin tones, flags, keycaps) counts as a single
+2-weight character, and every URL counts as 23 no matter how long it is.
+
+URL detection covers ``http(s)://`` links, ``www.`` hosts and bare domains on
+common generic TLDs; twitter-text's full extractor knows every TLD, which
+quotes never need.
+"""
+
+import re
+import unicodedata
+
+MAX_TWEET_LENGTH = 280
+URL_LENGTH = 23
+HOOK_SEPARATOR = "\n\n"
+
+# Code points outside these ranges weigh 2
+_LIGHT_CLASS = '\u0000-\u10ff\u2000-\u200d\u2010-\u201f\u2032-\u2037'
+_HEAVY = re.compile(f"[^{_LIGHT_CLASS}]")
+
+_VS16 = '\ufe0f'
+_MODIFIER = '\U0001f3fb-\U0001f3ff'
+# Pictographs that are emoji on their own, and text symbols that become emoji with VS16
+_PICTOGRAPH = '\u231a\u231b\u23e9-\u23f3\u23f8-\u23fa\u25fd\u25fe\u2600-\u27bf\u2b05-\u2b07\u2b1b\u2b1c\u2b50\u2b55\U0001f000-\U0001f1e5\U0001f200-\U0001f3fa\U0001f400-\U0001faff'
+_TEXT_SYMBOL = '\u00a9\u00ae\u203c\u2049\u2122\u2139\u2194-\u2199\u21a9\u21aa\u2328\u23cf\u24c2\u25aa\u25ab\u25b6\u25c0\u25fb\u25fc\u2934\u2935\u3030\u303d\u3297\u3299'
+_ELEMENT = (
+    f"(?:[{_PICTOGRAPH}]{_VS16}?[{_MODIFIER}]?"
+    f"|[{_TEXT_SYMBOL}]{_VS16}"
+    f"|[{_MODIFIER}])"
+)
+_EMOJI = re.compile(
+    '|'.join([
+        f"[0-9#*]{_VS16}?\u20e3",                               # keycaps
+        "[\U0001f1e6-\U0001f1ff]{2}",                          # flags
+        "\U0001f3f4[\U000e0020-\U000e007e]+\U000e007f",        # subdivision flags
+        f"{_ELEMENT}(?:\u200d{_ELEMENT})*",                    # ZWJ sequences
+    ])
+)
+
+# Bare domains are linked for generic TLDs (and .co/.tv); other country codes need a path
+_TLDS = 'com|org|net|info|biz|app|dev|xyz|link|co|tv'
+_TRAILING_PUNCTUATION = '.,:;!?\'")]'
+_URL = re.compile(
+    rf"(?:https?://|\bwww\.)[^\s]+"
+    rf"|\b(?<![@#.])[a-z0-9](?:[a-z0-9-]*[a-z0-9])?(?:\.[a-z0-9-]+)*\.(?:{_TLDS})\b(?:/[^\s]*)?",
+    re.IGNORECASE,
+)
+
+
+# Every URL _URL matches contains one of these; a cheap scan rules most texts out
+_URL_HINT = re.compile(rf"://|\bwww\.|\.(?:{_TLDS})\b", re.IGNORECASE)
+
+
+def _url_spans(text):
+    """(start, end) of each URL in ``text``, trailing punctuation excluded"""
+    if '.' not in text or not _URL_HINT.search(text):
+        return []
+    spans = []
+    for match in _URL.finditer(text):
+        url = match.group().rstrip(_TRAILING_PUNCTUATION)
+        if url:
+            spans.append((match.start(), match.start() + len(url)))
+    return spans
+
+
+def _code_point_weight(text):
+    """Weighted length of text that holds no URLs"""
+    if text.isascii():
+        return len(text)
+    stripped, emoji_count = _EMOJI.subn('', text)
+    heavy = len(_HEAVY.findall(stripped))
+    return len(stripped) + heavy + 2 * emoji_count
+
+
+def weighted_length(text):
+    """Length of ``text`` as X counts it against the 280 limit"""
+    if not text.isascii() and not unicodedata.is_normalized('NFC', text):
+        text = unicodedata.normalize('NFC', text)
+    spans = _url_spans(text)
+    if not spans:
+        return _code_point_weight(text)
+
+    total = 0
+    position = 0
+    for start, end in spans:
+        total += _code_point_weight(text[position:start]) + URL_LENGTH
+        position = end
+    return total + _code_point_weight(text[position:])
+
+
+def fits_in_tweet(text):
+    return weighted_length(text) <= MAX_TWEET_LENGTH
+
+
+def truncate_to_fit(text, limit=MAX_TWEET_LENGTH, ellipsis="..."):
+    """Shorten ``text`` so that it plus ``ellipsis`` weighs at most ``limit``
+
+    Cuts at the last word boundary that fits, falling back to a hard cut for
+    a single overlong word.
+    """
+    if weighted_length(text) <= limit:
+        return text
+    budget = limit - weighted_length(ellipsis)
+
+    # Largest prefix that fits; weighted length only grows with the prefix
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if weighted_length(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+
+    cut = text[:low]
+    boundary = cut.rstrip().rfind(' ')
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + ellipsis
+
+
+def hook_fits(quote_length, hook_length):
+    """Whether a quote and hook of the given weighted lengths fit in one tweet
+
+    The separator is two newlines, so nothing can join across it and the
+    weighted length of ``quote + HOOK_SEPARATOR + hook`` is simply the sum.
+    """
+    return quote_length + len(HOOK_SEPARATOR) + hook_length <= MAX_TWEET_LENGTH
+
+
+# A sentence ends at ., ! or ? (plus closing quotes/brackets) followed by whitespace
+_SENTENCE_END = re.compile(r'(?<=[.!?…])["\')”’]*\s+')
+
+
+def _split_words(text, limit):
+    """Pieces of a single overlong sentence, cut at word boundaries"""
+    pieces = []
+    while weighted_length(text) > limit:
+        piece = truncate_to_fit(text, limit, ellipsis='')
+        pieces.append(piece)
+        text = text[len(piece):].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def split_thread(text, limit=MAX_TWEET_LENGTH):
+    """Split ``text`` into tweets of at most ``limit`` weighted characters
+
+    Sentences are packed greedily, so parts break between sentences; only a
+    sentence that is itself too long is cut, between words. Nothing is
+    dropped or shortened, unlike :func:`truncate_to_fit`.
+    """
+    if weighted_length(text) <= limit:
+        return [text]
+
+    sentences = []
+    position = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentences.append(text[position:match.end()].rstrip())
+        position = match.end()
+    sentences.append(text[position:].strip())
+
+    parts = []
+    current = ''
+    for sentence in filter(None, sentences):
+        candidate = f"{current} {sentence}" if current else sentence
+        if weighted_length(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        if weighted_length(sentence) <= limit:
+            current = sentence
+        else:
+            *whole, current = _split_words(sentence, limit)
+            parts.extend(whole)
+    if current:
+        parts.append(current)
+    return parts
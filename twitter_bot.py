@@ -1,491 +1,647 @@
-import tweepy
+import argparse
+import asyncio
+import functools
 import json
 import random
 import os
 import logging
+import tempfile
 import time
 from datetime import datetime
-from dotenv import load_dotenv
+from accounts import DEFAULT_DATA_DIR, POLL_SOURCES, QUOTE_SOURCES, Account, AccountPool, load_accounts
+from cards import CARDS_AHEAD, DEFAULT_TEMPLATE, TEMPLATES, CardCache, render_cards
+from compiler import compile_corpus, compile_polls
+from corpus import CorpusFormatError, QuoteCorpus, corpus_fingerprint, corpus_keys, is_stale
+from engagement import EngagementHarvester, EngagementStore, format_report
+from hooks import classify_hook_category, choose_hook
+from logs import apply_log_level, setup_logging
+from metrics import NULL_METRICS, Metrics
+from near_duplicates import NEAR_DUPLICATE_THRESHOLD
+from outbox import DROP, RETRY, SENT, Outbox
+from polls import POLL_DURATION_MINUTES
+from quote_deck import QuoteDeck, quote_key
+from responder import REPLY_WORKERS, MentionResponder
+from scheduler import BotDaemon
+from simulate import simulate
+from state_store import open_state_store
+from rate_limit import RateLimitExhausted, RateLimiter, ResponseInterrupted, RetryPolicy, call_with_retries, error_status, is_retryable
+from weighted import DEFAULT_EXPLORATION, WeightedSampler
+from tweet_text import HOOK_SEPARATOR, MAX_TWEET_LENGTH, fits_in_tweet, hook_fits, split_thread, truncate_to_fit, weighted_length
+from x_api import CredentialCache, build_client, error_details
 
-# Load environment variables
-load_dotenv()
+TWEETS_ENDPOINT = 'POST /2/tweets'
+# A drawn quote posted more recently than this is skipped (e.g. after the deck state was lost)
+NO_REPEAT_DAYS = 30
+# At least X's duplicate-content window, or a poll dealt again inside it is rejected
+POLL_NO_REPEAT_DAYS = 30
+# Draws tried before reposting the least recent one; right after a reshuffle most draws are recent
+NO_REPEAT_ATTEMPTS = 50
+# Most queued posts published by one run (a backlog drains over several slots)
+OUTBOX_BATCH = 3
+# Why publish_entry drops content X already has; the slot then posts a fresh quote instead
+DUPLICATE_CONTENT = "duplicate content"
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+def load_environment(override=False):
+    """Load variables from .env into the environment"""
+    from dotenv import load_dotenv
+    load_dotenv(override=override)
+
+def sync_deck(deck, corpus):
+    """Sync ``deck`` with ``corpus``, reading the corpus's keys only when its fingerprint changed"""
+    fingerprint = corpus_fingerprint(corpus)
+    if fingerprint != deck.fingerprint:
+        deck.sync(corpus_keys(corpus), fingerprint)
 
 class MotivationalTwitterBot:
-    def __init__(self):
-        """Initialize the Twitter bot with API credentials"""
-        self.api_key = os.getenv('TWITTER_API_KEY')
-        self.api_secret = os.getenv('TWITTER_API_SECRET')
-        self.access_token = os.getenv('TWITTER_ACCESS_TOKEN')
-        self.access_token_secret = os.getenv('TWITTER_ACCESS_TOKEN_SECRET')
-        self.bearer_token = os.getenv('TWITTER_BEARER_TOKEN')
-        
-        # Validate credentials
-        if not all([self.api_key, self.api_secret, self.access_token, self.access_token_secret]):
-            raise ValueError("Missing Twitter API credentials in environment variables")
-        
-        # Initialize Twitter API client
-        self.client = tweepy.Client(
-            bearer_token=self.bearer_token,
-            consumer_key=self.api_key,
-            consumer_secret=self.api_secret,
-            access_token=self.access_token,
-            access_token_secret=self.access_token_secret,
-            wait_on_rate_limit=True
-        )
+    def __init__(self, dry_run=False, account=None, http_adapter=None, max_wait=900, threads=False,
+                 client=None, async_client=None, clock=time.time, metrics=None, weighted=False,
+                 exploration=DEFAULT_EXPLORATION, cards=False, card_template=DEFAULT_TEMPLATE):
+        """Initialize the Twitter bot with API credentials
+        
+        Nothing here touches the network: the API client is built, and the
+        credentials verified, on the first real API call. ``account`` picks
+        the credentials and state directory (the ``TWITTER_*`` environment
+        variables and ``data/`` by default). With ``threads``, quotes too long
+        for one tweet are posted whole as a reply chain instead of truncated.
+        ``client``/``async_client`` replace the API clients built on first use
+        and ``clock`` the time source of every state file (see ``simulate.py``).
+        ``metrics`` (a ``metrics.Metrics``) times every stage of a run.
+        With ``weighted``, quotes and hooks lean toward those with the best
+        harvested engagement, except for an ``exploration`` share of picks.
+        With ``cards``, quote tweets carry an image card (see ``cards.py``)
+        drawn on ``card_template``. The daemon or the ``cards`` command renders
+        them ahead of time; a quote whose card is not rendered yet goes out as text.
+        """
+        self.account = account or Account()
+        credentials = self.account.credentials()
+        self.api_key = credentials['api_key']
+        self.api_secret = credentials['api_secret']
+        self.access_token = credentials['access_token']
+        self.access_token_secret = credentials['access_token_secret']
+        self.bearer_token = credentials['bearer_token']
+        self.dry_run = dry_run
+        self.http_adapter = http_adapter
+        self.max_wait = max_wait
+        self.threads = threads
+        self.clock = clock
+        self.metrics = metrics or NULL_METRICS
+        self.weighted = weighted
+        self.exploration = exploration
+        self.cards = cards
+        self.card_template = card_template
+        
+        # Validate credentials (a dry run or a supplied client never uses them)
+        if not dry_run and client is None and not all([self.api_key, self.api_secret, self.access_token, self.access_token_secret]):
+            raise ValueError(f"Missing Twitter API credentials in environment variables"
+                             f"{f' ({self.account.env_prefix}TWITTER_*)' if self.account.env_prefix else ''}")
+        
+        # Rate limits are tracked across runs in <data dir>/rate_limits.json (a dry run calls no API)
+        self.rate_limiter = RateLimiter(None if dry_run else self.account.path('rate_limits.json'), clock=clock)
+        self.credential_cache = CredentialCache(self.account.path('.cache', 'credentials.json'), clock=clock)
+        self._client = client
+        self._async_client = async_client
+        self._loop = None
+        self.authenticated_user = None
+        self.last_tweet_id = None
+        self.last_error = None
+        self.state_store = None
+        self.outbox = None
         
-        logging.info("Twitter bot initialized successfully")
+        self.quote_corpus = None
+        self.quote_deck = None
+        self.poll_corpus = None
+        self.poll_deck = None
+        self.sampler = None
+        self._sampler_versions = (None, None)
+        # Corpus fingerprint -> when a strict deal from it can next succeed
+        self._exhausted = {}
+        self.card_cache = None
+        self._scratch = None
         
-        # Check API access and permissions
-        self.verify_credentials()
+        logging.info("Twitter bot initialized successfully%s", " (dry run)" if dry_run else "")
+    
+    @property
+    def credentials(self):
+        return {
+            'api_key': self.api_key,
+            'api_secret': self.api_secret,
+            'access_token': self.access_token,
+            'access_token_secret': self.access_token_secret,
+            'bearer_token': self.bearer_token,
+        }
+    
+    @property
+    def client(self):
+        """The tweepy client, built (and tweepy imported) on first use"""
+        if self._client is None:
+            self._client = build_client(self.credentials, self.rate_limiter, adapter=self.http_adapter)
+        return self._client
+    
+    @property
+    def async_client(self):
+        """The asyncio client threads are posted with, built on first use"""
+        if self._async_client is None:
+            from async_x_api import AsyncXClient
+            self._async_client = AsyncXClient(self.credentials, self.rate_limiter)
+        return self._async_client
+    
+    def run_async(self, coroutine):
+        """Run a coroutine on the bot's own event loop, which keeps the async client's connections alive between posts"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coroutine)
     
     def verify_credentials(self):
-        """Verify API credentials and check permissions"""
+        """Verify API credentials and check permissions, using the cached result while it is fresh"""
+        cached = self.credential_cache.get(self.credentials)
+        if cached is not None:
+            self.authenticated_user = cached
+            logging.info("Authenticated as: @%s (cached)", cached['username'])
+            return True
+        
         try:
             # Try to get authenticated user info
             me = self.client.get_me()
             if me.data:
-                logging.info(f"Authenticated as: @{me.data.username}")
-                logging.info(f"User ID: {me.data.id}")
-            else:
-                logging.warning("Could not retrieve user information")
-        except tweepy.Forbidden as e:
-            logging.error(f"Forbidden when verifying credentials: {e}")
-            logging.error(f"This likely means your app lacks necessary permissions (Read+Write)")
-            logging.error(f"Error response: {e.response.text if hasattr(e, 'response') else 'No details'}")
-        except tweepy.Unauthorized as e:
-            logging.error(f"Unauthorized: Invalid credentials - {e}")
+                logging.info("Authenticated as: @%s", me.data.username)
+                logging.info("User ID: %s", me.data.id)
+                self.credential_cache.put(self.credentials, me.data.id, me.data.username)
+                self.authenticated_user = {'id': str(me.data.id), 'username': me.data.username}
+                return True
+            logging.warning("Could not retrieve user information")
         except Exception as e:
-            logging.warning(f"Could not verify credentials: {e}")
+            status = error_status(e)
+            if status == 403:
+                logging.error("Forbidden when verifying credentials: %s", e)
+                logging.error("This likely means your app lacks necessary permissions (Read+Write)")
+                logging.error("Error response: %s", error_details(e))
+            elif status == 401:
+                logging.error("Unauthorized: Invalid credentials - %s", e)
+            else:
+                logging.warning("Could not verify credentials: %s", e)
+        # Remember that we tried, so a failed check doesn't repeat before every post
+        self.authenticated_user = {}
+        return False
+    
+    def scratch_path(self, *parts):
+        """A path in this bot's temporary directory, where a dry run compiles stale corpora"""
+        if self._scratch is None:
+            self._scratch = tempfile.TemporaryDirectory(prefix='twitter-bot-dry-run-')
+        return os.path.join(self._scratch.name, *parts)
     
     def load_quotes(self):
-        """Load quotes from JSON file"""
-        try:
-            with open('data/quotes.json', 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                return data['quotes']
-        except FileNotFoundError:
-            logging.error("Quotes file not found")
-            return []
-        except json.JSONDecodeError:
-            logging.error("Error parsing quotes JSON file")
-            return []
+        """Open the compiled quote corpus, compiling it from the JSON/text sources if needed"""
+        if self.quote_corpus is not None:
+            return self.quote_corpus
+        with self.metrics.span('load_corpus'):
+            try:
+                account = self.account
+                path = account.corpus_path
+                if is_stale(path, account.quote_sources):
+                    if self.dry_run:
+                        path = self.scratch_path('quotes.corpus')
+                        result = compile_corpus(account.quote_sources, path, self.scratch_path('cache'))
+                    else:
+                        result = compile_corpus(account.quote_sources, path, account.compile_cache_dir,
+                                                report_path=account.near_duplicates_report)
+                    if not result.quotes:
+                        logging.error("Quotes file not found or empty")
+                        return []
+                    logging.info("Compiled %d quotes into %s", result.quotes, path)
+                self.quote_corpus = QuoteCorpus(path)
+                return self.quote_corpus
+            except json.JSONDecodeError:
+                logging.error("Error parsing quotes JSON file")
+                return []
+            except (OSError, CorpusFormatError) as e:
+                logging.error("Error loading quote corpus: %s", e)
+                return []
+    
+    def load_polls(self):
+        """Open the compiled poll corpus, compiling it from data/polls.json if needed"""
+        if self.poll_corpus is not None:
+            return self.poll_corpus
+        with self.metrics.span('load_corpus'):
+            try:
+                account = self.account
+                path, cache_dir = account.poll_corpus_path, os.path.join(account.compile_cache_dir, 'polls')
+                if is_stale(path, account.poll_sources):
+                    if self.dry_run:
+                        path, cache_dir = self.scratch_path('polls.corpus'), self.scratch_path('cache', 'polls')
+                    result = compile_polls(account.poll_sources, path, cache_dir)
+                    if not result.quotes:
+                        logging.error("Polls file not found or empty")
+                        return []
+                    logging.info("Compiled %d polls into %s", result.quotes, path)
+                self.poll_corpus = QuoteCorpus(path)
+                return self.poll_corpus
+            except json.JSONDecodeError:
+                logging.error("Error parsing polls JSON file")
+                return []
+            except (OSError, KeyError, CorpusFormatError) as e:
+                logging.error("Error loading poll corpus: %s", e)
+                return []
+    
+    def reload_quotes(self):
+        """Drop the open corpora so the next post recompiles and reopens them"""
+        for corpus in (self.quote_corpus, self.poll_corpus):
+            if isinstance(corpus, QuoteCorpus):
+                corpus.close()
+        self.quote_corpus = None
+        self.poll_corpus = None
+    
+    def flush_state(self):
+        """Persist in-memory state (deck cursor, rate-limit budget) before exiting"""
+        if self.dry_run:
+            return
+        for deck in (self.quote_deck, self.poll_deck):
+            if deck is not None:
+                deck.save()
+        self.rate_limiter.save()
+        if self._async_client is not None:
+            self.run_async(self._async_client.aclose())
+    
+    def load_state_store(self):
+        """Open the post-history store (importing data/used_quotes.json on first use; read-only on a dry run)"""
+        if self.state_store is None:
+            if self.account.data_dir == DEFAULT_DATA_DIR:
+                self.state_store = open_state_store(clock=self.clock, read_only=self.dry_run)
+            else:
+                self.state_store = open_state_store(path=self.account.path('state.db'), legacy_path=None,
+                                                    clock=self.clock, read_only=self.dry_run)
+        return self.state_store
     
     def load_used_quotes(self):
         """Load the list of recently used quotes"""
-        try:
-            with open('data/used_quotes.json', 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                return data.get('used_quotes', [])
-        except FileNotFoundError:
-            return []
-        except json.JSONDecodeError:
-            logging.warning("Error parsing used quotes file, starting fresh")
-            return []
+        return [post['text'] for post in reversed(self.load_state_store().recent_posts(50, kind='quote'))]
     
-    def save_used_quotes(self, used_quotes):
-        """Save the list of recently used quotes"""
+    def load_outbox(self):
+        """Open the journal of posts waiting to be published"""
+        if self.outbox is None:
+            self.outbox = Outbox(self.account.path('outbox.jsonl'), clock=self.clock)
+        return self.outbox
+    
+    def record_post(self, quote, kind, tweet_id):
+        """Add a successful post to the history (``tweet_id`` None when it is not known)"""
+        if self.dry_run:
+            return
         try:
-            # Ensure data directory exists
-            os.makedirs('data', exist_ok=True)
-            
-            data = {'used_quotes': used_quotes}
-            with open('data/used_quotes.json', 'w', encoding='utf-8') as file:
-                json.dump(data, file, indent=2, ensure_ascii=False)
+            with self.metrics.span('record_post'):
+                self.load_state_store().record_post(quote_key(quote), tweet_id, kind, quote)
         except Exception as e:
-            logging.error(f"Error saving used quotes: {e}")
-    
-    def create_motivational_poll(self):
-        """Create engaging motivational polls"""
-        polls = [
-            # Original polls
-            {
-                "question": "What motivates you more? 🔥",
-                "options": ["Fear of failure", "Excitement for success", "Proving doubters wrong", "Personal growth"]
-            },
-            {
-                "question": "Your biggest productivity killer? ⚡",
-                "options": ["Social media", "Perfectionism", "Procrastination", "Overthinking"]
-            },
-            {
-                "question": "Best time for your most important work? 🕐",
-                "options": ["Early morning", "Late night", "Afternoon", "When inspired"]
-            },
-            {
-                "question": "What's your success fuel? 💪",
-                "options": ["Clear goals", "Daily habits", "Strong mindset", "Support system"]
-            },
-            {
-                "question": "How do you handle setbacks? 🚀",
-                "options": ["Learn and adapt", "Push harder", "Take a break", "Seek advice"]
-            },
-            {
-                "question": "Your ideal morning routine includes? 🌅",
-                "options": ["Exercise", "Meditation", "Reading", "Planning day"]
-            },
-            {
-                "question": "What drives your ambition most? 🎯",
-                "options": ["Freedom", "Impact", "Recognition", "Challenge"]
-            },
-            {
-                "question": "Your go-to stress buster? 🧘",
-                "options": ["Music", "Exercise", "Nature walk", "Deep breathing"]
-            },
-            {
-                "question": "Best investment for personal growth? 📈",
-                "options": ["Books/courses", "Networking", "Experiences", "Mentorship"]
-            },
-            {
-                "question": "Your productivity secret weapon? ⚔️",
-                "options": ["Time blocking", "To-do lists", "Deadlines", "Rewards system"]
-            },
-            {
-                "question": "What keeps you going when things get tough? 💎",
-                "options": ["Family/friends", "Future vision", "Past struggles", "Inner strength"]
-            },
-            {
-                "question": "Your definition of success? 🏆",
-                "options": ["Financial freedom", "Happy relationships", "Personal fulfillment", "Making a difference"]
-            },
-            
-            # NEW EXPANDED POLLS
-            {
-                "question": "Which mindset shift changed your life most? 🧠",
-                "options": ["Growth over fixed", "Abundance over scarcity", "Progress not perfection", "Action over intention"]
-            },
-            {
-                "question": "Your biggest fear when starting something new? 😰",
-                "options": ["Fear of failure", "Fear of judgment", "Fear of success", "Fear of unknown"]
-            },
-            {
-                "question": "What stops most people from achieving their dreams? 🚧",
-                "options": ["Lack of belief", "Fear of hard work", "Waiting for permission", "Comparing to others"]
-            },
-            {
-                "question": "Your ideal work environment? 🏢",
-                "options": ["Total silence", "Background music", "Bustling cafe", "Nature sounds"]
-            },
-            {
-                "question": "How do you celebrate small wins? 🎉",
-                "options": ["Share with others", "Treat yourself", "Set bigger goals", "Reflect quietly"]
-            },
-            {
-                "question": "What's your biggest time waster? ⏰",
-                "options": ["Endless scrolling", "Perfectionist editing", "Overthinking decisions", "Unproductive meetings"]
-            },
-            {
-                "question": "Your learning style preference? 📚",
-                "options": ["Reading books", "Watching videos", "Hands-on practice", "Discussion groups"]
-            },
-            {
-                "question": "What makes you feel most accomplished? ✨",
-                "options": ["Helping others", "Solving problems", "Creating something", "Overcoming challenges"]
-            },
-            {
-                "question": "Your approach to goal setting? 🎯",
-                "options": ["Big audacious goals", "Small daily steps", "Monthly milestones", "Go with the flow"]
-            },
-            {
-                "question": "What's your superpower in tough times? 🦸",
-                "options": ["Staying calm", "Finding solutions", "Motivating others", "Adapting quickly"]
-            },
-            {
-                "question": "Your ideal Friday evening? 🌙",
-                "options": ["Planning next week", "Complete relaxation", "Social activities", "Personal hobbies"]
-            },
-            {
-                "question": "What skill do you wish you learned earlier? 🎨",
-                "options": ["Communication", "Financial literacy", "Time management", "Emotional intelligence"]
-            },
-            {
-                "question": "Your biggest confidence booster? 💫",
-                "options": ["Past achievements", "Positive self-talk", "Others' encouragement", "Conquering challenges"]
-            },
-            {
-                "question": "How do you recharge your energy? 🔋",
-                "options": ["Alone time", "Social connection", "Physical activity", "Creative pursuits"]
-            },
-            {
-                "question": "Your relationship with failure? 💪",
-                "options": ["Learning opportunity", "Stepping stone", "Temporary setback", "Fuel for comeback"]
-            },
-            {
-                "question": "What would you tell your 18-year-old self? 👶",
-                "options": ["Take more risks", "Trust yourself more", "Focus on relationships", "Start investing early"]
-            },
-            {
-                "question": "Your money mindset? 💰",
-                "options": ["Save first, spend later", "Invest in experiences", "Build multiple incomes", "Money follows value"]
-            },
-            {
-                "question": "What's your decision-making style? 🤔",
-                "options": ["Quick and intuitive", "Research everything", "Ask trusted advisors", "Pro/con lists"]
-            },
-            {
-                "question": "Your biggest life lesson so far? 📖",
-                "options": ["Patience pays off", "Authenticity matters", "Health is wealth", "Relationships > goals"]
-            },
-            {
-                "question": "How do you handle criticism? 🛡️",
-                "options": ["Learn from it", "Defend your position", "Ignore the haters", "Use it as motivation"]
-            },
-            {
-                "question": "Your ideal team dynamic? 👥",
-                "options": ["Collaborative work", "Clear role division", "Friendly competition", "Supportive mentorship"]
-            },
-            {
-                "question": "What's your creative outlet? 🎨",
-                "options": ["Writing", "Visual arts", "Music/dance", "Problem solving"]
-            },
-            {
-                "question": "Your approach to networking? 🤝",
-                "options": ["Help first, ask later", "Mutual value exchange", "Authentic only", "Strategic building"]
-            },
-            {
-                "question": "What drives your daily habits? 🔄",
-                "options": ["Long-term vision", "Immediate results", "Peer accountability", "Personal discipline"]
-            },
-            {
-                "question": "Your weekend priority? 🏖️",
-                "options": ["Rest and recovery", "Personal projects", "Family/friends time", "Adventure/exploration"]
-            },
-            {
-                "question": "How do you measure progress? 📏",
-                "options": ["Quantifiable metrics", "Feeling of growth", "Others' feedback", "Milestone achievements"]
-            },
-            {
-                "question": "Your biggest strength in leadership? 👑",
-                "options": ["Vision setting", "Team motivation", "Problem solving", "Decision making"]
-            },
-            {
-                "question": "What's your risk tolerance? 🎲",
-                "options": ["Calculated risks only", "Go big or go home", "Small experiments first", "Play it safe"]
-            },
-            {
-                "question": "Your ideal life balance? ⚖️",
-                "options": ["Work-life separation", "Integrated lifestyle", "Seasonal focus shifts", "Present awareness"]
-            },
-            {
-                "question": "How do you stay motivated long-term? 🏃",
-                "options": ["Visualize end goals", "Celebrate small wins", "Find new challenges", "Remember your 'why'"]
-            }
-        ]
-        
-        return random.choice(polls)
+            logging.error("Error recording %s in post history: %s", kind, e)
+    
+    def create_motivational_poll(self, save=True):
+        """Deal the next poll from the compiled poll catalog, or None if there are none
+        
+        Polls rotate through their own shuffled deck, like quotes, so none
+        repeats until every poll has been posted.
+        """
+        polls = self.load_polls()
+        if not polls:
+            return None
+        if self.poll_deck is None:
+            self.poll_deck = QuoteDeck.load(self.account.path('poll_deck.json'))
+        sync_deck(self.poll_deck, polls)
+        index = self.deal(polls, self.poll_deck, POLL_NO_REPEAT_DAYS, save, strict=True)
+        if index is None:
+            logging.info("Every poll dealt was posted in the last %d days, posting a quote instead", POLL_NO_REPEAT_DAYS)
+            return None
+        return {"question": polls[index], "options": polls.poll_options(index)}
 
-    def get_random_quote(self):
-        """Get a random motivational quote without recent repeats"""
+    def load_quote_deck(self, quotes):
+        """Load the shuffled quote deck and sync it with the current corpus"""
+        if self.quote_deck is None:
+            self.quote_deck = QuoteDeck.load(self.account.path('quote_deck.json'))
+        sync_deck(self.quote_deck, quotes)
+        return self.quote_deck
+
+    def select_quote(self, save=True):
+        """Deal the next quote from the deck, returning (corpus index, quote)
+        
+        With ``save=False`` the caller persists the deck (after journaling the post).
+        """
         quotes = self.load_quotes()
         if not quotes:
-            return "Stay motivated and keep pushing forward! 💪 #Motivation #Success"
+            return None, "Stay motivated and keep pushing forward! 💪 #Motivation #Success"
         
-        used_quotes = self.load_used_quotes()
-        
-        # Find quotes that haven't been used recently
-        available_quotes = [quote for quote in quotes if quote not in used_quotes]
-        
-        # If we've used all quotes, reset the used list but keep last 10 to avoid immediate repeats
-        if not available_quotes:
-            logging.info("All quotes used, resetting with buffer to prevent immediate repeats")
-            used_quotes = used_quotes[-10:] if len(used_quotes) >= 10 else []
-            available_quotes = [quote for quote in quotes if quote not in used_quotes]
+        deck = self.load_quote_deck(quotes)
+        index = self.deal(quotes, deck, NO_REPEAT_DAYS, save, self.load_sampler())
+        logging.info("Selected quote (%d left before the deck is reshuffled)", deck.remaining())
+        return index, quotes[index]
+    
+    def deal(self, corpus, deck, days, save=True, sampler=None, strict=False):
+        """Draw from ``deck``, skipping entries posted in the last ``days`` days
         
-        # Select a random quote from available ones
-        selected_quote = random.choice(available_quotes)
+        A weighted ``sampler`` gets the first tries; when it explores, or
+        only comes up with recent posts, the deck deals as usual. If every
+        draw was recent, the one whose last post is oldest is returned, or
+        None if ``strict``.
+        """
+        now = self.clock()
+        if strict and self._exhausted.get(deck.fingerprint, 0) > now:
+            return None
+        state = self.load_state_store()
+        cutoff = now - days * 86400
+        tried = []
         
-        # Add to used quotes and keep only last 50 to manage memory
-        used_quotes.append(selected_quote)
-        used_quotes = used_quotes[-50:]  # Keep only last 50 used quotes
+        def fresh(candidate):
+            # The deck is synced with the corpus, so it already has every entry's key
+            last = state.last_posted(deck.keys[candidate])
+            if last is None or last < cutoff:
+                return True
+            tried.append((last, candidate))
+            return False
         
-        # Save updated used quotes
-        self.save_used_quotes(used_quotes)
+        index = None
+        for _ in range(NO_REPEAT_ATTEMPTS if sampler is not None else 0):
+            candidate = sampler.draw_quote()
+            if candidate is None:
+                break
+            if fresh(candidate):
+                index = candidate
+                break
+        for _ in range(NO_REPEAT_ATTEMPTS if index is None else 0):
+            candidate = deck.draw()
+            if fresh(candidate):
+                index = candidate
+                break
+        if tried:
+            logging.info("Skipped %d draws already posted in the last %d days", len(tried), days)
+        if save and not self.dry_run:
+            deck.save()
+        if index is None and not strict:
+            last, index = min(tried)
+            logging.info("Every draw was posted in the last %d days, reposting the one last posted %.1f days ago",
+                         days, (now - last) / 86400)
+        elif index is None and len({candidate for _, candidate in tried}) >= len(corpus):
+            # The whole corpus is recent, so nothing can be dealt before its oldest post leaves the window
+            self._exhausted[deck.fingerprint] = min(tried)[0] + days * 86400
+        return index
+
+    def load_sampler(self):
+        """The engagement-weighted sampler in weighted mode (None otherwise)
         
-        logging.info(f"Selected quote (not used in last {len(used_quotes)} posts)")
-        return selected_quote
+        It is rebuilt for a new corpus, and its tables refreshed when a
+        harvest has written new metrics.
+        """
+        if not self.weighted or not isinstance(self.quote_corpus, QuoteCorpus):
+            return None
+        try:
+            stat = os.stat(self.account.path('engagement.cols'))
+            metrics_version = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            metrics_version = None
+        corpus_version = self.quote_deck.fingerprint if self.quote_deck is not None else None
+        if self.sampler is None or corpus_version != self._sampler_versions[0]:
+            self.sampler = WeightedSampler(self.quote_corpus.keys(), self.exploration)
+            self._sampler_versions = (corpus_version, None)
+        if metrics_version is not None and metrics_version != self._sampler_versions[1]:
+            self.sampler.update(self.load_engagement())
+            self._sampler_versions = (corpus_version, metrics_version)
+        return self.sampler
     
-    def add_engagement_hook(self, quote):
+    def choose_hook(self, category, mask=None):
+        """A hook for ``category`` (optionally limited to ``mask``), weighted by engagement in weighted mode"""
+        sampler = self.load_sampler()
+        if sampler is not None:
+            return sampler.choose_hook(category, mask)
+        return choose_hook(category, mask=mask)
+    
+    def get_random_quote(self):
+        """Get a random motivational quote without repeats until the deck is exhausted"""
+        return self.select_quote()[1]
+
+    def quote_category(self, index):
+        """Precompiled hook category for a corpus index, if available"""
+        if index is None or not isinstance(self.quote_corpus, QuoteCorpus):
+            return None
+        return self.quote_corpus.hook_category(index)
+    
+    def add_engagement_hook(self, quote, category=None):
         """Add engaging questions and call-to-actions to boost interaction"""
+        hook = self.choose_engagement_hook(quote, category)
+        if hook is None:
+            return quote
+        return quote + HOOK_SEPARATOR + hook
+    
+    def choose_engagement_hook(self, quote, category=None):
+        """Pick a context-aware hook for the quote, or None to post it bare"""
+        if category is None:
+            category = classify_hook_category(quote)
+        return self.choose_hook(category)
+    
+    def format_tweet(self, quote, category=None):
+        """Format the quote for Twitter with proper length"""
+        # Pick the engagement hook once so a retry never swaps it for another
+        hook = self.choose_engagement_hook(quote, category)
+        quote_length = weighted_length(quote)
+        if hook is not None and hook_fits(quote_length, weighted_length(hook)):
+            return quote + HOOK_SEPARATOR + hook
         
-        # Context-aware hooks based on quote content
-        quote_lower = quote.lower()
-        
-        # Success-related hooks
-        if any(word in quote_lower for word in ['success', 'achieve', 'accomplish', 'win', 'victory']):
-            success_hooks = [
-                "🏆 What does success mean to you?",
-                "🎯 What's your biggest goal right now?",
-                "� Share your success story below!",
-                "� What's your next milestone?",
-                "✨ Tag someone crushing their goals!"
-            ]
-            return quote + "\n\n" + random.choice(success_hooks)
-        
-        # Growth/learning related hooks
-        elif any(word in quote_lower for word in ['grow', 'learn', 'improve', 'better', 'change']):
-            growth_hooks = [
-                "🌱 What are you learning today?",
-                "� How are you growing this week?",
-                "🔄 What positive change are you making?",
-                "� Share your biggest lesson learned!",
-                "🎓 What skill are you developing?"
-            ]
-            return quote + "\n\n" + random.choice(growth_hooks)
-        
-        # Motivation/inspiration related hooks
-        elif any(word in quote_lower for word in ['motivation', 'inspire', 'dream', 'goal', 'push']):
-            motivation_hooks = [
-                "🔥 What keeps you motivated?",
-                "⚡ What's driving you today?",
-                "💭 Share what inspires you most!",
-                "🎪 What dream are you chasing?",
-                "💪 Who's your biggest inspiration?"
-            ]
-            return quote + "\n\n" + random.choice(motivation_hooks)
-        
-        # Failure/challenge related hooks
-        elif any(word in quote_lower for word in ['fail', 'challenge', 'difficult', 'struggle', 'overcome']):
-            challenge_hooks = [
-                "💪 What challenge are you overcoming?",
-                "� How do you bounce back from setbacks?",
-                "🌟 Share how you turned failure into fuel!",
-                "🛡️ What's your comeback story?",
-                "⚡ How do you stay strong in tough times?"
-            ]
-            return quote + "\n\n" + random.choice(challenge_hooks)
-        
-        # General engagement hooks for all other quotes
-        else:
-            general_hooks = [
-                "💭 What do you think?",
-                "👇 Share your thoughts below!",
-                "🔄 RT if you agree!",
-                "💪 Who needs to see this today?",
-                "✨ Tag someone who inspires you!",
-                "🎯 What's your take on this?",
-                "💡 How does this resonate with you?",
-                "🌟 What's your perspective?",
-                "👑 Share this with your squad!",
-                "� Let's discuss in the comments!",
-                "🚀 Ready to take action?",
-                "🔋 How do you apply this to your life?",
-                "🎨 What's your story?",
-                "📢 Drop a 💪 if you're ready!",
-                "🌈 What motivates you most?"
-            ]
-            
-            # 70% chance to add engagement hook
-            if random.random() < 0.7:
-                return quote + "\n\n" + random.choice(general_hooks)
-        
+        # Ensure tweet is within Twitter's weighted character limit (280)
+        if quote_length > MAX_TWEET_LENGTH:
+            return truncate_to_fit(quote)
         return quote
     
-    def format_tweet(self, quote):
-        """Format the quote for Twitter with proper length"""
-        # Add engagement hook first
-        quote_with_engagement = self.add_engagement_hook(quote)
-        
-        # Ensure tweet is within Twitter's character limit (280 characters)
-        if len(quote_with_engagement) > 280:
-            # If too long, trim the quote
-            base_quote = quote
-            if len(base_quote) > 277:
-                base_quote = base_quote[:277] + "..."
-            
-            # Try to fit engagement hook if possible
-            engagement_quote = self.add_engagement_hook(base_quote)
-            if len(engagement_quote) <= 280:
-                formatted_quote = engagement_quote
-            else:
-                formatted_quote = base_quote
-        else:
-            formatted_quote = quote_with_engagement
+    def render_quote(self, index, quote):
+        """Build the tweet for a corpus quote from the compiled render cache"""
+        corpus = self.quote_corpus
+        if index is None or not isinstance(corpus, QuoteCorpus) or corpus.hook_mask(index) is None:
+            return self.format_tweet(quote, self.quote_category(index))
         
-        return formatted_quote
+        trimmed = corpus.trimmed(index)
+        if trimmed is not None:
+            return trimmed
+        hook = self.choose_hook(corpus.hook_category(index), corpus.hook_mask(index))
+        if hook is None:
+            return quote
+        return quote + HOOK_SEPARATOR + hook
+    
+    def render_thread(self, index, quote):
+        """Split a quote too long for one tweet into a thread, or None if it fits
+        
+        The engagement hook goes on the last part when there is room for it.
+        """
+        if weighted_length(quote) <= MAX_TWEET_LENGTH:
+            return None
+        parts = split_thread(quote)
+        hook = self.choose_engagement_hook(quote, self.quote_category(index))
+        if hook is not None and hook_fits(weighted_length(parts[-1]), weighted_length(hook)):
+            parts[-1] += HOOK_SEPARATOR + hook
+        return parts
+    
+    def create_tweet(self, description, max_retries=3, **kwargs):
+        """Call create_tweet through the shared rate limiter and retry engine"""
+        policy = RetryPolicy(max_attempts=max_retries, max_wait=self.max_wait)
+        if self.authenticated_user is None:
+            with self.metrics.span('verify_credentials'):
+                self.verify_credentials()
+        try:
+            response = call_with_retries(
+                TWEETS_ENDPOINT,
+                lambda: self.client.create_tweet(**kwargs),
+                self.rate_limiter,
+                policy,
+                description=f"Posting {description}",
+                metrics=self.metrics
+            )
+            return response
+        except Exception as e:
+            self.report_post_error(description, e)
+        finally:
+            self.rate_limiter.save()
+        return None
     
-    def post_tweet(self, message, max_retries=3):
+    def report_post_error(self, description, error):
+        """Log why posting failed and keep the error for the outbox to judge"""
+        self.last_error = error
+        self.metrics.increment('post_failures', error=type(error).__name__)
+        if isinstance(error, RateLimitExhausted):
+            logging.error("Rate limit exceeded for %s, not retrying: %s", description, error)
+            return
+        status = error_status(error)
+        if status == 403:
+            logging.error("Forbidden error posting %s: %s", description, error)
+            logging.error("Error details: %s", error_details(error))
+        elif status == 401:
+            self.credential_cache.invalidate(self.credentials)
+            logging.error("Unauthorized error for %s: %s", description, error)
+            logging.error("Error details: %s", error_details(error))
+        else:
+            logging.error("Error posting %s: %s", description, error)
+    
+    def post_tweet(self, message, max_retries=3, media_ids=None):
         """Post a tweet to Twitter with retry logic"""
-        for attempt in range(max_retries):
-            try:
-                response = self.client.create_tweet(text=message)
-                logging.info(f"Tweet posted successfully: {message[:50]}...")
-                return True
-            except tweepy.TooManyRequests as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 60  # Exponential backoff: 1min, 2min, 3min
-                    logging.warning(f"Rate limit exceeded, retrying in {wait_time} seconds... ({attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logging.error(f"Rate limit exceeded after {max_retries} attempts: {e}")
-                    return False
-            except tweepy.Forbidden as e:
-                logging.error(f"Forbidden error: {e}")
-                logging.error(f"Error details: {e.response.text if hasattr(e, 'response') else 'No response details'}")
-                logging.error(f"Status code: {e.response.status_code if hasattr(e, 'response') else 'Unknown'}")
-                return False
-            except tweepy.Unauthorized as e:
-                logging.error(f"Unauthorized error: {e}")
-                logging.error(f"Error details: {e.response.text if hasattr(e, 'response') else 'No response details'}")
-                return False
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 30  # 30s, 1min, 1.5min
-                    logging.warning(f"Error posting tweet, retrying in {wait_time} seconds... ({attempt + 1}/{max_retries}): {e}")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logging.error(f"Error posting tweet after {max_retries} attempts: {e}")
-                    return False
-        return False
+        # X would reject it on every attempt, so don't spend retries on it
+        if not fits_in_tweet(message):
+            logging.error("Tweet is %d weighted characters, over the %d limit", weighted_length(message), MAX_TWEET_LENGTH)
+            return False
+        
+        if self.dry_run:
+            logging.info("Dry run, not posting tweet: %.50s...", message)
+            return True
+        if media_ids:
+            response = self.create_tweet("tweet", max_retries, text=message, media_ids=media_ids)
+        else:
+            response = self.create_tweet("tweet", max_retries, text=message)
+        if response is None:
+            return False
+        self.last_tweet_id = response.data['id']
+        logging.info("Tweet posted successfully: %.50s...", message)
+        return True
+
+    def load_card_cache(self):
+        if self.card_cache is None:
+            self.card_cache = CardCache(self.account.card_cache_dir)
+        return self.card_cache
+
+    def upload_card(self, quote, template, max_retries=3):
+        """Upload the pre-rendered card of ``quote``; returns ``[media id]``, or None to post without it
+        
+        A card that was never rendered is not drawn here, so the post never
+        waits on rendering; the quote goes out as text.
+        """
+        file = self.load_card_cache().open(quote, template)
+        if file is None:
+            logging.warning("No card rendered for this quote yet, posting it as text")
+            self.metrics.increment('card_misses')
+            return None
+        with file:
+            data = file.read()
+        
+        policy = RetryPolicy(max_attempts=max_retries, max_wait=self.max_wait)
+        if self.authenticated_user is None:
+            with self.metrics.span('verify_credentials'):
+                self.verify_credentials()
+        try:
+            with self.metrics.span('media_upload'):
+                media_id = self.run_async(self.async_client.upload_media(data, policy=policy, metrics=self.metrics))
+        except Exception as e:
+            logging.warning("Card upload failed, posting the quote as text: %s", e)
+            self.metrics.increment('card_upload_failures', error=type(e).__name__)
+            return None
+        finally:
+            self.rate_limiter.save()
+        return [media_id]
+
+    def prerender_cards(self, ahead=CARDS_AHEAD, workers=None):
+        """Render the cards of the next ``ahead`` quotes in the deck (every quote if None)
+        
+        Never called while posting: the daemon runs it after each slot and the
+        ``cards`` command (a separate workflow step) otherwise. ``workers``
+        defaults to one process per CPU.
+        """
+        quotes = self.load_quotes()
+        if not quotes:
+            return None
+        if ahead is None:
+            upcoming = list(quotes)
+        else:
+            upcoming = [quotes[index] for index in self.load_quote_deck(quotes).upcoming(ahead)]
+        try:
+            with self.metrics.span('render_cards'):
+                return render_cards(upcoming, self.load_card_cache(), self.card_template, workers)
+        except ImportError as e:
+            logging.warning("Cannot render image cards: %s", e)
+            return None
+
+    def post_thread(self, parts, max_retries=3, posted=(), on_progress=None):
+        """Post ``parts`` as a reply chain through the async client
+        
+        ``posted`` holds the ids of parts an earlier attempt already got out;
+        the rest continue the chain from the last of them.
+        ``on_progress(ids)`` is called with the ids posted so far after each part.
+        """
+        too_long = [part for part in parts if not fits_in_tweet(part)]
+        if too_long:
+            logging.error("Thread part is %d weighted characters, over the %d limit", weighted_length(too_long[0]), MAX_TWEET_LENGTH)
+            return False
+        
+        if self.dry_run:
+            logging.info("Dry run, not posting %d-part thread: %.50s...", len(parts), parts[0])
+            return True
+        posted = list(posted)
+        
+        def record(tweet_id):
+            posted.append(tweet_id)
+            if on_progress is not None:
+                on_progress(list(posted))
+        
+        policy = RetryPolicy(max_attempts=max_retries, max_wait=self.max_wait)
+        if self.authenticated_user is None:
+            with self.metrics.span('verify_credentials'):
+                self.verify_credentials()
+        try:
+            self.run_async(self.async_client.post_thread(
+                parts[len(posted):], posted[-1] if posted else None, policy, record, self.metrics))
+        except Exception as e:
+            self.report_post_error("thread", e)
+            return False
+        finally:
+            self.rate_limiter.save()
+        self.last_tweet_id = posted[0]
+        logging.info("Thread of %d posted successfully: %.50s...", len(parts), parts[0])
+        return True
 
     def post_poll(self, poll_data, max_retries=3):
         """Post a poll to Twitter with retry logic"""
-        for attempt in range(max_retries):
-            try:
-                # Twitter API v2 poll creation
-                response = self.client.create_tweet(
-                    text=poll_data["question"],
-                    poll_options=poll_data["options"],
-                    poll_duration_minutes=1440  # 24 hours
-                )
-                logging.info(f"Poll posted successfully: {poll_data['question'][:50]}...")
-                return True
-            except tweepy.TooManyRequests as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 60  # Exponential backoff: 1min, 2min, 3min
-                    logging.warning(f"Rate limit exceeded for poll, retrying in {wait_time} seconds... ({attempt + 1}/{max_retries})")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logging.error(f"Rate limit exceeded for poll after {max_retries} attempts: {e}")
-                    return False
-            except tweepy.Forbidden as e:
-                logging.error(f"Forbidden error posting poll: {e}")
-                logging.error(f"Error details: {e.response.text if hasattr(e, 'response') else 'No response details'}")
-                return False
-            except tweepy.Unauthorized as e:
-                logging.error(f"Unauthorized error for poll: {e}")
-                logging.error(f"Error details: {e.response.text if hasattr(e, 'response') else 'No response details'}")
-                return False
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 30  # 30s, 1min, 1.5min
-                    logging.warning(f"Error posting poll, retrying in {wait_time} seconds... ({attempt + 1}/{max_retries}): {e}")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logging.error(f"Error posting poll after {max_retries} attempts: {e}")
-                    return False
-        return False
+        if self.dry_run:
+            logging.info("Dry run, not posting poll: %.50s...", poll_data['question'])
+            return True
+        # Twitter API v2 poll creation
+        response = self.create_tweet(
+            "poll",
+            max_retries,
+            text=poll_data["question"],
+            poll_options=poll_data["options"],
+            poll_duration_minutes=POLL_DURATION_MINUTES  # 24 hours
+        )
+        if response is None:
+            return False
+        self.last_tweet_id = response.data['id']
+        logging.info("Poll posted successfully: %.50s...", poll_data['question'])
+        return True
 
     def should_post_poll(self):
         """Decide whether to post a poll or regular quote (20% chance for poll)"""
@@ -496,10 +652,14 @@ class MotivationalTwitterBot:
         logging.info("Force posting a motivational poll")
         
         poll_data = self.create_motivational_poll()
+        if poll_data is None:
+            print("❌ No valid polls to post")
+            return False
         
         success = self.post_poll(poll_data)
         
         if success:
+            self.record_post(poll_data["question"], 'poll', self.last_tweet_id)
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             print(f"📊 POLL Posted at {timestamp}:")
             print(f"Question: {poll_data['question']}")
@@ -509,65 +669,428 @@ class MotivationalTwitterBot:
             
         return success
     
-    def post_daily_content(self):
-        """Main function to post daily motivational content (quotes or polls)"""
-        logging.info("Starting daily content posting process")
-        
-        # Decide between posting a quote or a poll
-        if self.should_post_poll():
-            # Post a motivational poll
-            poll_data = self.create_motivational_poll()
-            
-            success = self.post_poll(poll_data)
-            
-            if success:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                logging.info(f"Poll posted at {timestamp}: {poll_data['question'][:100]}...")
-                print(f"📊 Poll Posted at {timestamp}: {poll_data['question']}")
-                print(f"Options: {', '.join(poll_data['options'])}")
-            else:
-                logging.error("Failed to post poll")
-                print("❌ Failed to post poll")
-                
+    def generate_content(self, allow_poll=True):
+        """Pick today's content: a poll (20% of the time) or a formatted quote"""
+        with self.metrics.span('select'):
+            poll_data = self.create_motivational_poll(save=False) if allow_poll and self.should_post_poll() else None
+            if poll_data is None:
+                index, quote = self.select_quote(save=False)
+        if poll_data is not None:
+            return {'kind': 'poll', 'text': poll_data['question'], 'source': poll_data['question'],
+                    'options': poll_data['options']}
+        with self.metrics.span('format'):
+            thread = self.render_thread(index, quote) if self.threads else None
+            if thread is not None:
+                return {'kind': 'quote', 'text': thread[0], 'source': quote, 'thread': thread}
+            content = {'kind': 'quote', 'text': self.render_quote(index, quote), 'source': quote}
+            if self.cards:
+                content['card'] = self.card_template
+            return content
+    
+    def queue_daily_content(self, allow_poll=True):
+        """Generate content and journal it in the outbox, returning its key"""
+        content = self.generate_content(allow_poll)
+        with self.metrics.span('enqueue'):
+            key = self.load_outbox().enqueue(**content)
+            # Only advance the deck once the post is safely journaled
+            deck = self.poll_deck if content['kind'] == 'poll' else self.quote_deck
+            if deck is not None:
+                deck.save()
+        logging.info("Queued %s %s", content['kind'], key)
+        return key
+    
+    def publish_entry(self, entry):
+        """Post one outbox entry; returns the outcome the outbox should record"""
+        self.last_error = None
+        self.last_tweet_id = None
+        if entry['kind'] == 'poll':
+            success = self.post_poll({'question': entry['text'], 'options': entry['options']})
+        elif entry.get('thread'):
+            success = self.post_thread(
+                entry['thread'],
+                posted=entry.get('thread_ids', ()),
+                on_progress=lambda ids: self.load_outbox().progress(entry['key'], thread_ids=ids)
+            )
+        elif entry.get('card'):
+            success = self.post_tweet(entry['text'], media_ids=self.upload_card(entry['source'], entry['card']))
         else:
-            # Post a regular motivational quote
-            quote = self.get_random_quote()
-            formatted_tweet = self.format_tweet(quote)
-            success = self.post_tweet(formatted_tweet)
-            
-            if success:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                has_engagement = "\n\n" in formatted_tweet
+            success = self.post_tweet(entry['text'])
+        if success:
+            self.record_post(entry['source'], entry['kind'], self.last_tweet_id)
+            return SENT, self.last_tweet_id
+        
+        error = self.last_error
+        if error is None:
+            return DROP, "rejected before posting"
+        if isinstance(error, RateLimitExhausted):
+            return RETRY, str(error)
+        status = error_status(error)
+        if status == 403 and 'duplicate' in f"{error} {error_details(error)}".lower():
+            if entry['attempts'] > 0:
+                # An earlier run got it out but crashed before journaling the tweet id
+                logging.info("%s %s was already posted by an earlier attempt", entry['kind'].capitalize(), entry['key'])
+                # Its tweet id is unknown; a NULL keeps engagement and replies off the wrong tweet
+                self.record_post(entry['source'], entry['kind'], None)
+                return SENT, None
+            return DROP, DUPLICATE_CONTENT
+        if status == 401 or is_retryable(error) or isinstance(error, ResponseInterrupted):
+            # An interrupted post may have gone out; if so the next attempt gets a duplicate 403 (see above)
+            return RETRY, str(error)
+        return DROP, str(error)
+    
+    def publish_pending(self, limit=OUTBOX_BATCH, replace_duplicates=True):
+        """Drain up to ``limit`` queued posts; True if every one attempted went out
+        
+        A post X rejects as a duplicate is replaced by a fresh quote, so its
+        slot still posts something (once; a replacement is not replaced).
+        """
+        with self.metrics.span('publish'):
+            handled = self.load_outbox().drain(self.publish_entry, limit)
+        for entry, outcome, detail in handled:
+            self.metrics.increment('posts', kind=entry['kind'], outcome=outcome)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if outcome == SENT and entry['kind'] == 'poll':
+                logging.info("Poll posted at %s: %.100s...", timestamp, entry['text'])
+                print(f"📊 Poll Posted at {timestamp}: {entry['text']}")
+                print(f"Options: {', '.join(entry['options'])}")
+            elif outcome == SENT and entry.get('thread'):
+                logging.info("Thread of %d posted at %s: %.100s...", len(entry['thread']), timestamp, entry['source'])
+                print(f"🧵 Thread Posted at {timestamp}:")
+                for part in entry['thread']:
+                    print(part)
+            elif outcome == SENT:
+                has_engagement = "\n\n" in entry['text']
                 engagement_status = "with engagement hook" if has_engagement else "without engagement hook"
-                logging.info(f"Quote posted at {timestamp} {engagement_status}: {quote[:100]}...")
-                print(f"✅ Quote Posted at {timestamp}: {formatted_tweet}")
+                logging.info("Quote posted at %s %s: %.100s...", timestamp, engagement_status, entry['source'])
+                print(f"✅ Quote Posted at {timestamp}: {entry['text']}")
+            elif outcome == RETRY:
+                logging.error("Failed to post %s, will retry next run: %s", entry['kind'], detail)
+                print(f"❌ Failed to post {entry['kind']} (queued for retry)")
+            elif detail == DUPLICATE_CONTENT and replace_duplicates:
+                logging.warning("X already has %s %s, posting a fresh quote in its place", entry['kind'], entry['key'])
+                print(f"🔁 {entry['kind'].capitalize()} was a duplicate, replacing it with a fresh quote")
             else:
-                logging.error("Failed to post daily quote")
-                print("❌ Failed to post quote")
+                logging.error("Dropped %s %s: %s", entry['kind'], entry['key'], detail)
+                print(f"❌ Failed to post {entry['kind']}")
         
+        duplicates = [entry for entry, outcome, detail in handled if detail == DUPLICATE_CONTENT]
+        if not duplicates or not replace_duplicates or any(outcome == RETRY for _, outcome, _ in handled):
+            return bool(handled) and all(outcome == SENT for _, outcome, _ in handled)
+        for _ in duplicates:
+            self.queue_daily_content(allow_poll=False)
+        replaced = self.publish_pending(len(duplicates), replace_duplicates=False)
+        return replaced and all(outcome == SENT or detail == DUPLICATE_CONTENT for _, outcome, detail in handled)
+    
+    def post_daily_content(self):
+        """Main function to post daily motivational content (quotes or polls)
+        
+        New content is only generated when nothing is waiting in the outbox,
+        so a backlog left by failed runs goes out first.
+        """
+        success = False
+        try:
+            with self.metrics.span('run'):
+                success = self._post_daily_content()
+        finally:
+            self.metrics.increment('runs', outcome='success' if success else 'failure')
         return success
+    
+    def _post_daily_content(self):
+        logging.info("Starting daily content posting process for account %s", self.account.name)
+        
+        if self.dry_run:
+            content = self.generate_content()
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if content.get('thread'):
+                print(f"🧵 Thread Would be posted (dry run) at {timestamp}:")
+                print('\n---\n'.join(content['thread']))
+                return True
+            label = "📊 Poll" if content['kind'] == 'poll' else "✅ Quote"
+            print(f"{label} Would be posted (dry run) at {timestamp}: {content['text']}")
+            if content['kind'] == 'poll':
+                print(f"Options: {', '.join(content['options'])}")
+            if content.get('card'):
+                card = self.load_card_cache().path(content['source'], content['card'])
+                print(f"Card: {card}" + ("" if os.path.exists(card) else " (not rendered yet)"))
+            return True
+        
+        outbox = self.load_outbox()
+        pending = len(outbox.pending())
+        if pending:
+            logging.info("%d queued posts from earlier runs, publishing those first", pending)
+        else:
+            self.queue_daily_content()
+        return self.publish_pending()
 
     def post_daily_quote(self):
         """Legacy method for backwards compatibility - now calls post_daily_content"""
         return self.post_daily_content()
+    
+    def load_engagement(self):
+        """Open the columnar store of harvested engagement metrics"""
+        return EngagementStore.load(self.account.path('engagement.cols'))
+    
+    def harvest_engagement(self, max_batches=None):
+        """Fetch the public metrics of posted tweets that are new or still changing"""
+        harvester = EngagementHarvester(
+            self.client,
+            self.load_state_store(),
+            self.load_engagement(),
+            self.rate_limiter,
+            RetryPolicy(max_wait=self.max_wait),
+            clock=self.clock,
+            metrics=self.metrics
+        )
+        return harvester.harvest(max_batches)
+    
+    def respond_to_mentions(self, max_pages=None, workers=REPLY_WORKERS):
+        """Reply to the mentions that arrived since the last poll (see ``responder.py``)"""
+        if self.authenticated_user is None:
+            self.verify_credentials()
+        user_id = (self.authenticated_user or {}).get('id')
+        if not user_id:
+            raise ValueError("Could not look up the account's user id to read its mentions")
+        responder = MentionResponder(
+            self.client,
+            self.load_state_store(),
+            Outbox(self.account.path('replies.jsonl'), clock=self.clock),
+            self.rate_limiter,
+            user_id,
+            RetryPolicy(max_wait=self.max_wait),
+            clock=self.clock,
+            metrics=self.metrics,
+            workers=workers
+        )
+        return responder.poll(max_pages)
+
+def compile_quotes(force=False, account=None, near_threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Compile the quote and poll sources into the corpora the bot reads from"""
+    account = account or Account()
+    result = compile_corpus(account.quote_sources, account.corpus_path, account.compile_cache_dir, force=force,
+                            near_threshold=near_threshold, report_path=account.near_duplicates_report)
+    print(f"📚 Compiled {result.quotes} quotes into {result.path} "
+          f"({result.duplicates} duplicates dropped, {len(result.rebuilt)} sources rebuilt, "
+          f"{len(result.skipped)} unchanged)")
+    if result.near_duplicates:
+        print(f"🔁 Dropped {result.near_duplicates} near-duplicate quotes; "
+              f"see {account.near_duplicates_report} for what was kept")
+    polls = compile_polls(account.poll_sources, account.poll_corpus_path,
+                          os.path.join(account.compile_cache_dir, 'polls'), force=force)
+    print(f"📊 Compiled {polls.quotes} polls into {polls.path} "
+          f"({polls.duplicates} duplicates dropped, {len(polls.rejected)} rejected)")
+    for rejected in polls.rejected:
+        print(f"❌ Rejected poll {rejected['question']!r}: {'; '.join(rejected['problems'])}")
+    return result
 
-def main():
+def build_account_pool(accounts_path, workers=8, dry_run=False, **bot_options):
+    """Fan-out publisher for every account in an accounts manifest
+    
+    ``bot_options`` (``threads``, ``metrics``, ``weighted``, ...) go to every account's bot.
+    """
+    def build_account_bot(account, http_adapter, max_wait):
+        return MotivationalTwitterBot(dry_run=dry_run, account=account, http_adapter=http_adapter, max_wait=max_wait,
+                                      **bot_options)
+    
+    return AccountPool(load_accounts(accounts_path), build_account_bot, workers=workers, dry_run=dry_run)
+
+def run_daemon(dry_run=False, accounts_path=None, workers=8, metrics=None, **bot_options):
+    """Keep one bot (or account pool) alive and post on the workflow's schedule until stopped"""
+    def build_bot(reload_config):
+        if reload_config:
+            load_environment(override=True)
+            apply_log_level()
+        if accounts_path:
+            return build_account_pool(accounts_path, workers, dry_run, metrics=metrics, **bot_options)
+        return MotivationalTwitterBot(dry_run=dry_run, metrics=metrics, **bot_options)
+    
+    if accounts_path:
+        content_paths = build_account_pool(accounts_path, workers, dry_run).content_paths
+        config_paths = ('.env', accounts_path)
+    else:
+        content_paths = QUOTE_SOURCES + POLL_SOURCES
+        config_paths = ('.env',)
+    BotDaemon(build_bot, content_paths=content_paths, config_paths=config_paths, metrics=metrics,
+              cards=bot_options.get('cards', False)).run()
+
+def build_simulated_bot(threads, account, client, async_client, clock):
+    """Bot for ``simulate``: never waits for rate-limit budget, so a throttled post fails its run"""
+    return MotivationalTwitterBot(account=account, client=client, async_client=async_client, clock=clock,
+                                  max_wait=0, threads=threads)
+
+def run_simulation(days=365, count=1, accounts_path=None, threads=False, seed=0, daily_tweet_limit=None,
+                   duplicate_window_days=30, workers=None):
+    """Simulate ``days`` days of posting offline and print the report"""
+    if accounts_path:
+        accounts = load_accounts(accounts_path)
+    elif count > 1:
+        accounts = [Account(f"sim{number}") for number in range(count)]
+    else:
+        accounts = [Account()]
+    
+    report = simulate(accounts, functools.partial(build_simulated_bot, threads), days, seed=seed,
+                      windows={'quote': NO_REPEAT_DAYS, 'poll': POLL_NO_REPEAT_DAYS},
+                      daily_tweet_limit=daily_tweet_limit, duplicate_window=duplicate_window_days * 86400,
+                      workers=workers or os.cpu_count() or 1)
+    print(report.format())
+    return report
+
+def run_card_rendering(accounts_path=None, ahead=CARDS_AHEAD, workers=None, template=DEFAULT_TEMPLATE):
+    """Render the image cards of each account's upcoming quotes (every quote if ``ahead`` is None)"""
+    accounts = load_accounts(accounts_path) if accounts_path else [Account()]
+    for account in accounts:
+        bot = MotivationalTwitterBot(dry_run=True, account=account, cards=True, card_template=template)
+        result = bot.prerender_cards(ahead, workers)
+        if result is None:
+            print(f"❌ {account.name}: no cards rendered (no quotes, or Pillow>=10.1 is not installed)")
+            continue
+        print(f"🖼️ {account.name}: rendered {result.rendered} cards in {result.seconds:.1f}s "
+              f"({result.cached} already cached, {result.evicted} evicted) into {account.card_cache_dir}")
+
+def run_harvest(accounts_path=None, max_batches=None, top=5, report_days=None, metrics=None):
+    """Harvest engagement metrics for every account and print what performs"""
+    accounts = load_accounts(accounts_path) if accounts_path else [Account()]
+    for account in accounts:
+        bot = MotivationalTwitterBot(account=account, metrics=metrics)
+        result = bot.harvest_engagement(max_batches)
+        print(f"📈 {account.name}: {result.added} new tweets, {result.fetched} fetched ({result.changed} changed), "
+              f"{result.gone} gone, {result.remaining} still due"
+              + (f" (stopped: {result.stopped})" if result.stopped else ''))
+        since = time.time() - report_days * 86400 if report_days else 0.0
+        for line in format_report(bot.load_engagement(), bot.load_state_store().quote_text, top, since):
+            print(line)
+
+def run_responder(accounts_path=None, max_pages=None, workers=REPLY_WORKERS, metrics=None):
+    """Answer new mentions for every account"""
+    accounts = load_accounts(accounts_path) if accounts_path else [Account()]
+    for account in accounts:
+        bot = MotivationalTwitterBot(account=account, metrics=metrics)
+        result = bot.respond_to_mentions(max_pages, workers)
+        if result.started:
+            print(f"💬 {account.name}: replying to mentions from now on (earlier ones are left alone)")
+            continue
+        print(f"💬 {account.name}: {result.fetched} new mentions in {result.pages} pages, {result.queued} replies "
+              f"queued ({result.skipped} skipped), {result.sent} sent, {result.dropped} dropped, "
+              f"{result.pending} still queued" + (f" (stopped: {result.stopped})" if result.stopped else ''))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Motivational Twitter bot")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Stay running and post on the schedule from the workflow file")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Pick and format the content without posting it or touching the network")
+    parser.add_argument('--threads', action='store_true',
+                        help="Post quotes too long for one tweet as a thread instead of truncating them")
+    parser.add_argument('--accounts', metavar='PATH',
+                        help="Post for every account in this accounts manifest (see accounts.py)")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="Accounts to post for concurrently with --accounts (default: 8)")
+    parser.add_argument('--weighted', action='store_true',
+                        help="Favour the quotes and hooks with the best harvested engagement (see 'harvest')")
+    parser.add_argument('--explore', type=float, default=DEFAULT_EXPLORATION, metavar='RATE',
+                        help=f"Share of --weighted picks that ignore engagement (default: {DEFAULT_EXPLORATION})")
+    parser.add_argument('--cards', action='store_true',
+                        help="Attach a pre-rendered image card to quote tweets (needs Pillow, see 'cards')")
+    parser.add_argument('--card-template', choices=sorted(TEMPLATES), default=DEFAULT_TEMPLATE,
+                        help=f"Look of the image cards (default: {DEFAULT_TEMPLATE})")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="Write stage timings and counters here after every run "
+                             "(a Prometheus textfile for *.prom, a JSON summary otherwise)")
+    subparsers = parser.add_subparsers(dest='command')
+    compile_parser = subparsers.add_parser('compile', help="Compile quote and poll sources into data/*.corpus")
+    compile_parser.add_argument('--force', action='store_true', help="Rebuild every source even if unchanged")
+    compile_parser.add_argument('--similarity', type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                                help="Word-pair similarity at which quotes count as near-duplicates "
+                                     f"(default: {NEAR_DUPLICATE_THRESHOLD}; 0 keeps them all)")
+    simulate_parser = subparsers.add_parser('simulate', help="Run the posting pipeline offline over simulated days")
+    simulate_parser.add_argument('--days', type=int, default=365, help="Days of the schedule to simulate (default: 365)")
+    simulate_parser.add_argument('--count', type=int, default=1,
+                                 help="Simulate this many copies of the default account (ignored with --accounts)")
+    simulate_parser.add_argument('--seed', type=int, default=0, help="Seed for hooks and poll picks")
+    simulate_parser.add_argument('--daily-tweet-limit', type=int, default=None,
+                                 help="Daily tweet cap the fake API enforces per account")
+    simulate_parser.add_argument('--workers', type=int, default=None,
+                                 help="Processes to simulate accounts in (default: one per CPU)")
+    simulate_parser.add_argument('--duplicate-window-days', type=float, default=30,
+                                 help="How long the fake API rejects a repeated text (default: 30)")
+    harvest_parser = subparsers.add_parser('harvest', help="Fetch engagement metrics of posted tweets and report them")
+    harvest_parser.add_argument('--max-batches', type=int, default=None,
+                                help="Stop after this many get_tweets calls of 100 ids")
+    harvest_parser.add_argument('--top', type=int, default=5, help="Best and worst quotes to list (default: 5)")
+    harvest_parser.add_argument('--days', type=float, default=None,
+                                help="Only report tweets posted in the last DAYS days")
+    cards_parser = subparsers.add_parser('cards', help="Render image cards for the upcoming quotes ahead of time")
+    cards_parser.add_argument('--ahead', type=int, default=CARDS_AHEAD,
+                              help=f"Cards for this many of the next quotes in the deck (default: {CARDS_AHEAD})")
+    cards_parser.add_argument('--all', action='store_true', help="Render a card for every quote in the corpus")
+    cards_parser.add_argument('--workers', type=int, default=None,
+                              help="Processes to render in (default: one per CPU)")
+    respond_parser = subparsers.add_parser('respond', help="Reply to mentions that arrived since the last poll")
+    respond_parser.add_argument('--max-pages', type=int, default=None,
+                                help="Stop after this many pages of 100 mentions (the rest wait for the next poll)")
+    respond_parser.add_argument('--workers', type=int, default=None,
+                                help=f"Replies to post concurrently (default: {REPLY_WORKERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function to run the bot"""
+    args = parse_args(argv)
+    # .env first, so its LOG_LEVEL applies
+    load_environment()
+    setup_logging()
+    metrics = Metrics(args.metrics) if args.metrics else None
+    bot_options = {'threads': args.threads, 'weighted': args.weighted, 'exploration': args.explore,
+                   'cards': args.cards, 'card_template': args.card_template}
     try:
-        bot = MotivationalTwitterBot()
-        success = bot.post_daily_content()
+        if args.command == 'compile':
+            for account in (load_accounts(args.accounts) if args.accounts else [Account()]):
+                compile_quotes(force=args.force, account=account, near_threshold=args.similarity or None)
+            return
+        if args.command == 'harvest':
+            try:
+                run_harvest(args.accounts, args.max_batches, args.top, args.days, metrics)
+            finally:
+                if metrics is not None:
+                    metrics.export()
+            return
+        if args.command == 'respond':
+            try:
+                run_responder(args.accounts, args.max_pages, args.workers or REPLY_WORKERS, metrics)
+            finally:
+                if metrics is not None:
+                    metrics.export()
+            return
+        if args.command == 'cards':
+            run_card_rendering(args.accounts, None if args.all else args.ahead, args.workers, args.card_template)
+            return
+        if args.command == 'simulate':
+            run_simulation(args.days, args.count, args.accounts, args.threads, args.seed, args.daily_tweet_limit,
+                           args.duplicate_window_days, args.workers)
+            return
+        if args.daemon:
+            run_daemon(dry_run=args.dry_run, accounts_path=args.accounts, workers=args.workers, metrics=metrics,
+                       **bot_options)
+            return
+        if args.accounts:
+            bot = build_account_pool(args.accounts, args.workers, args.dry_run, metrics=metrics, **bot_options)
+        else:
+            bot = MotivationalTwitterBot(dry_run=args.dry_run, metrics=metrics, **bot_options)
+        try:
+            success = bot.post_daily_content()
+        finally:
+            if metrics is not None:
+                metrics.export()
         if not success:
             logging.error("Failed to post content")
             print("❌ Failed to post content")
             exit(1)  # Exit with error code
     except ValueError as e:
-        logging.error(f"Configuration error: {e}")
+        logging.error("Configuration error: %s", e)
         print(f"❌ Configuration error: {e}")
         exit(1)
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
+        logging.error("Unexpected error: %s", e)
         print(f"❌ Unexpected error: {e}")
         exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,165 @@
+"""Engagement-weighted selection of quotes and hooks
+
+In weighted mode the bot leans toward what has performed: quotes, and the
+hooks of each category, are drawn in proportion to their engagement rate
+(interactions per impression, see ``engagement.py``) relative to the
+account's average. Rates are smoothed toward that average with
+:data:`PRIOR_IMPRESSIONS` of pseudo-evidence, so one lucky tweet does not
+take over. A fraction ``exploration`` of the picks ignores the weights and
+uses the normal rotation (the shuffled deck, :func:`hooks.choose_hook`), so
+new quotes and hooks keep getting a chance.
+
+Draws come from Walker/Vose alias tables, so each one costs one random
+number and two array reads however many items are weighted. The tables
+cover only the quotes that have metrics. The bot refreshes them from the
+engagement store when a harvest changes it; quotes are found in the corpus
+through a key index built once per corpus, and the quote table is only
+rebuilt when a quote gains or loses metrics or a weight moves by more than
+:data:`REBUILD_TOLERANCE`.
+"""
+
+import random
+from array import array
+
+from hooks import GENERAL, GENERAL_HOOK_RATE, HOOKS, choose_hook
+
+DEFAULT_EXPLORATION = 0.2
+# Impressions' worth of the account average blended into every rate
+PRIOR_IMPRESSIONS = 2000
+# Weight = (smoothed rate / average rate) ** WEIGHT_POWER; 1 is plain proportional
+WEIGHT_POWER = 2.0
+# Masked-out hook draws retried before falling back to the uniform choice
+HOOK_DRAWS = 8
+# Relative weight change that makes update() rebuild the quote table
+REBUILD_TOLERANCE = 0.05
+
+
+class AliasTable:
+    """O(1) sampling of ``range(len(weights))`` in proportion to ``weights`` (Vose's alias method)"""
+
+    __slots__ = ('prob', 'alias')
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        if count == 0 or total <= 0:
+            raise ValueError("An alias table needs at least one positive weight")
+        scaled = [weight * count / total for weight in weights]
+        self.prob = array('d', [1.0]) * count
+        self.alias = array('Q', range(count))
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1 up to rounding
+        for index in small + large:
+            self.prob[index] = 1.0
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng=random):
+        # One uniform number picks the column and decides between it and its alias
+        position = rng.random() * len(self.prob)
+        column = int(position)
+        return column if position - column < self.prob[column] else self.alias[column]
+
+
+def relative_weights(totals):
+    """``{key: [posts, impressions, engagements]}`` -> ``{key: weight}`` around 1.0 for the average"""
+    impressions = sum(entry[1] for entry in totals.values())
+    engagements = sum(entry[2] for entry in totals.values())
+    if not impressions or not engagements:
+        return {}
+    average = engagements / impressions
+    return {
+        key: ((entry[2] + PRIOR_IMPRESSIONS * average) / (entry[1] + PRIOR_IMPRESSIONS) / average) ** WEIGHT_POWER
+        for key, entry in totals.items()
+    }
+
+
+class WeightedSampler:
+    """Alias tables over the scored quotes of one corpus and over each category's hooks
+
+    ``keys`` are the corpus's quote keys (``QuoteCorpus.keys()``); call
+    :meth:`update` with an ``engagement.EngagementStore`` whenever it has
+    new metrics.
+    """
+
+    def __init__(self, keys, exploration=DEFAULT_EXPLORATION, rng=random):
+        self.keys = keys
+        self.exploration = exploration
+        self.rng = rng
+        self.quote_indexes = array('Q')
+        self.quote_table = None
+        self.hook_tables = {}
+        # Weight of each corpus index in the current quote table
+        self._table_weights = {}
+        # Quote key -> corpus index, built from ``keys`` on the first update
+        self._positions = None
+
+    def positions(self):
+        if self._positions is None:
+            self._positions = {key: index for index, key in enumerate(self.keys)}
+            self.keys = None
+        return self._positions
+
+    def _table_current(self, weights):
+        """True if the quote table was built from (nearly) these ``{index: weight}``"""
+        if weights.keys() != self._table_weights.keys():
+            return False
+        return all(abs(weight - self._table_weights[index]) <= REBUILD_TOLERANCE * self._table_weights[index]
+                   for index, weight in weights.items())
+
+    def update(self, store):
+        """Refresh the tables from the metrics in ``store``"""
+        positions = self.positions()
+        weights = {}
+        for key, weight in relative_weights(store.aggregate('quote', kind='quote')).items():
+            index = positions.get(key)
+            if index is not None:
+                weights[index] = weight
+        if not self._table_current(weights):
+            self.quote_indexes = array('Q', weights)
+            self.quote_table = AliasTable(list(weights.values())) if weights else None
+            self._table_weights = weights
+
+        hook_weights = relative_weights(store.aggregate('hook', kind='quote'))
+        self.hook_tables = {}
+        if not hook_weights:
+            return
+        for category, hooks in enumerate(HOOKS):
+            # Start from the uniform policy's shares, then tilt them by performance
+            share = GENERAL_HOOK_RATE if category == GENERAL else 1.0
+            options = list(hooks)
+            weights = [share / len(hooks) * hook_weights.get(hook, 1.0) for hook in hooks]
+            if category == GENERAL:
+                options.append(None)
+                weights.append((1 - GENERAL_HOOK_RATE) * hook_weights.get(None, 1.0))
+            self.hook_tables[category] = (options, AliasTable(weights))
+
+    def _explore(self):
+        return self.exploration >= 1 or self.rng.random() < self.exploration
+
+    def draw_quote(self):
+        """A corpus index drawn by engagement, or None to deal from the deck instead"""
+        if self.quote_table is None or self._explore():
+            return None
+        return self.quote_indexes[self.quote_table.draw(self.rng)]
+
+    def choose_hook(self, category, mask=None):
+        """:func:`hooks.choose_hook`, but drawn by engagement outside exploration"""
+        entry = self.hook_tables.get(category)
+        if entry is None or self._explore():
+            return choose_hook(category, self.rng, mask)
+        options, table = entry
+        for _ in range(HOOK_DRAWS):
+            position = table.draw(self.rng)
+            hook = options[position]
+            if hook is None or mask is None or mask >> position & 1:
+                return hook
+        return choose_hook(category, self.rng, mask)
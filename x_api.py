@@ -0,0 +1,132 @@
+"""Construction of the tweepy client used to talk to the X API
+
+tweepy and requests are only imported when a client is actually built, so
+dry runs and offline commands (compile, ...) never load the network stack.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# tweepy hard-codes this host; TWITTER_API_BASE_URL can point it elsewhere
+DEFAULT_API_HOST = "https://api.twitter.com"
+
+
+def _base_url_adapter(base_url, **kwargs):
+    """Transport adapter that sends requests for the X API host to another base URL
+
+    Used to run the bot against a local stand-in server (see ``fake_x_api``).
+    """
+    from requests.adapters import HTTPAdapter
+
+    class BaseUrlAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.url = base_url.rstrip('/') + parts.path + (f"?{parts.query}" if parts.query else '')
+            return super().send(request, **kwargs)
+
+    return BaseUrlAdapter(**kwargs)
+
+
+def shared_adapter(pool_size, base_url=None):
+    """A transport adapter whose keep-alive connection pool several clients can share
+
+    Each client keeps its own session (auth, rate-limit hook); mounting the
+    same adapter in all of them makes them draw from one pool of
+    ``pool_size`` connections per host.
+    """
+    base_url = base_url or os.getenv('TWITTER_API_BASE_URL')
+    kwargs = {'pool_connections': 4, 'pool_maxsize': pool_size, 'pool_block': True}
+    if base_url:
+        return _base_url_adapter(base_url, **kwargs)
+    from requests.adapters import HTTPAdapter
+    return HTTPAdapter(**kwargs)
+
+
+def build_client(credentials, limiter=None, base_url=None, adapter=None):
+    """Create a ``tweepy.Client`` wired to the shared rate limiter
+
+    ``credentials`` holds the consumer/access keys and bearer token.
+    Rate-limit waits are handled by ``rate_limit.call_with_retries``, so
+    tweepy's own blocking ``wait_on_rate_limit`` stays off. ``adapter``
+    (see :func:`shared_adapter`) replaces the session's own connection pool.
+    """
+    import tweepy
+
+    client = tweepy.Client(
+        bearer_token=credentials.get('bearer_token'),
+        consumer_key=credentials['api_key'],
+        consumer_secret=credentials['api_secret'],
+        access_token=credentials['access_token'],
+        access_token_secret=credentials['access_token_secret'],
+        wait_on_rate_limit=False
+    )
+    base_url = base_url or os.getenv('TWITTER_API_BASE_URL')
+    if adapter is not None:
+        client.session.mount(DEFAULT_API_HOST, adapter)
+    elif base_url:
+        client.session.mount(DEFAULT_API_HOST, _base_url_adapter(base_url))
+    if limiter is not None:
+        client.session.hooks['response'].append(limiter.response_hook)
+    return client
+
+
+def error_details(error):
+    """Best-effort body of a failed API response, for logging"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'text', None) or 'No response details'
+
+
+def token_fingerprint(credentials):
+    """Hash identifying an account's tokens without storing them"""
+    material = f"{credentials['api_key']}:{credentials['access_token']}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class CredentialCache:
+    """On-disk cache of ``get_me()`` results, keyed by a hash of the tokens"""
+
+    def __init__(self, path='data/.cache/credentials.json', ttl=86400, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, credentials):
+        """Cached ``{'id', 'username'}`` for these tokens, or None if missing or expired"""
+        entry = self._read().get(token_fingerprint(credentials))
+        if entry is None or self.clock() - entry.get('verified_at', 0) > self.ttl:
+            return None
+        return entry
+
+    def put(self, credentials, user_id, username):
+        entries = self._read()
+        now = self.clock()
+        entries = {key: entry for key, entry in entries.items() if now - entry.get('verified_at', 0) <= self.ttl}
+        entries[token_fingerprint(credentials)] = {'id': str(user_id), 'username': username, 'verified_at': now}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(entries, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def invalidate(self, credentials):
+        entries = self._read()
+        if entries.pop(token_fingerprint(credentials), None) is not None:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(entries, file, indent=2)
+            os.replace(tmp_path, self.path)